@@ -1,5 +1,8 @@
 import os
 import json
+import time
+import uuid
+import hashlib
 from abc import ABC, abstractmethod
 import re
 
@@ -10,7 +13,11 @@ from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import OPENAI_API_KEY, ANTHROPIC_API_KEY, GOOGLE_API_KEY
+from config import OPENAI_API_KEY, ANTHROPIC_API_KEY, GOOGLE_API_KEY, GOOGLE_TRANSPORT, MEMORY_RECENT_TURNS
+from utils.metrics import AGENT_CALLS, AGENT_CALL_DURATION, STRUCTURED_OUTPUTS
+from utils import tracing
+from .knowledge_base import default_knowledge_base
+from .memory import AgentMemory
 
 # Initialize API clients
 openai.api_key = OPENAI_API_KEY
@@ -19,7 +26,7 @@ openai.api_key = OPENAI_API_KEY
 anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
 
 # Initialize Google Gemini client
-genai.configure(api_key=GOOGLE_API_KEY)
+genai.configure(api_key=GOOGLE_API_KEY, transport=GOOGLE_TRANSPORT)
 gemini_safety_settings = {
     HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
     HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
@@ -27,9 +34,41 @@ gemini_safety_settings = {
     HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
 }
 
+class DeferredNarrative(str):
+    """Placeholder reply of an agent whose narrative is generated later, on demand.
+    
+    It reads as a short note wherever the reply is shown or logged; key
+    identifies it to BaseAgent.render_deferred().
+    """
+    
+    def __new__(cls, key, role):
+        narrative = super().__new__(cls, f"*{role} narrative not generated yet.*")
+        narrative.key = key
+        narrative.role = role
+        return narrative
+    
+    def __getnewargs__(self):
+        return (self.key, self.role)
+
 class BaseAgent(ABC):
     """Base class for all AI agents in the SAFe implementation."""
     
+    # System prompt of generate_chain_of_thought_response
+    COT_SYSTEM_PROMPT = """You are {name}, a {role} in a SAFe environment.
+        
+        When answering the question, think step-by-step and show your reasoning process. 
+        Organize your response in the following format:
+        
+        THOUGHT PROCESS:
+        Step 1: [First reasoning step]
+        Step 2: [Second reasoning step]
+        Step 3: [Third reasoning step]
+        ... (more steps as needed)
+        
+        CONCLUSION:
+        [Your final answer based on the above reasoning]
+        """
+    
     def __init__(self, name, role, model_provider="openai", model_name=None):
         """Initialize a new agent.
         
@@ -45,6 +84,9 @@ class BaseAgent(ABC):
         self.model_name = model_name or self._get_default_model()
         self.context = []
         self.conversation_history = []
+        self.memory = AgentMemory()
+        self.defer_narratives = False  # Set by the simulation during fast mechanics ceremonies
+        self.deferred = {}  # DeferredNarrative key -> prompt and history position, until rendered
         
         # Load agent-specific prompt templates
         self.system_prompt = self._load_system_prompt()
@@ -68,32 +110,239 @@ class BaseAgent(ABC):
         """Add a message to the agent's context."""
         self.context.append(message)
         
-    def _prepare_conversation_history(self):
-        """Prepare the conversation history for the model."""
-        return [{"role": "system", "content": self.system_prompt}] + self.conversation_history
+    def _prepare_conversation_history(self, query=None, history=None):
+        """Prepare the messages for the model: the system prompt grounded in the passages and
+        remembered items relevant to query, the most recent exchanges, and query itself.
+        
+        Args:
+            query (str, optional): The prompt or question being answered
+            history (list, optional): Conversation to answer from; defaults to the whole history
+            
+        Returns:
+            list: Messages in OpenAI chat format
+        """
+        system_prompt = self._grounded(self.system_prompt, query)
+        if history is None:
+            history = self.conversation_history
+        if MEMORY_RECENT_TURNS < 0:
+            return [{"role": "system", "content": system_prompt}] + history
+        
+        # Replay the last few complete exchanges and the pending prompt; recall the rest
+        start = len(history) - (1 if history and history[-1]["role"] == "user" else 0)
+        for _ in range(MEMORY_RECENT_TURNS):
+            if start < 2 or history[start - 2]["role"] != "user" or history[start - 1]["role"] != "assistant":
+                break
+            start -= 2
+        recent = history[start:]
+        if query and not (recent and recent[-1]["role"] == "user" and recent[-1]["content"] == query):
+            recent = recent + [{"role": "user", "content": query}]
+        return [{"role": "system", "content": self._remembered(system_prompt, query, before_turn=start)}] + recent
+    
+    def _remembered(self, system_prompt, query, before_turn=None):
+        """Append the earlier exchanges and facts that best match query to a system prompt.
+        
+        Args:
+            system_prompt (str): The prompt to extend
+            query (str): The question or instruction being answered
+            before_turn (int, optional): History index of the first exchange replayed verbatim
+            
+        Returns:
+            str: The prompt, unchanged if nothing remembered matches
+        """
+        memory = self.memory
+        memory.sync(self.conversation_history)
+        if not query or not len(memory):
+            return system_prompt
+        with tracing.span("memory.recall", agent=self.role, items=len(memory)) as span:
+            notes = memory.recall(query, before_turn=before_turn)
+            span.set_attributes(chars=len(notes))
+        if not notes:
+            return system_prompt
+        return (f"{system_prompt}\n\nNotes from earlier in this engagement that may be relevant "
+                f"(most relevant first):\n{notes}")
+    
+    def _grounded(self, system_prompt, query):
+        """Append the knowledge base passages that best match query to a system prompt.
+        
+        Args:
+            system_prompt (str): The prompt to extend
+            query (str): The question or instruction being answered
+            
+        Returns:
+            str: The prompt, unchanged if there is no index or nothing matches
+        """
+        knowledge_base = default_knowledge_base() if query else None
+        if not knowledge_base:
+            return system_prompt
+        with tracing.span("knowledge.search", agent=self.role) as span:
+            context = knowledge_base.context(query)
+            span.set_attributes(chars=len(context))
+        if not context:
+            return system_prompt
+        return (f"{system_prompt}\n\nExcerpts from the SAFe decision-makers' guide that may be relevant "
+                f"(use them where they apply and cite them by number):\n{context}")
     
     @abstractmethod
     def generate_response(self, user_input):
         """Generate a response to user input. To be implemented by subclasses."""
         pass
     
-    def call_openai(self, messages):
+    def generate_structured_response(self, user_input, schema):
+        """Generate a reply as a JSON object described by schema, validated.
+        
+        A reply that does not validate is sent back once, without the
+        conversation, to be rewritten into the schema; if that fails too, the
+        reply becomes the narrative and the other fields take their defaults.
+        
+        Args:
+            user_input (str): The prompt, already appended to the conversation history
+            schema (ResponseSchema): The fields expected besides the narrative
+            
+        Returns:
+            dict: The narrative and the schema's fields
+        """
+        if self.defer_narratives:
+            return dict(schema.defaults(), narrative=self.defer_response(user_input, schema))
+        return self._call_structured(self._prepare_conversation_history(user_input), schema)
+    
+    def _call_structured(self, messages, schema):
+        """Call the model for a structured reply to prepared messages (see generate_structured_response)."""
+        messages = [dict(messages[0], content=f"{messages[0]['content']}\n\n{schema.instructions()}")] + messages[1:]
+        reply = self.call_model(messages, json_mode=True)
+        try:
+            result = schema.parse(reply)
+            outcome = "valid"
+        except ValueError as error:
+            repair = [{"role": "system", "content": schema.repair_prompt(error)},
+                      {"role": "user", "content": reply or ""}]
+            try:
+                result = schema.parse(self.call_model(repair, json_mode=True))
+                outcome = "repaired"
+            except ValueError:
+                result = schema.fallback(reply)
+                outcome = "fallback"
+        STRUCTURED_OUTPUTS.labels(self.role, schema.name, outcome).inc()
+        return result
+    
+    def defer_response(self, user_input, schema=None):
+        """Stand in for a reply to be generated later (fast mechanics mode).
+        
+        Args:
+            user_input (str): The prompt the reply answers, already appended to the history
+            schema (ResponseSchema, optional): Structure the reply is requested in; only its
+                narrative is kept when it is generated
+            
+        Returns:
+            DeferredNarrative: Placeholder to use as the reply
+        """
+        key = uuid.uuid4().hex[:16]
+        self.deferred[key] = {"prompt": user_input, "position": len(self.conversation_history), "schema": schema}
+        return DeferredNarrative(key, self.role)
+    
+    def render_deferred(self, key):
+        """Generate a deferred reply from the conversation as it was when the reply was deferred.
+        
+        The placeholder in the conversation history is replaced and the
+        exchange is added to the agent's memory.
+        
+        Args:
+            key (str): Key of the DeferredNarrative
+            
+        Returns:
+            str: The reply, or None if this agent deferred no reply under key
+        """
+        entry = self.deferred.get(key)
+        if entry is None:
+            return None
+        position = entry["position"]
+        history = self.conversation_history[:position]
+        with tracing.span("narrative.render", agent=self.role, position=position):
+            messages = self._prepare_conversation_history(entry["prompt"], history=history)
+            if entry.get("schema"):
+                response = self._call_structured(messages, entry["schema"])["narrative"]
+            else:
+                response = self.call_model(messages)
+        del self.deferred[key]
+        for message in self.conversation_history[position:position + 2]:
+            if getattr(message["content"], "key", None) == key:
+                message["content"] = response
+                self.memory.add_turn(entry["prompt"], response, position - 1)
+        return response
+    
+    def call_model(self, messages, json_mode=False):
+        """Call the agent's model provider, recording the call's latency and outcome.
+        
+        Args:
+            messages (list): Conversation in OpenAI chat format
+            json_mode (bool): Ask the provider to constrain the reply to a JSON object
+            
+        Returns:
+            str: The model's reply
+        """
+        if self.model_provider == "anthropic":
+            call = self.call_anthropic
+        elif self.model_provider == "google":
+            call = self.call_google
+        else:
+            call = self.call_openai
+        
+        started = time.perf_counter()
+        outcome = "error"
+        self.last_usage = None  # Set by the call_* method if the provider reports token counts
+        with tracing.span("model.call", agent=self.role, provider=self.model_provider,
+                          model=self.model_name, messages=len(messages)) as span:
+            try:
+                # Plain calls keep their original signature, so stand-ins without JSON mode still work
+                response = call(messages, json_mode=json_mode) if json_mode else call(messages)
+                outcome = "success"
+                if tracing.enabled():
+                    span.set_attributes(**self._token_attributes(messages, response))
+                return response
+            finally:
+                AGENT_CALL_DURATION.labels(self.role, self.model_provider, self.model_name).observe(
+                    time.perf_counter() - started)
+                AGENT_CALLS.labels(self.role, self.model_provider, self.model_name, outcome).inc()
+    
+    def _token_attributes(self, messages, response):
+        """Token counts of the last call for its trace span, estimated if the provider gave none."""
+        if self.last_usage:
+            return dict(self.last_usage)
+        # Roughly four characters per token for English text
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        return {
+            "prompt_tokens": prompt_chars // 4,
+            "completion_tokens": len(response or "") // 4,
+            "tokens_estimated": True
+        }
+    
+    def span_attributes(self, *args, **kwargs):
+        """Trace span attributes identifying this agent (for tracing.traced)."""
+        return {"agent": self.role, "provider": self.model_provider, "model": self.model_name}
+    
+    def call_openai(self, messages, json_mode=False):
         """Call the OpenAI API to generate a response."""
         response = openai.chat.completions.create(
             model=self.model_name,
             messages=messages,
             temperature=0.7,
-            max_tokens=1000
+            max_tokens=1000,
+            **({"response_format": {"type": "json_object"}} if json_mode else {})
         )
+        if response.usage:
+            self.last_usage = {"prompt_tokens": response.usage.prompt_tokens,
+                               "completion_tokens": response.usage.completion_tokens}
         return response.choices[0].message.content
     
-    def call_anthropic(self, messages):
+    def call_anthropic(self, messages, json_mode=False):
         """Call the Anthropic API to generate a response."""
         # Convert messages to Anthropic format
         system_message = next((m for m in messages if m["role"] == "system"), None)
         system_content = system_message["content"] if system_message else ""
         
         user_assistant_messages = [m for m in messages if m["role"] != "system"]
+        if json_mode:
+            # No JSON mode; starting the reply with the brace keeps it to the object
+            user_assistant_messages.append({"role": "assistant", "content": "{"})
         
         response = anthropic_client.messages.create(
             model=self.model_name,
@@ -101,9 +350,12 @@ class BaseAgent(ABC):
             messages=user_assistant_messages,
             max_tokens=1000
         )
-        return response.content[0].text
+        if response.usage:
+            self.last_usage = {"prompt_tokens": response.usage.input_tokens,
+                               "completion_tokens": response.usage.output_tokens}
+        return ("{" if json_mode else "") + response.content[0].text
     
-    def call_google(self, messages):
+    def call_google(self, messages, json_mode=False):
         """Call the Google Gemini API to generate a response."""
         # Format messages for Gemini
         system_message = next((m for m in messages if m["role"] == "system"), None)
@@ -120,13 +372,34 @@ class BaseAgent(ABC):
         
         model = genai.GenerativeModel(
             model_name=self.model_name,
-            safety_settings=gemini_safety_settings
+            safety_settings=gemini_safety_settings,
+            generation_config={"response_mime_type": "application/json"} if json_mode else None
         )
         
         chat = model.start_chat(history=formatted_messages)
         response = chat.send_message(system_content)
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            self.last_usage = {"prompt_tokens": usage.prompt_token_count,
+                               "completion_tokens": usage.candidates_token_count}
         return response.text
     
+    def chain_of_thought_version(self):
+        """Identify what a chain-of-thought answer depends on, to tell when a stored one is outdated.
+        
+        Returns:
+            str: Hash of the provider, model, prompt and knowledge base index
+        """
+        knowledge_base = default_knowledge_base()
+        parts = [
+            self.model_provider,
+            self.model_name,
+            self.COT_SYSTEM_PROMPT.format(name=self.name, role=self.role),
+            f"{knowledge_base.meta['source_sha256']}@{knowledge_base.meta['built_at']}" if knowledge_base else ""
+        ]
+        return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+    
+    @tracing.traced(attributes=span_attributes)
     def process_message(self, user_input):
         """Process a user message and generate a response."""
         # Add user input to conversation history
@@ -140,6 +413,7 @@ class BaseAgent(ABC):
         
         return response
 
+    @tracing.traced(attributes=span_attributes)
     def generate_chain_of_thought_response(self, question, include_steps=True):
         """
         Generate a response with visible chain of thought reasoning steps.
@@ -152,37 +426,16 @@ class BaseAgent(ABC):
             dict: Dictionary containing 'thought_process' (list of reasoning steps) and 'conclusion' (final answer)
         """
         # Define the system message to encourage chain of thought reasoning
-        system_message = f"""You are {self.name}, a {self.role} in a SAFe environment.
-        
-        When answering the question, think step-by-step and show your reasoning process. 
-        Organize your response in the following format:
-        
-        THOUGHT PROCESS:
-        Step 1: [First reasoning step]
-        Step 2: [Second reasoning step]
-        Step 3: [Third reasoning step]
-        ... (more steps as needed)
-        
-        CONCLUSION:
-        [Your final answer based on the above reasoning]
-        """
+        system_message = self.COT_SYSTEM_PROMPT.format(name=self.name, role=self.role)
         
         # Create a messages array in the format needed for the models
         messages = [
-            {"role": "system", "content": system_message},
+            {"role": "system", "content": self._grounded(system_message, question)},
             {"role": "user", "content": question}
         ]
         
-        # Call the appropriate API based on the model provider
-        if self.model_provider == "openai":
-            response = self.call_openai(messages)
-        elif self.model_provider == "anthropic":
-            response = self.call_anthropic(messages)
-        elif self.model_provider == "google":
-            response = self.call_google(messages)
-        else:
-            # Default to OpenAI if provider is unknown
-            response = self.call_openai(messages)
+        # Call the appropriate API based on the model provider (OpenAI if unknown)
+        response = self.call_model(messages)
         
         # Parse the response to separate thought process from conclusion
         thought_process = []
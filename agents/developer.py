@@ -1,4 +1,6 @@
 from .base_agent import BaseAgent
+from .structured_output import PROGRESS_REPORT, TASK_COMPLETION
+from utils.tracing import traced
 
 class Developer(BaseAgent):
     """Developer agent responsible for implementing work and providing technical expertise."""
@@ -34,15 +36,12 @@ class Developer(BaseAgent):
     
     def generate_response(self, user_input):
         """Generate a response based on the Developer's expertise."""
-        messages = self._prepare_conversation_history()
-        
-        if self.model_provider == "openai":
-            return self.call_openai(messages)
-        elif self.model_provider == "anthropic":
-            return self.call_anthropic(messages)
-        elif self.model_provider == "google":
-            return self.call_google(messages)
+        if self.defer_narratives:
+            return self.defer_response(user_input)
+        messages = self._prepare_conversation_history(user_input)
+        return self.call_model(messages)
     
+    @traced(attributes=BaseAgent.span_attributes)
     def estimate_story(self, story, team_skills=None):
         """Estimate a user story.
         
@@ -98,6 +97,7 @@ class Developer(BaseAgent):
         
         return estimate, response
     
+    @traced(attributes=BaseAgent.span_attributes)
     def start_work(self, task):
         """Start working on a task.
         
@@ -132,6 +132,7 @@ class Developer(BaseAgent):
         
         return response
     
+    @traced(attributes=BaseAgent.span_attributes)
     def report_progress(self):
         """Report progress on current tasks for daily stand-up.
         
@@ -158,16 +159,15 @@ class Developer(BaseAgent):
         """
         
         self.conversation_history.append({"role": "user", "content": prompt})
-        response = self.generate_response(prompt)
+        reply = self.generate_structured_response(prompt, PROGRESS_REPORT)
+        response = reply["narrative"]
         self.conversation_history.append({"role": "assistant", "content": response})
         
-        # Simple extraction of impediments from response (could be enhanced)
-        impediment = None
-        if "block" in response.lower() or "imped" in response.lower() or "stuck" in response.lower():
-            impediment = "Potential impediment detected in status update"
+        impediment = "; ".join(reply["impediments"]) or None
         
         return response, impediment
     
+    @traced(attributes=BaseAgent.span_attributes)
     def complete_task(self, task):
         """Complete a task.
         
@@ -193,7 +193,8 @@ class Developer(BaseAgent):
         """
         
         self.conversation_history.append({"role": "user", "content": prompt})
-        response = self.generate_response(prompt)
+        reply = self.generate_structured_response(prompt, TASK_COMPLETION)
+        response = reply["narrative"]
         self.conversation_history.append({"role": "assistant", "content": response})
         
         # Remove from current tasks and add to completed
@@ -201,15 +202,19 @@ class Developer(BaseAgent):
             self.current_tasks.remove(task)
         self.completed_tasks.append(task)
         
-        # Check for technical debt in response
+        # Record the technical debt the Developer reported
         technical_debt = None
-        if "technical debt" in response.lower() or "debt" in response.lower() or "refactor" in response.lower():
-            technical_debt = f"Technical debt related to {task['name']}"
-            if technical_debt not in self.technical_debt_items:
-                self.technical_debt_items.append(technical_debt)
+        if reply["tech_debt"]:
+            technical_debt = f"Technical debt related to {task['name']}: {'; '.join(reply['tech_debt'])}"
+            for item in reply["tech_debt"]:
+                debt_item = f"{task['name']}: {item}"
+                if debt_item not in self.technical_debt_items:
+                    self.technical_debt_items.append(debt_item)
+                    self.memory.add_fact("tech_debt", debt_item)
         
         return response, technical_debt
     
+    @traced(attributes=BaseAgent.span_attributes)
     def provide_technical_input(self, topic):
         """Provide technical expertise on a topic.
         
@@ -238,6 +243,7 @@ class Developer(BaseAgent):
         
         return response
     
+    @traced(attributes=BaseAgent.span_attributes)
     def handle_change_request(self, change, current_task):
         """Respond to a change request during implementation.
         
@@ -0,0 +1,284 @@
+"""SAFe knowledge base retrieved from the bundled PDF with BM25.
+
+An offline ingestion step extracts the text of "Information for
+decision-makers considering the SAFe framework.pdf", splits it into
+overlapping passages and writes a BM25 index:
+
+    python agents/knowledge_base.py build
+    python agents/knowledge_base.py query "how do we measure PI predictability?"
+
+The index is a directory of JSON metadata and NumPy arrays (posting lists
+with precomputed BM25 weights) that are memory-mapped when loaded, so every
+worker process shares the same pages. Agents add the top-k passages for a
+question to their system prompt instead of relying on the model's memory.
+Without a built index (or without NumPy) agents answer ungrounded.
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # Retrieval is disabled without NumPy
+    np = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import KNOWLEDGE_SOURCE, KNOWLEDGE_INDEX_DIR, KNOWLEDGE_TOP_K, KNOWLEDGE_MAX_CHARS
+from utils.text import tokenize
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+CHUNK_WORDS = 120  # Target passage length
+OVERLAP_WORDS = 30  # Words repeated at the start of the next passage
+K1 = 1.5
+B = 0.75
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_FOOTER = re.compile(r"If you want to share, you can use \S+ \d+ / \d+")  # Repeated on every page of the PDF
+
+
+def extract_pages(path):
+    """Return the whitespace-normalized text of each page of a PDF (requires pypdf)."""
+    from pypdf import PdfReader  # Only needed to build the index
+    pages = [re.sub(r"\s+", " ", page.extract_text() or "") for page in PdfReader(path).pages]
+    return [_FOOTER.sub(" ", text).strip() for text in pages]
+
+
+def chunk_pages(pages, chunk_words=CHUNK_WORDS, overlap_words=OVERLAP_WORDS):
+    """
+    Split page texts into overlapping passages along sentence boundaries.
+
+    Args:
+        pages (list): Text of each page
+        chunk_words (int): Target words per passage
+        overlap_words (int): Words of context carried into the next passage
+
+    Returns:
+        list: Passages as {'page': 1-based page of the first sentence, 'text': str}
+    """
+    sentences = [(number, sentence) for number, text in enumerate(pages, 1)
+                 for sentence in _SENTENCE_END.split(text) if sentence]
+    passages = []
+    current = []
+    words = 0
+    for number, sentence in sentences:
+        current.append((number, sentence))
+        words += len(sentence.split())
+        if words >= chunk_words:
+            passages.append({"page": current[0][0], "text": " ".join(s for _, s in current)})
+            # Carry trailing sentences into the next passage for context
+            carried = []
+            carried_words = 0
+            for item in reversed(current):
+                carried_words += len(item[1].split())
+                if carried_words > overlap_words:
+                    break
+                carried.insert(0, item)
+            current = carried
+            words = sum(len(s.split()) for _, s in current)
+    if current and (not passages or words > overlap_words):
+        passages.append({"page": current[0][0], "text": " ".join(s for _, s in current)})
+    return passages
+
+
+def _sha256(path):
+    """Hex digest of a file, used to detect an index built from an older PDF."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_index(source=KNOWLEDGE_SOURCE, index_dir=KNOWLEDGE_INDEX_DIR):
+    """
+    Extract, chunk and index the source PDF.
+
+    Args:
+        source (str): Path of the PDF
+        index_dir (str): Directory the index is written to
+
+    Returns:
+        dict: The index metadata
+    """
+    passages = chunk_pages(extract_pages(source))
+    documents = [Counter(tokenize(passage["text"])) for passage in passages]
+    lengths = np.array([sum(document.values()) for document in documents], dtype=np.float32)
+    average = float(lengths.mean()) if len(lengths) else 0.0
+
+    postings = {}
+    for doc_id, document in enumerate(documents):
+        for term, count in document.items():
+            postings.setdefault(term, []).append((doc_id, count))
+
+    terms = sorted(postings)
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    doc_ids = []
+    weights = []
+    for term_id, term in enumerate(terms):
+        entries = postings[term]
+        idf = np.log(1 + (len(documents) - len(entries) + 0.5) / (len(entries) + 0.5))
+        for doc_id, count in entries:
+            norm = K1 * (1 - B + B * lengths[doc_id] / average)
+            doc_ids.append(doc_id)
+            weights.append(idf * count * (K1 + 1) / (count + norm))
+        offsets[term_id + 1] = len(doc_ids)
+
+    os.makedirs(index_dir, exist_ok=True)
+    meta_path = os.path.join(index_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)  # An index being rebuilt is not loadable until it is complete
+    np.save(os.path.join(index_dir, "offsets.npy"), offsets)
+    np.save(os.path.join(index_dir, "postings.npy"), np.array(doc_ids, dtype=np.int32))
+    np.save(os.path.join(index_dir, "weights.npy"), np.array(weights, dtype=np.float32))
+    with open(os.path.join(index_dir, "passages.json"), "w", encoding="utf-8") as f:
+        json.dump(passages, f, ensure_ascii=False)
+    meta = {
+        "version": INDEX_VERSION,
+        "source": os.path.basename(source),
+        "source_sha256": _sha256(source),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "k1": K1,
+        "b": B,
+        "passages": len(passages),
+        "average_length": average,
+        "terms": {term: term_id for term_id, term in enumerate(terms)}
+    }
+    # Written last, so a partially written index is never loaded
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class KnowledgeBase:
+    """A loaded BM25 index answering top-k passage queries."""
+
+    def __init__(self, index_dir):
+        """Load the index in index_dir, memory-mapping its arrays.
+
+        Args:
+            index_dir (str): Directory written by build_index()
+        """
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Knowledge base index version {self.meta.get('version')} is not {INDEX_VERSION}")
+        with open(os.path.join(index_dir, "passages.json"), encoding="utf-8") as f:
+            self.passages = json.load(f)
+        self.terms = self.meta["terms"]
+        self.offsets = np.load(os.path.join(index_dir, "offsets.npy")).tolist()  # Small; indexed per term
+        # Plain ndarray views of the mapped files; slicing a np.memmap is several times slower
+        self.postings = np.asarray(np.load(os.path.join(index_dir, "postings.npy"), mmap_mode="r"))
+        self.weights = np.asarray(np.load(os.path.join(index_dir, "weights.npy"), mmap_mode="r"))
+
+    def search(self, query, top_k=KNOWLEDGE_TOP_K):
+        """Return the passages that best match a query.
+
+        Args:
+            query (str): Question or prompt text
+            top_k (int): Most passages returned
+
+        Returns:
+            list: Passages as {'page', 'text', 'score'}, best first
+        """
+        term_ids = {self.terms[term] for term in tokenize(query) if term in self.terms}
+        if not term_ids or top_k <= 0:
+            return []
+        slices = [slice(self.offsets[term_id], self.offsets[term_id + 1]) for term_id in term_ids]
+        scores = np.bincount(np.concatenate([self.postings[s] for s in slices]),
+                             weights=np.concatenate([self.weights[s] for s in slices]),
+                             minlength=len(self.passages))
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [dict(self.passages[i], score=round(float(scores[i]), 3)) for i in best]
+
+    def context(self, query, top_k=KNOWLEDGE_TOP_K, max_chars=KNOWLEDGE_MAX_CHARS):
+        """Format the best passages for a system prompt, or '' if none match.
+
+        Args:
+            query (str): Question or prompt text
+            top_k (int): Most passages included
+            max_chars (int): Budget for the passage text
+
+        Returns:
+            str: Numbered passages with their page numbers
+        """
+        lines = []
+        used = 0
+        for passage in self.search(query, top_k):
+            text = passage["text"][:max(0, max_chars - used)]
+            if not text:
+                break
+            used += len(text)
+            lines.append(f"[{len(lines) + 1}] (p. {passage['page']}) {text}")
+        return "\n".join(lines)
+
+
+_default = None
+_default_loaded = False
+_default_lock = threading.Lock()
+
+
+def default_knowledge_base():
+    """The knowledge base at SAFE_KNOWLEDGE_INDEX, loaded once per process; None if unavailable."""
+    global _default, _default_loaded
+    if _default_loaded:
+        return _default
+    with _default_lock:
+        if not _default_loaded:
+            if KNOWLEDGE_TOP_K <= 0:
+                pass  # Retrieval switched off
+            elif np is None:
+                logger.info("NumPy is not installed; agents answer without the SAFe knowledge base")
+            elif not os.path.exists(os.path.join(KNOWLEDGE_INDEX_DIR, "meta.json")):
+                logger.info("No SAFe knowledge base index at %s; build it with "
+                            "`python agents/knowledge_base.py build`", KNOWLEDGE_INDEX_DIR)
+            else:
+                try:
+                    _default = KnowledgeBase(KNOWLEDGE_INDEX_DIR)
+                    if os.path.exists(KNOWLEDGE_SOURCE) and _sha256(KNOWLEDGE_SOURCE) != _default.meta["source_sha256"]:
+                        logger.warning("The SAFe knowledge base index is older than %s; rebuild it",
+                                       os.path.basename(KNOWLEDGE_SOURCE))
+                except (OSError, ValueError, KeyError) as e:
+                    logger.warning("Could not load the SAFe knowledge base index: %s", e)
+            _default_loaded = True
+    return _default
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Extract, chunk and index the PDF")
+    build.add_argument("--source", default=KNOWLEDGE_SOURCE)
+    build.add_argument("--output", default=KNOWLEDGE_INDEX_DIR, help="Index directory")
+    query = commands.add_parser("query", help="Print the passages retrieved for a question")
+    query.add_argument("question")
+    query.add_argument("--index", default=KNOWLEDGE_INDEX_DIR)
+    query.add_argument("--top-k", type=int, default=KNOWLEDGE_TOP_K)
+    args = parser.parse_args(argv)
+
+    if np is None:
+        print("The knowledge base requires NumPy", file=sys.stderr)
+        return 1
+    if args.command == "build":
+        started = time.perf_counter()
+        meta = build_index(args.source, args.output)
+        print(f"Indexed {meta['passages']} passages and {len(meta['terms'])} terms from {meta['source']} "
+              f"into {args.output} in {time.perf_counter() - started:.2f}s")
+    else:
+        for passage in KnowledgeBase(args.index).search(args.question, args.top_k):
+            print(f"[{passage['score']}] p. {passage['page']}: {passage['text']}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
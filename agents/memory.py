@@ -0,0 +1,166 @@
+"""Per-agent memory of past turns and facts, retrieved with BM25.
+
+Agents used to replay their whole conversation history to the model on
+every call, so prompts grew with every sprint. An AgentMemory indexes each
+completed exchange (prompt and reply) and the structured facts an agent
+records along the way (sprint velocity, impediments raised and resolved,
+technical debt, PI results). A call then sends only the last few exchanges
+verbatim plus the remembered items that best match what is being asked,
+which keeps the prompt size flat however long a simulation runs.
+
+The index is plain Python (term -> {item: count}) built incrementally, so
+it pickles with the agent into the simulation store.
+"""
+import os
+import sys
+import math
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import MEMORY_TOP_K, MEMORY_MAX_CHARS
+from utils.text import tokenize
+
+K1 = 1.2
+B = 0.75
+ITEM_CHARS = 600  # Longest excerpt of one remembered item in a prompt
+MIN_IDF = 0.1  # Terms found in more items than this discriminates (about 90%) are not scored
+FACT_BOOST = 1.5  # Facts are short and dense; rank them above turns of similar relevance
+
+
+class AgentMemory:
+    """BM25 index over an agent's completed exchanges and recorded facts."""
+
+    def __init__(self):
+        self.items = []  # {'kind', 'text', 'turn'}; kind is 'turn' or a fact type such as 'velocity'
+        self.postings = {}  # term -> {item id: term count}
+        self.lengths = []  # Terms per item
+        self.total_length = 0
+        self.indexed = 0  # Entries of the conversation history already indexed
+
+    def __len__(self):
+        return len(self.items)
+
+    def _add(self, kind, text, index_text=None, turn=None):
+        """Index one item; index_text defaults to the text shown in prompts."""
+        item_id = len(self.items)
+        terms = tokenize(index_text or text)
+        for term in terms:
+            counts = self.postings.setdefault(term, {})
+            counts[item_id] = counts.get(item_id, 0) + 1
+        self.items.append({"kind": kind, "text": text, "turn": turn})
+        self.lengths.append(len(terms))
+        self.total_length += len(terms)
+        return item_id
+
+    def add_fact(self, kind, text):
+        """Remember a structured fact.
+
+        Args:
+            kind (str): Fact type, e.g. 'velocity', 'impediment', 'tech_debt' or 'pi_result'
+            text (str): The fact, phrased to stand on its own in a prompt
+        """
+        self._add(kind, text)
+
+    def sync(self, history):
+        """Index the exchanges appended to a conversation history since the last call.
+
+        A user message is indexed together with the assistant reply that
+        follows it; a trailing message without a reply waits for the next call.
+
+        Args:
+            history (list): The agent's conversation history in chat format
+        """
+        position = self.indexed
+        while position < len(history):
+            message = history[position]
+            if message["role"] != "user":
+                position += 1
+                continue
+            if position + 1 >= len(history):
+                break
+            reply = history[position + 1]
+            if reply["role"] != "assistant":
+                position += 1
+                continue
+            if type(reply["content"]) is str:  # A deferred narrative is added once rendered
+                self.add_turn(message["content"], reply["content"], position)
+            position += 2
+        self.indexed = position
+
+    def add_turn(self, prompt, reply, turn):
+        """Remember one exchange.
+
+        Args:
+            prompt (str): The user message
+            reply (str): The assistant reply
+            turn (int): History index of the user message
+        """
+        asked = " ".join(prompt.split())
+        answered = " ".join(reply.split())
+        # Only an excerpt is ever shown, so only an excerpt is kept; the whole exchange is indexed
+        self._add("turn", f"Asked: {asked[:200]}\nAnswered: {answered}"[:ITEM_CHARS],
+                  index_text=f"{prompt}\n{reply}", turn=turn)
+
+    def search(self, query, top_k=MEMORY_TOP_K, before_turn=None):
+        """Return the remembered items that best match a query.
+
+        Args:
+            query (str): The prompt or question being answered
+            top_k (int): Most items returned
+            before_turn (int, optional): Skip exchanges at or after this history index,
+                e.g. the ones replayed verbatim
+
+        Returns:
+            list: Items as {'kind', 'text', 'turn', 'score'}, best first
+        """
+        if not query or top_k <= 0 or not self.items:
+            return []
+        count = len(self.items)
+        average = self.total_length / count or 1.0
+        norms = [K1 * (1 - B + B * length / average) for length in self.lengths]
+        scores = [0.0] * count
+        for term in set(tokenize(query)):
+            counts = self.postings.get(term)
+            if not counts:
+                continue
+            idf = math.log(1 + (count - len(counts) + 0.5) / (len(counts) + 0.5))
+            if idf < MIN_IDF:
+                continue  # In nearly every item, e.g. the wording of the agent's own prompts
+            weight = idf * (K1 + 1)
+            for item_id, frequency in counts.items():
+                scores[item_id] += weight * frequency / (frequency + norms[item_id])
+        results = []
+        for item_id, score in enumerate(scores):
+            if not score:
+                continue
+            item = self.items[item_id]
+            if item["kind"] == "turn":
+                if before_turn is not None and item["turn"] >= before_turn:
+                    continue
+            else:
+                score *= FACT_BOOST
+            results.append((score, item_id))
+        # Most relevant first; among equals, the most recent
+        results.sort(reverse=True)
+        return [dict(self.items[item_id], score=round(score, 3)) for score, item_id in results[:top_k]]
+
+    def recall(self, query, top_k=MEMORY_TOP_K, max_chars=MEMORY_MAX_CHARS, before_turn=None):
+        """Format the most relevant remembered items for a system prompt, or '' if none match.
+
+        Args:
+            query (str): The prompt or question being answered
+            top_k (int): Most items included
+            max_chars (int): Budget for the item text
+            before_turn (int, optional): Skip exchanges at or after this history index
+
+        Returns:
+            str: One line per item, most relevant first
+        """
+        lines = []
+        used = 0
+        for item in self.search(query, top_k, before_turn):
+            text = item["text"][:min(ITEM_CHARS, max(0, max_chars - used))]
+            if not text:
+                break
+            used += len(text)
+            lines.append(f"- ({item['kind'].replace('_', ' ')}) {text}")
+        return "\n".join(lines)
@@ -1,4 +1,6 @@
 from .base_agent import BaseAgent
+from .structured_output import CHANGE_DECISION, STRATEGIC_ALIGNMENT
+from utils.tracing import traced
 
 class SAFeCoach(BaseAgent):
     """SAFe Coach (Release Train Engineer) agent responsible for high-level facilitation and mentoring."""
@@ -41,15 +43,12 @@ class SAFeCoach(BaseAgent):
     
     def generate_response(self, user_input):
         """Generate a response based on the SAFe Coach's expertise."""
-        messages = self._prepare_conversation_history()
-        
-        if self.model_provider == "openai":
-            return self.call_openai(messages)
-        elif self.model_provider == "anthropic":
-            return self.call_anthropic(messages)
-        elif self.model_provider == "google":
-            return self.call_google(messages)
+        if self.defer_narratives:
+            return self.defer_response(user_input)
+        messages = self._prepare_conversation_history(user_input)
+        return self.call_model(messages)
     
+    @traced(attributes=BaseAgent.span_attributes)
     def start_pi_planning(self, backlog, configuration="essential"):
         """Start PI Planning session.
         
@@ -95,6 +94,7 @@ class SAFeCoach(BaseAgent):
             formatted += ")\n"
         return formatted
     
+    @traced(attributes=BaseAgent.span_attributes)
     def handle_impediment(self, impediment, configuration="essential"):
         """Handle program-level impediments.
         
@@ -119,6 +119,35 @@ class SAFeCoach(BaseAgent):
         
         return response
     
+    @traced(attributes=BaseAgent.span_attributes)
+    def evaluate_change_request(self, change_request, configuration="essential"):
+        """Decide on a strategic change request at the program level.
+        
+        Args:
+            change_request (dict): Details of the change request
+            configuration (str): SAFe configuration level
+            
+        Returns:
+            tuple: Explanation and decision ('accept', 'defer' or 'reject')
+        """
+        prompt = f"""
+        As a SAFe Coach operating in {configuration} SAFe configuration, a strategic change request has come in during PI {self.pi_counter}:
+        
+        Change request: {change_request['description']}
+        Priority: {change_request.get('priority', 'Unknown')}/10
+        
+        How would you handle this change at the program level? Decide whether to accept it now,
+        defer it to a later PI, or reject it, and explain the actions you would take.
+        """
+        
+        self.conversation_history.append({"role": "user", "content": prompt})
+        reply = self.generate_structured_response(prompt, CHANGE_DECISION)
+        response = reply["narrative"]
+        self.conversation_history.append({"role": "assistant", "content": response})
+        
+        return response, reply["decision"]
+    
+    @traced(attributes=BaseAgent.span_attributes)
     def end_pi(self, achievements, metrics, configuration="essential"):
         """Conclude a Program Increment with an Inspect & Adapt workshop.
         
@@ -155,10 +184,15 @@ class SAFeCoach(BaseAgent):
         
         # Store metrics for this PI
         self.metrics[self.pi_counter] = metrics
+        self.memory.add_fact("pi_result", f"PI {self.pi_counter}: predictability {metrics.get('predictability', 'N/A')}%, "
+                                          f"business value {metrics.get('business_value', 'N/A')}, "
+                                          f"team satisfaction {metrics.get('team_satisfaction', 'N/A')}/10; "
+                                          f"achieved {', '.join(achievements) or 'nothing'}")
         
         return response
     
     # Portfolio SAFe specific methods
+    @traced(attributes=BaseAgent.span_attributes)
     def align_with_strategy(self, strategic_themes, epics, configuration="portfolio"):
         """Align work with strategic themes (Portfolio SAFe).
         
@@ -168,10 +202,10 @@ class SAFeCoach(BaseAgent):
             configuration (str): SAFe configuration level
             
         Returns:
-            dict: Mapping of epics to strategic themes with priorities
+            tuple: Alignment analysis and decision ('prioritize', 'defer' or 'reject')
         """
         if configuration not in ["portfolio", "full"]:
-            return "This function requires Portfolio or Full SAFe configuration."
+            return "This function requires Portfolio or Full SAFe configuration.", "defer"
         
         prompt = f"""
         As a SAFe Coach operating in {configuration} SAFe configuration, align these epics with strategic themes:
@@ -190,12 +224,14 @@ class SAFeCoach(BaseAgent):
         """
         
         self.conversation_history.append({"role": "user", "content": prompt})
-        response = self.generate_response(prompt)
+        reply = self.generate_structured_response(prompt, STRATEGIC_ALIGNMENT)
+        response = reply["narrative"]
         self.conversation_history.append({"role": "assistant", "content": response})
         
-        return response
+        return response, reply["decision"]
     
     # Full SAFe specific methods
+    @traced(attributes=BaseAgent.span_attributes)
     def coordinate_solution_train(self, solution_name, arts, configuration="full"):
         """Coordinate a Solution Train across multiple ARTs (Full SAFe).
         
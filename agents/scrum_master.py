@@ -1,4 +1,6 @@
 from .base_agent import BaseAgent
+from .structured_output import IMPEDIMENT_RESOLUTION, CHANGE_DECISION
+from utils.tracing import traced
 
 class ScrumMaster(BaseAgent):
     """Scrum Master agent responsible for team-level agile practices and sprint management."""
@@ -34,15 +36,12 @@ class ScrumMaster(BaseAgent):
     
     def generate_response(self, user_input):
         """Generate a response based on the Scrum Master's expertise."""
-        messages = self._prepare_conversation_history()
-        
-        if self.model_provider == "openai":
-            return self.call_openai(messages)
-        elif self.model_provider == "anthropic":
-            return self.call_anthropic(messages)
-        elif self.model_provider == "google":
-            return self.call_google(messages)
+        if self.defer_narratives:
+            return self.defer_response(user_input)
+        messages = self._prepare_conversation_history(user_input)
+        return self.call_model(messages)
     
+    @traced(attributes=BaseAgent.span_attributes)
     def start_sprint(self, pi_number, sprint_number, pi_scope):
         """Start a new sprint.
         
@@ -99,6 +98,7 @@ class ScrumMaster(BaseAgent):
         
         return sprint_backlog, response
     
+    @traced(attributes=BaseAgent.span_attributes)
     def daily_standup(self, day, team_updates):
         """Conduct a daily standup meeting.
         
@@ -132,9 +132,12 @@ class ScrumMaster(BaseAgent):
         for update in team_updates:
             if 'impediment' in update and update['impediment'] and update['impediment'] not in self.impediments:
                 self.impediments.append(update['impediment'])
+                self.memory.add_fact("impediment", f"Raised on day {day} of Sprint {self.sprint_counter} "
+                                                   f"(PI {self.current_pi}): {update['impediment']}")
         
         return self.sprint_backlog, response
     
+    @traced(attributes=BaseAgent.span_attributes)
     def resolve_impediment(self, impediment):
         """Resolve a team impediment.
         
@@ -142,7 +145,7 @@ class ScrumMaster(BaseAgent):
             impediment (str): The impediment to resolve
             
         Returns:
-            str: Resolution strategy
+            tuple: Resolution strategy and whether the impediment needs escalating to the SAFe Coach
         """
         prompt = f"""
         As a Scrum Master, address this impediment for your team:
@@ -154,18 +157,22 @@ class ScrumMaster(BaseAgent):
         2. Propose a specific strategy to resolve it
         3. Identify any stakeholders who need to be involved
         4. Suggest preventive measures for the future
+        5. Decide whether you can resolve it within the team or it must be escalated to the program level
         """
         
         self.conversation_history.append({"role": "user", "content": prompt})
-        response = self.generate_response(prompt)
+        reply = self.generate_structured_response(prompt, IMPEDIMENT_RESOLUTION)
+        response = reply["narrative"]
         self.conversation_history.append({"role": "assistant", "content": response})
         
         # Remove the impediment if it was in the list
         if impediment in self.impediments:
             self.impediments.remove(impediment)
+        self.memory.add_fact("impediment", f"Resolved in Sprint {self.sprint_counter} (PI {self.current_pi}): {impediment}")
         
-        return response
+        return response, reply["decision"] == "escalate"
     
+    @traced(attributes=BaseAgent.span_attributes)
     def end_sprint(self, completed_items):
         """Conclude a sprint with review and retrospective.
         
@@ -220,6 +227,10 @@ class ScrumMaster(BaseAgent):
         response = self.generate_response(prompt)
         self.conversation_history.append({"role": "assistant", "content": response})
         
+        self.memory.add_fact("velocity", f"Sprint {self.sprint_counter} of PI {self.current_pi}: velocity {completed_points} "
+                                         f"points, {completed} of {planned} items completed "
+                                         f"({metrics['completion_rate']:.0f}% completion)")
+        
         # Reset sprint backlog for next sprint
         self.sprint_backlog = []
         
@@ -253,6 +264,7 @@ class ScrumMaster(BaseAgent):
                 formatted += f"  Impediment: {update['impediment']}\n"
         return formatted
     
+    @traced(attributes=BaseAgent.span_attributes)
     def handle_change_request(self, change_request, current_sprint_progress):
         """Handle a mid-sprint change request.
         
@@ -261,7 +273,7 @@ class ScrumMaster(BaseAgent):
             current_sprint_progress (float): Percentage of sprint completed
             
         Returns:
-            tuple: Decision and explanation
+            tuple: Explanation and decision ('accept', 'defer' or 'reject')
         """
         prompt = f"""
         As a Scrum Master, a change request has come in during Sprint {self.sprint_counter} of PI {self.current_pi}:
@@ -282,7 +294,8 @@ class ScrumMaster(BaseAgent):
         """
         
         self.conversation_history.append({"role": "user", "content": prompt})
-        response = self.generate_response(prompt)
+        reply = self.generate_structured_response(prompt, CHANGE_DECISION)
+        response = reply["narrative"]
         self.conversation_history.append({"role": "assistant", "content": response})
         
-        return response
+        return response, reply["decision"]
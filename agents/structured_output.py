@@ -0,0 +1,135 @@
+"""Structured agent replies: a JSON object with a narrative and machine-readable fields.
+
+Simulation outcomes (whether an impediment is escalated, a change accepted,
+technical debt recorded) used to be guessed from keywords in the agents'
+prose. Methods that decide something now ask for a JSON reply described by
+a ResponseSchema, which validates it. Every schema has a "narrative" field,
+the markdown text shown to users and kept in the conversation history.
+"""
+import re
+import json
+
+NARRATIVE_DESCRIPTION = "your response in markdown, as you would give it to the team"
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+class ResponseSchema:
+    """The fields of a structured reply and how to validate them."""
+
+    def __init__(self, name, fields):
+        """Describe a structured reply.
+
+        Args:
+            name (str): Label of the schema in the metrics, e.g. 'impediment_resolution'
+            fields (dict): Field name -> (kind, description), besides the narrative. kind is
+                'list' (of strings), 'boolean' or a tuple of allowed strings whose first
+                value is the default when a reply cannot be parsed
+        """
+        self.name = name
+        self.fields = dict(fields)
+
+    def instructions(self):
+        """Format instructions appended to the system prompt."""
+        lines = ["Reply with only a JSON object, without any text or code fences around it, with these keys:",
+                 f'- "narrative": string - {NARRATIVE_DESCRIPTION}']
+        for field, (kind, description) in self.fields.items():
+            if kind == "list":
+                kind_text = "list of strings"
+            elif kind == "boolean":
+                kind_text = "true or false"
+            else:
+                kind_text = "one of " + ", ".join(f'"{value}"' for value in kind)
+            lines.append(f'- "{field}": {kind_text} - {description}')
+        return "\n".join(lines)
+
+    def defaults(self):
+        """Field values used when there is no reply to read them from."""
+        values = {}
+        for field, (kind, _) in self.fields.items():
+            if kind == "list":
+                values[field] = []
+            elif kind == "boolean":
+                values[field] = False
+            else:
+                values[field] = kind[0]
+        return values
+
+    def parse(self, text):
+        """Parse and validate a reply.
+
+        Args:
+            text (str): The model's reply
+
+        Returns:
+            dict: The narrative and every field of the schema
+
+        Raises:
+            ValueError: If the reply is not a JSON object with valid values for every field
+        """
+        text = _FENCE.sub("", (text or "").strip())
+        start, end = text.find("{"), text.rfind("}")
+        if start < 0 or end < start:
+            raise ValueError("the reply contains no JSON object")
+        try:
+            data = json.loads(text[start:end + 1])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"the reply is not valid JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise ValueError("the reply is not a JSON object")
+
+        narrative = data.get("narrative")
+        if not isinstance(narrative, str) or not narrative.strip():
+            raise ValueError('"narrative" must be a non-empty string')
+        result = {"narrative": narrative.strip()}
+        for field, (kind, _) in self.fields.items():
+            if field not in data:
+                raise ValueError(f'"{field}" is missing')
+            value = data[field]
+            if kind == "list":
+                if value is None:
+                    value = []
+                elif isinstance(value, str):
+                    value = [value]
+                if not isinstance(value, list):
+                    raise ValueError(f'"{field}" must be a list of strings')
+                value = [str(item).strip() for item in value if item is not None and str(item).strip()]
+            elif kind == "boolean":
+                if not isinstance(value, bool):
+                    raise ValueError(f'"{field}" must be true or false')
+            else:
+                value = str(value).strip().lower()
+                if value not in kind:
+                    raise ValueError(f'"{field}" must be one of {", ".join(kind)}')
+            result[field] = value
+        return result
+
+    def repair_prompt(self, error):
+        """System prompt asking a model to convert an invalid reply into the schema."""
+        return (f"The text below should have been a JSON object, but {error}. Rewrite it as one, "
+                f"keeping the wording of the text as the narrative.\n\n{self.instructions()}")
+
+    def fallback(self, text):
+        """The reply as the narrative, with default fields, when it cannot be parsed or repaired."""
+        return dict(self.defaults(), narrative=text or "")
+
+
+# Schemas of the agent methods whose replies drive the simulation
+PROGRESS_REPORT = ResponseSchema("progress_report", {
+    "impediments": ("list", "anything blocking your work, one short sentence each; empty if nothing is"),
+})
+TASK_COMPLETION = ResponseSchema("task_completion", {
+    "tech_debt": ("list", "technical debt introduced or observed, one short sentence each; empty if none"),
+})
+IMPEDIMENT_RESOLUTION = ResponseSchema("impediment_resolution", {
+    "decision": (("resolve", "escalate"),
+                 '"escalate" if the impediment needs the SAFe Coach at program level, otherwise "resolve"'),
+})
+CHANGE_DECISION = ResponseSchema("change_decision", {
+    "decision": (("defer", "accept", "reject"),
+                 '"accept" to take the change in now, "defer" to plan it later, "reject" to decline it'),
+})
+STRATEGIC_ALIGNMENT = ResponseSchema("strategic_alignment", {
+    "decision": (("defer", "prioritize", "reject"),
+                 '"prioritize" if the epics should be funded and prioritized now, "defer" or "reject" otherwise'),
+})
@@ -5,33 +5,312 @@ import logging
 import datetime
 import markdown
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, jsonify, session, send_file
-from flask_socketio import SocketIO
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import Flask, Response, render_template, request, jsonify, session, send_file, g
+from flask_socketio import SocketIO, emit, join_room, leave_room, rooms
 from markdown import markdown
 
-from safe_simulation import SAFeSimulation, create_sample_backlog
+from safe_simulation import SAFeSimulation, create_sample_backlog, expand_plan
+from utils.state_sync import StateBroadcaster
+from utils.jobs import JobManager, JobQueueFull
+from utils.simulation_store import create_simulation_store, SimulationNotFound
+from utils.file_queue import create_client_manager
+from utils.http_cache import (version_etag, content_etag, not_modified, cached_jsonify, streamed_jsonify,
+                              compress_response)
+from utils.json_provider import FastJSONProvider, resolve_backend, socketio_json
+from utils.image_manifest import CONFIG_IMAGE_NUMBERS, choose_variant, config_image_filename
+from utils.image_processor import SAFeImageProcessor, validate_image, UPLOAD_FORMATS
+from utils.image_cache import ImageCache
+from utils.semantic_cache import SemanticCache
+from utils.demo_answers import DemoAnswerStore, AGENT_TYPES, CONFIG_QUESTIONS, COT_QUESTIONS, demo_questions
+from utils.assets import AssetManifest
+from utils.speculation import Speculator
+from utils import tracing, profiling
+from utils.metrics import (REGISTRY, CONTENT_TYPE, HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_IN_FLIGHT,
+                           SOCKETIO_CONNECTIONS)
+from config import (JOB_WORKERS, JOB_QUEUE_LIMIT, RUN_PLAN_MAX_STEPS, RUN_UPDATE_INTERVAL,
+                    SOCKETIO_ASYNC_MODE, SOCKETIO_PING_INTERVAL, SOCKETIO_PING_TIMEOUT,
+                    SECRET_KEY, WORKER_ID, SIMULATION_STORE_URL, SIMULATION_STORE_LIMIT,
+                    SOCKETIO_MESSAGE_QUEUE, COMPRESS_MIN_SIZE, COMPRESS_LEVEL, JSON_BACKEND,
+                    JSON_STREAM_MIN_ITEMS, IMAGE_CACHE_MAX_BYTES, IMAGE_CACHE_REVALIDATE, UPLOAD_MAX_BYTES,
+                    UPLOAD_MAX_PIXELS, IMAGE_WORKERS, LOG_PAGE_SIZE, METRICS_ENABLED, TRACE_EXPORT,
+                    PROFILE_MODE, PROFILE_DIR, PROFILE_FRAMES, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD,
+                    DEMO_ANSWERS_PATH, DEMO_WARMUP, DEMO_REFRESH_INTERVAL, SPECULATION, SPECULATION_WORKERS)
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Initialize Flask app and SocketIO
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24).hex()  # Random secret key for sessions
-socketio = SocketIO(app)
+# Workers of a multi-process deployment must share the key to read each other's sessions
+app.config['SECRET_KEY'] = SECRET_KEY or os.urandom(24).hex()  # Random secret key for sessions
+# Werkzeug rejects larger request bodies with 413 while reading them (multipart overhead included)
+app.config['MAX_CONTENT_LENGTH'] = UPLOAD_MAX_BYTES + 64 * 1024
+
+# Fingerprinted bundles from `python utils/assets.py`, served with far-future cache headers
+assets = AssetManifest(app)
+
+# orjson-backed JSON for responses and Socket.IO, with a standard library fallback
+app.json = FastJSONProvider(app)
+app.json.backend = resolve_backend(JSON_BACKEND)
+
+# Spans for requests, jobs, simulation phases, agent methods and model calls
+tracing.configure(TRACE_EXPORT)
+
+# cProfile and tracemalloc reports of selected requests and jobs
+profiling.configure(PROFILE_MODE, PROFILE_DIR, PROFILE_FRAMES)
+
+# Fan emits out to the clients of every worker process; file:// is a local stand-in queue
+client_manager = create_client_manager(SOCKETIO_MESSAGE_QUEUE)
+socketio = SocketIO(
+    app,
+    json=socketio_json(app.json),  # Same JSON handling (e.g. dates) as HTTP responses
+    async_mode=SOCKETIO_ASYNC_MODE,
+    ping_interval=SOCKETIO_PING_INTERVAL,
+    ping_timeout=SOCKETIO_PING_TIMEOUT,
+    message_queue=None if client_manager else SOCKETIO_MESSAGE_QUEUE,
+    client_manager=client_manager
+)
+
+# Simulations by id, shared by all worker processes; each session works on its own
+simulation_store = create_simulation_store(SIMULATION_STORE_URL, max_simulations=SIMULATION_STORE_LIMIT)
+
+def current_simulation():
+    """Return the simulation bound to the current session, or None."""
+    simulation_id = session.get('simulation_id')
+    return simulation_store.get(simulation_id) if simulation_id else None
+
+@contextmanager
+def simulation_transaction(simulation_id, step=False):
+    """Lock, yield and save a simulation; raise SimulationNotFound if it has been evicted meanwhile.
+    
+    Unless the transaction runs a step through the speculator (step=True), it
+    bumps the simulation's revision, so a speculative step prefetched before
+    it is not committed over its changes.
+    """
+    with simulation_store.transaction(simulation_id) as simulation:
+        if simulation is None:
+            raise SimulationNotFound(f"Simulation {simulation_id} no longer exists")
+        if not step:
+            simulation.revision += 1
+        yield simulation
+
+@app.errorhandler(SimulationNotFound)
+def simulation_not_found(e):
+    """Answer like the handlers do when the session has no simulation."""
+    return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
+
+# Resized WebP/JPEG variants of the configuration images, generated on a process pool
+image_processor = SAFeImageProcessor(app.static_folder, max_workers=IMAGE_WORKERS)
+image_manifest = image_processor.manifest
+image_cache = ImageCache(max_bytes=IMAGE_CACHE_MAX_BYTES, revalidate_interval=IMAGE_CACHE_REVALIDATE)
+
+# /api/ask_agent answers by agent type, reused for near-duplicate questions about the same simulation state
+answer_caches = {
+    agent_type: SemanticCache(agent_type, max_entries=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD)
+    for agent_type in ('safe_coach', 'scrum_master', 'developer')
+} if SEMANTIC_CACHE_SIZE > 0 else {}
+
+def _answer_scope(simulation):
+    """Cache scope of ask_agent answers: the simulation, and its PI, sprint and day.
+    
+    Answers draw on the simulation's history, so they are not reused for other sessions or later days.
+    """
+    return (simulation.simulation_id, simulation.current_pi, simulation.current_sprint, simulation.current_day)
 
-# Global simulation instance
-simulation = None
+def _agents_by_type(simulation):
+    """The agents of a simulation by the agent_type names of the API."""
+    return {'safe_coach': simulation.safe_coach, 'scrum_master': simulation.scrum_master,
+            'developer': simulation.developer}
+
+def _demo_agents():
+    """Agents configured like those of a new simulation, for precomputing demo answers."""
+    return _agents_by_type(SAFeSimulation("essential"))
+
+# Answers to the fixed demonstration questions, precomputed by start_demo_warmup()
+demo_answers = DemoAnswerStore(DEMO_ANSWERS_PATH, _demo_agents, markdown)
+DEMO_QUESTIONS = set(demo_questions())
+
+def start_demo_warmup():
+    """Precompute the demo answers in the background now and refresh them on a schedule (called by the servers)."""
+    if DEMO_WARMUP:
+        demo_answers.start(interval=DEMO_REFRESH_INTERVAL)
+
+# Per-simulation broadcast state (log cursor, state versions, client acks) for this process
+broadcasters = OrderedDict()
+
+# Request handlers and job workers both broadcast; keep each delta contiguous
+broadcast_lock = threading.Lock()
+
+def _broadcaster(simulation_id):
+    """Return the broadcaster of a simulation, creating it on first use."""
+    if simulation_id not in broadcasters:
+        broadcasters[simulation_id] = StateBroadcaster()
+        while len(broadcasters) > SIMULATION_STORE_LIMIT:
+            broadcasters.popitem(last=False)
+    broadcasters.move_to_end(simulation_id)
+    return broadcasters[simulation_id]
+
+def _render_communication(comm):
+    """Add rendered HTML to a communication entry, once."""
+    if 'message_html' not in comm:
+        comm['message_html'] = markdown(comm['message'])
+    return comm
+
+def _render_log_delta(delta):
+    """Add rendered HTML to the communications of a log delta."""
+    for comm in delta['communications'] + delta['revised']:
+        _render_communication(comm)
+    return delta
+
+def broadcast_log_delta(simulation):
+    """Push log entries recorded since the last broadcast to the simulation room."""
+    if not simulation:
+        return
+    
+    with broadcast_lock:
+        broadcaster = _broadcaster(simulation.simulation_id)
+        if simulation.log_sequence == broadcaster.log_seq:
+            return
+        
+        delta = _render_log_delta(simulation.get_log_delta(broadcaster.log_seq, limit=LOG_PAGE_SIZE))
+        broadcaster.log_seq = delta['last_seq']
+    socketio.emit('log_delta', delta, to=simulation.simulation_id)
+
+def broadcast_state(simulation):
+    """Send each client in the simulation room a patch to the latest state."""
+    if not simulation:
+        return
+    
+    with broadcast_lock:
+        broadcaster = _broadcaster(simulation.simulation_id)
+    broadcaster.publish(simulation.get_simulation_state())
+    for sid, payload in broadcaster.payloads():
+        socketio.emit('state_patch', payload, to=sid)
+
+def _on_job_event(job, event):
+    """Relay job lifecycle events to the job's simulation room."""
+    if event == 'finished':
+        # Push what the job logged and changed before announcing the result
+        simulation = simulation_store.get(job.room)
+        broadcast_log_delta(simulation)
+        broadcast_state(simulation)
+        socketio.emit('job_finished', job.to_dict(), to=job.room)
+    else:
+        payload = job.to_dict()
+        payload.pop('result')
+        socketio.emit('job_progress', payload, to=job.room)
+
+# Bounded worker pool for long-running, LLM-bound simulation steps
+job_manager = JobManager(max_workers=JOB_WORKERS, max_queue=JOB_QUEUE_LIMIT, on_event=_on_job_event)
+
+def _enqueue_job(simulation, name, func, *args):
+    """Queue work on a simulation and answer with 202 Accepted and the job id."""
+    try:
+        job = job_manager.submit(name, func, simulation.simulation_id, *args, room=simulation.simulation_id,
+                                 owner=simulation.simulation_id)
+    except JobQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 429
+    
+    return jsonify({
+        'status': 'accepted',
+        'job': job.to_dict()
+    }), 202, {'Location': f'/api/jobs/{job.id}'}
+
+def _session_job(job_id):
+    """Return a job if it works on the current session's simulation, otherwise None."""
+    job = job_manager.get(job_id)
+    if job is None or job.owner is None or job.owner != session.get('simulation_id'):
+        return None
+    return job
+
+@app.before_request
+def start_request_timer():
+    """Track the request as in flight and note when it started."""
+    g.request_started = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    if tracing.enabled():
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.request_span = tracing.start(f"{request.method} {route}", method=request.method, route=route)
+    if request.endpoint != 'static' and profiling.requested(request.headers):
+        profile = profiling.Profile(profiling.profile_name(f"{request.endpoint or 'unmatched'}-{request.method}"))
+        if profile.start():
+            g.profile = profile
+
+@app.teardown_request
+def end_request_timer(exc):
+    """Stop tracking the request, whether or not it succeeded."""
+    if 'request_started' in g:
+        HTTP_IN_FLIGHT.dec()
+    if 'request_span' in g:
+        if exc is not None:
+            g.request_span.record_error(exc)
+        tracing.finish(g.request_span)
+    if 'profile' in g:
+        g.profile.stop()
+
+# Registered before push_updates, so it runs after it and includes compression time
+@app.after_request
+def record_request_metrics(response):
+    """Count the request and record its latency by route."""
+    if 'request_started' in g:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_DURATION.labels(request.method, endpoint).observe(time.perf_counter() - g.request_started)
+        HTTP_REQUESTS.labels(request.method, endpoint, response.status_code).inc()
+    if 'request_span' in g:
+        g.request_span.set_attributes(status=response.status_code)
+    if 'profile' in g:
+        response.headers[profiling.HEADER] = g.profile.name
+    return response
+
+@app.after_request
+def push_updates(response):
+    """Broadcast log entries and state changes produced while handling the request."""
+    # GET requests do not change the simulation, so polling skips the broadcast work
+    # (and cacheable responses such as images do not vary on the session cookie)
+    if request.method != 'GET':
+        simulation = current_simulation()
+        broadcast_log_delta(simulation)
+        broadcast_state(simulation)
+        
+        # Lets a load balancer route the session back to the worker that owns it
+        if simulation and session.get('worker_id'):
+            response.set_cookie('safe_worker', session['worker_id'], httponly=True, samesite='Lax')
+    return compress_response(response, min_size=COMPRESS_MIN_SIZE, level=COMPRESS_LEVEL)
 
 @app.route('/')
 def index():
     """Render the main page."""
-    return render_template('index.html')
+    return render_template('index.html', cot_questions=COT_QUESTIONS)
+
+@app.route('/metrics')
+def metrics():
+    """Expose the process's metrics in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        return jsonify({'status': 'error', 'message': 'Metrics are disabled'}), 404
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+# Predicted next steps of interactive simulations, run ahead of their requests
+speculator = Speculator(enabled=SPECULATION, max_workers=SPECULATION_WORKERS, max_pending=SIMULATION_STORE_LIMIT)
+
+def _run_step(simulation_id, step, progress_callback=None):
+    """Run a step requested interactively, from its speculative run if one matches, and prefetch the next."""
+    with simulation_transaction(simulation_id, step=True) as sim:
+        result = speculator.take(sim, step)
+        if result is None:
+            result = sim.run_step(step, progress_callback=progress_callback)
+        speculator.prefetch(sim, step)
+    return sim, result
 
 @app.route('/api/initialize', methods=['POST'])
 def initialize_simulation():
     """Initialize a new SAFe simulation."""
-    global simulation
-    
     data = request.json
     config = data.get('configuration', 'essential')
     project_name = data.get('project_name', 'Demo Project')
@@ -52,9 +331,12 @@ def initialize_simulation():
             "Market Expansion"
         ])
     
-    # Initialize the simulation
-    simulation = SAFeSimulation(config)
+    # Initialize the simulation and bind it to this browser session
+    simulation = SAFeSimulation(config, fast_mechanics=data.get('fast_mechanics'))
     simulation.setup_project(project_name, backlog, strategic_themes)
+    simulation_store.put(simulation)
+    session['simulation_id'] = simulation.simulation_id
+    session['worker_id'] = WORKER_ID
     
     return jsonify({
         'status': 'success',
@@ -62,13 +344,11 @@ def initialize_simulation():
         'state': simulation.get_simulation_state()
     })
 
-@app.route('/api/start_pi', methods=['POST'])
-def start_pi():
-    """Start a new Program Increment."""
-    if not simulation:
-        return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
-    
-    result = simulation.start_pi()
+def _run_start_pi(job, simulation_id):
+    """Job body for starting a Program Increment."""
+    job.check_cancelled()
+    job.report('Conducting PI Planning')
+    sim, result = _run_step(simulation_id, 'start_pi')
     
     # Convert markdown to HTML for display
     if 'planning_details' in result:
@@ -76,26 +356,31 @@ def start_pi():
     
     # Emit event to connected clients
     socketio.emit('pi_started', {
-        'pi_number': result['pi_number'],
-        'state': simulation.get_simulation_state()
-    })
+        'pi_number': result['pi_number']
+    }, to=sim.simulation_id)
     
-    return jsonify({
-        'status': 'success',
-        'data': result,
-        'state': simulation.get_simulation_state()
-    })
+    return result
+
+@app.route('/api/start_pi', methods=['POST'])
+def start_pi():
+    """Start a new Program Increment as a background job."""
+    simulation = current_simulation()
+    if not simulation:
+        return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
+    
+    return _enqueue_job(simulation, 'start_pi', _run_start_pi)
 
 @app.route('/api/start_sprint', methods=['POST'])
 def start_sprint():
     """Start a new sprint within the current PI."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
     if simulation.current_pi == 0:
         return jsonify({'status': 'error', 'message': 'Must start a PI first'}), 400
     
-    result = simulation.start_sprint()
+    simulation, result = _run_step(simulation.simulation_id, 'start_sprint')
     
     # Convert markdown to HTML for display
     if 'planning_details' in result:
@@ -104,9 +389,8 @@ def start_sprint():
     # Emit event to connected clients
     socketio.emit('sprint_started', {
         'sprint_number': result['sprint_number'],
-        'pi_number': result['pi_number'],
-        'state': simulation.get_simulation_state()
-    })
+        'pi_number': result['pi_number']
+    }, to=simulation.simulation_id)
     
     return jsonify({
         'status': 'success',
@@ -117,13 +401,14 @@ def start_sprint():
 @app.route('/api/daily_standup', methods=['POST'])
 def daily_standup():
     """Run a daily standup meeting."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
     if simulation.current_sprint == 0:
         return jsonify({'status': 'error', 'message': 'Must start a sprint first'}), 400
     
-    result = simulation.run_daily_standup()
+    simulation, result = _run_step(simulation.simulation_id, 'daily_standup')
     
     # Convert markdown to HTML for display
     if 'standup_summary' in result:
@@ -133,9 +418,8 @@ def daily_standup():
     socketio.emit('standup_completed', {
         'day': result['day'],
         'sprint': result['sprint'],
-        'pi': result['pi'],
-        'state': simulation.get_simulation_state()
-    })
+        'pi': result['pi']
+    }, to=simulation.simulation_id)
     
     return jsonify({
         'status': 'success',
@@ -143,65 +427,166 @@ def daily_standup():
         'state': simulation.get_simulation_state()
     })
 
+def _run_end_sprint(job, simulation_id):
+    """Job body for ending the current sprint."""
+    job.check_cancelled()
+    job.report('Conducting Sprint Review')
+    sim, result = _run_step(simulation_id, 'end_sprint', progress_callback=job.report)
+    
+    # Convert markdown to HTML for display
+    if 'retrospective' in result:
+        result['retrospective_html'] = markdown(result['retrospective'])
+    
+    # Emit event to connected clients
+    socketio.emit('sprint_ended', {
+        'sprint_number': result['sprint_number'],
+        'completion_rate': result['completion_rate']
+    }, to=sim.simulation_id)
+    
+    return result
+
 @app.route('/api/end_sprint', methods=['POST'])
 def end_sprint():
-    """End the current sprint."""
+    """End the current sprint as a background job."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
     if simulation.current_sprint == 0:
         return jsonify({'status': 'error', 'message': 'No active sprint to end'}), 400
     
-    result = simulation.end_sprint()
+    return _enqueue_job(simulation, 'end_sprint', _run_end_sprint)
+
+def _run_end_pi(job, simulation_id):
+    """Job body for ending the current Program Increment."""
+    job.check_cancelled()
+    job.report('Conducting System Demo and Inspect & Adapt')
+    sim, result = _run_step(simulation_id, 'end_pi')
     
     # Convert markdown to HTML for display
-    if 'retrospective' in result:
-        result['retrospective_html'] = markdown(result['retrospective'])
+    if 'inspect_and_adapt' in result:
+        result['inspect_and_adapt_html'] = markdown(result['inspect_and_adapt'])
     
     # Emit event to connected clients
-    socketio.emit('sprint_ended', {
-        'sprint_number': result['sprint_number'],
-        'completion_rate': result['completion_rate'],
-        'state': simulation.get_simulation_state()
-    })
+    socketio.emit('pi_ended', {
+        'pi_number': result['pi_number'],
+        'predictability': result['metrics']['predictability']
+    }, to=sim.simulation_id)
     
-    return jsonify({
-        'status': 'success',
-        'data': result,
-        'state': simulation.get_simulation_state()
-    })
+    return result
 
 @app.route('/api/end_pi', methods=['POST'])
 def end_pi():
-    """End the current Program Increment."""
+    """End the current Program Increment as a background job."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
     if simulation.current_pi == 0:
         return jsonify({'status': 'error', 'message': 'No active PI to end'}), 400
     
-    result = simulation.end_pi()
+    return _enqueue_job(simulation, 'end_pi', _run_end_pi)
+
+# Narrative fields left out of run summaries; the full text is in the communication log
+NARRATIVE_FIELDS = ('planning_details', 'standup_summary', 'retrospective', 'inspect_and_adapt')
+
+def _run_plan(job, simulation_id, steps):
+    """Job body for executing a run plan one step at a time."""
+    summaries = []
+    last_push = time.monotonic()
     
-    # Convert markdown to HTML for display
-    if 'inspect_and_adapt' in result:
-        result['inspect_and_adapt_html'] = markdown(result['inspect_and_adapt'])
+    for index, step in enumerate(steps):
+        job.check_cancelled()
+        job.report(f"Running {step.replace('_', ' ')}", step=index + 1, total=len(steps), current_step=step)
+        with simulation_transaction(simulation_id) as sim:
+            result = sim.run_step(step)
+        
+        summary = {key: value for key, value in result.items() if key not in NARRATIVE_FIELDS}
+        summary['step'] = step
+        summaries.append(summary)
+        
+        # Coalesce intermediate updates instead of pushing after every step
+        if time.monotonic() - last_push >= RUN_UPDATE_INTERVAL:
+            broadcast_log_delta(sim)
+            broadcast_state(sim)
+            last_push = time.monotonic()
     
-    # Emit event to connected clients
-    socketio.emit('pi_ended', {
-        'pi_number': result['pi_number'],
-        'predictability': result['metrics']['predictability'],
-        'state': simulation.get_simulation_state()
-    })
+    return {
+        'steps_completed': len(steps),
+        'results': summaries
+    }
+
+@app.route('/api/run', methods=['POST'])
+def run_plan():
+    """Run a whole plan (e.g. a full PI) server-side as a single background job."""
+    simulation = current_simulation()
+    if not simulation:
+        return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
+    data = request.json or {}
+    try:
+        steps = expand_plan(data.get('plan'), max_steps=RUN_PLAN_MAX_STEPS)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    return _enqueue_job(simulation, 'run', _run_plan, steps)
+
+def broadcast_narratives(simulation, communications):
+    """Send the communications whose deferred narrative was generated to the simulation room."""
+    if communications:
+        socketio.emit('narratives_rendered', {
+            'simulation_id': simulation.simulation_id,
+            'communications': [_render_communication(comm) for comm in communications]
+        }, to=simulation.simulation_id)
+
+@app.route('/api/narratives/<key>', methods=['POST'])
+def render_narrative(key):
+    """Generate a deferred narrative of a fast mechanics simulation when a user opens it."""
+    simulation = current_simulation()
+    if not simulation:
+        return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
+    
+    with simulation_transaction(simulation.simulation_id) as simulation:
+        communications = simulation.render_narrative(key)
+    if not communications:
+        return jsonify({'status': 'error', 'message': 'No pending narrative with this key'}), 404
+    
+    broadcast_narratives(simulation, communications)
     return jsonify({
         'status': 'success',
-        'data': result,
-        'state': simulation.get_simulation_state()
+        'data': communications
     })
 
+def _run_render_narratives(job, simulation_id):
+    """Job body for generating every deferred narrative, one transaction per narrative."""
+    simulation = simulation_store.get(simulation_id)
+    if simulation is None:
+        raise SimulationNotFound(f"Simulation {simulation_id} no longer exists")
+    keys = simulation.pending_narratives()
+    rendered = 0
+    for index, key in enumerate(keys):
+        job.check_cancelled()
+        job.report('Generating deferred narratives', completed=index, total=len(keys))
+        with simulation_transaction(simulation_id) as sim:
+            communications = sim.render_narrative(key)
+        broadcast_narratives(sim, communications)
+        rendered += bool(communications)
+    
+    return {'rendered': rendered}
+
+@app.route('/api/narratives/render', methods=['POST'])
+def render_narratives():
+    """Generate every deferred narrative in the background."""
+    simulation = current_simulation()
+    if not simulation:
+        return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
+    
+    return _enqueue_job(simulation, 'render_narratives', _run_render_narratives)
+
 @app.route('/api/change_request', methods=['POST'])
 def handle_change_request():
     """Process a change request."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
@@ -214,7 +599,8 @@ def handle_change_request():
         'strategic': data.get('strategic', False)
     }
     
-    result = simulation.handle_change_request(change_request)
+    with simulation_transaction(simulation.simulation_id) as simulation:
+        result = simulation.handle_change_request(change_request)
     
     # Convert markdown to HTML for display
     if 'response' in result:
@@ -228,9 +614,8 @@ def handle_change_request():
     socketio.emit('change_processed', {
         'change': change_request['description'],
         'accepted': result.get('accepted', False),
-        'handler': result.get('handler', 'Unknown'),
-        'state': simulation.get_simulation_state()
-    })
+        'handler': result.get('handler', 'Unknown')
+    }, to=simulation.simulation_id)
     
     return jsonify({
         'status': 'success',
@@ -241,13 +626,15 @@ def handle_change_request():
 @app.route('/api/technical_guidance', methods=['POST'])
 def get_technical_guidance():
     """Get technical guidance from the Developer agent."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
     data = request.json
     topic = data.get('topic', 'general technical approach')
     
-    response = simulation.get_technical_guidance(topic)
+    with simulation_transaction(simulation.simulation_id) as simulation:
+        response = simulation.get_technical_guidance(topic)
     
     return jsonify({
         'status': 'success',
@@ -259,52 +646,134 @@ def get_technical_guidance():
         'state': simulation.get_simulation_state()
     })
 
+def _log_page(simulation, log_name):
+    """Serve one page of a log addressed by the ?after= / ?before= sequence cursors."""
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+    limit = max(1, min(request.args.get('limit', LOG_PAGE_SIZE, type=int), LOG_PAGE_SIZE))
+    etag = version_etag(log_name, simulation.simulation_id, simulation.log_sequence, after, before, limit)
+    response = not_modified(etag)
+    if response:
+        return response
+    
+    page = simulation.get_log_page(log_name, after=after, before=before, limit=limit)
+    if log_name == 'communications':
+        for comm in page['entries']:
+            _render_communication(comm)
+    
+    return cached_jsonify(etag, {
+        'status': 'success',
+        'data': page['entries'],
+        'has_more': page['has_more'],
+        'total': page['total']
+    })
+
 @app.route('/api/events', methods=['GET'])
 def get_events():
-    """Get the simulation event log."""
+    """Get the simulation event log, or one page of it with ?after= or ?before=."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
+    if 'after' in request.args or 'before' in request.args:
+        return _log_page(simulation, 'events')
+    
+    # The log only grows, and every entry bumps the sequence number
     limit = request.args.get('limit', type=int)
+    etag = version_etag('events', simulation.simulation_id, simulation.log_sequence, limit)
+    response = not_modified(etag)
+    if response:
+        return response
+    
     events = simulation.get_events_log(limit)
+    if len(events) >= JSON_STREAM_MIN_ITEMS:
+        return streamed_jsonify(etag, {'status': 'success'}, 'data', events, level=COMPRESS_LEVEL)
     
-    return jsonify({
+    return cached_jsonify(etag, {
         'status': 'success',
         'data': events
     })
 
 @app.route('/api/communications', methods=['GET'])
 def get_communications():
-    """Get the simulation communication log."""
+    """Get the simulation communication log, or one page of it with ?after= or ?before=."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
+    if 'after' in request.args or 'before' in request.args:
+        return _log_page(simulation, 'communications')
+    
     limit = request.args.get('limit', type=int)
+    etag = version_etag('communications', simulation.simulation_id, simulation.log_sequence, limit)
+    response = not_modified(etag)
+    if response:
+        return response
+    
     communications = simulation.get_communication_log(limit)
+    if len(communications) >= JSON_STREAM_MIN_ITEMS:
+        # Render markdown batch by batch as the response streams out
+        return streamed_jsonify(etag, {'status': 'success'}, 'data', communications,
+                                transform=_render_communication, level=COMPRESS_LEVEL)
     
-    # Convert markdown to HTML for display
+    # Convert markdown to HTML for display (entries pushed as deltas are already rendered)
     for comm in communications:
-        comm['message_html'] = markdown(comm['message'])
+        _render_communication(comm)
     
-    return jsonify({
+    return cached_jsonify(etag, {
         'status': 'success',
         'data': communications
     })
 
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the status, progress and result of a background job."""
+    job = _session_job(job_id)
+    if not job:
+        return jsonify({'status': 'error', 'message': f'Unknown job: {job_id}'}), 404
+    
+    return jsonify({
+        'status': 'success',
+        'data': job.to_dict()
+    })
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running job before its next step."""
+    if not _session_job(job_id):
+        return jsonify({'status': 'error', 'message': f'Unknown job: {job_id}'}), 404
+    
+    if not job_manager.cancel(job_id):
+        return jsonify({'status': 'error', 'message': 'Job has already finished'}), 409
+    
+    return jsonify({
+        'status': 'success',
+        'data': job_manager.get(job_id).to_dict()
+    })
+
 @app.route('/api/state', methods=['GET'])
 def get_state():
     """Get the current state of the simulation."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
-    return jsonify({
+    # Metrics can change between log entries, so the state ETag hashes the (small) state itself
+    state = simulation.get_simulation_state()
+    etag = version_etag('state', simulation.log_sequence, content_etag(state))
+    response = not_modified(etag)
+    if response:
+        return response
+    
+    return cached_jsonify(etag, {
         'status': 'success',
-        'data': simulation.get_simulation_state()
+        'data': state
     })
 
 @app.route('/api/ask_agent', methods=['POST'])
 def ask_agent():
     """Ask a specific agent a question."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
@@ -315,44 +784,50 @@ def ask_agent():
     if not agent_type or not question:
         return jsonify({'status': 'error', 'message': 'Missing agent_type or question'}), 400
     
-    # Get the right agent based on type
-    agent = None
-    if agent_type == 'safe_coach':
-        agent = simulation.safe_coach
-    elif agent_type == 'scrum_master':
-        agent = simulation.scrum_master
-    elif agent_type == 'developer':
-        agent = simulation.developer
-    else:
+    if agent_type not in AGENT_TYPES:
         return jsonify({'status': 'error', 'message': f'Unknown agent type: {agent_type}'}), 400
     
-    # Generate the response from the agent
+    # Generate the response from the agent, unless a near-identical question was answered before
     try:
-        response = agent.generate_response(question)
+        with simulation_transaction(simulation.simulation_id) as simulation:
+            agent = _agents_by_type(simulation)[agent_type]
+            cache = answer_caches.get(agent_type)
+            scope = _answer_scope(simulation)
+            cached = cache.get(question, scope) if cache else None
+            if cached:
+                response = cached.answer
+            else:
+                response = agent.generate_response(question)
+                if cache:
+                    cache.put(question, response, scope)
+            
+            # Add the communication to the simulation log
+            simulation.log_communication('User', agent_type, question)
+            simulation.log_communication(agent_type, 'User', response)
+            
+            # Log the interaction as an event
+            simulation.log_event(f'Question to {agent_type}', question)
         
         # Convert markdown to HTML for display
         response_html = markdown(response)
         
-        # Add the communication to the simulation log
-        simulation.add_communication('User', agent_type, question)
-        simulation.add_communication(agent_type, 'User', response)
-        
-        # Log the interaction as an event
-        simulation.add_event(f'Question to {agent_type}', question)
-        
         return jsonify({
             'status': 'success',
             'response': response,
             'response_html': response_html,
-            'timestamp': simulation.current_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'cached': {'question': cached.question, 'similarity': cached.similarity} if cached else None,
+            'timestamp': simulation.communication_log[-1]['datetime'],
             'state': simulation.get_simulation_state()
         })
+    except SimulationNotFound:
+        raise
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/api/demonstrate_safe_config', methods=['POST'])
 def demonstrate_safe_configuration():
     """Demonstrate a specific SAFe configuration with step-by-step explanations from all agents."""
+    simulation = current_simulation()
     if not simulation:
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
@@ -362,141 +837,93 @@ def demonstrate_safe_configuration():
     if not config_type:
         return jsonify({'status': 'error', 'message': 'Missing config_type'}), 400
     
-    # Get all three agents
-    safe_coach = simulation.safe_coach
-    scrum_master = simulation.scrum_master
-    developer = simulation.developer
-    
-    # Define the configuration-specific questions
-    config_questions = {
-        'big_picture': {
-            'safe_coach': 'Explain the SAFe Big Picture configuration. What are the key components and how do they work together?',
-            'scrum_master': 'How would you use the SAFe Big Picture to help teams understand their place in the organization?',
-            'developer': 'From a developer perspective, what aspects of the SAFe Big Picture are most relevant to your daily work?'
-        },
-        'core_competencies': {
-            'safe_coach': 'Explain the Core Competencies in SAFe and why they are important for business agility.',
-            'scrum_master': 'How would you help teams develop these core competencies in their daily practices?',
-            'developer': 'Which core competencies directly impact development teams and how can developers contribute to them?'
-        },
-        'essential': {
-            'safe_coach': 'Explain the Essential SAFe configuration. What are the minimal elements needed for SAFe implementation?',
-            'scrum_master': 'How would you implement Essential SAFe practices in a team that is new to SAFe?',
-            'developer': 'What changes would developers experience when moving from traditional development to Essential SAFe?'
-        },
-        'large_solution': {
-            'safe_coach': 'Explain the Large Solution SAFe configuration. How does it extend Essential SAFe?',
-            'scrum_master': 'What additional ceremonies and practices would you introduce when scaling to Large Solution SAFe?',
-            'developer': 'How does development work change when moving from Essential to Large Solution SAFe?'
-        },
-        'portfolio': {
-            'safe_coach': 'Explain the Portfolio SAFe configuration. How does it help align strategy with execution?',
-            'scrum_master': 'How would you explain the connection between portfolio-level decisions and team-level work?',
-            'developer': 'How do portfolio-level concerns like strategic themes affect developers in their daily work?'
-        },
-        'full': {
-            'safe_coach': 'Explain the Full SAFe configuration. What challenges does it address for the largest enterprises?',
-            'scrum_master': 'What are the key challenges when implementing Full SAFe and how would you address them?',
-            'developer': 'How do developers maintain agility and avoid bureaucracy in a Full SAFe implementation?'
-        }
-    }
+    if config_type not in CONFIG_QUESTIONS:
+        return jsonify({'status': 'error', 'message': f'Unknown config_type: {config_type}'}), 400
     
     try:
-        # Generate responses from each agent
-        coach_response = safe_coach.generate_chain_of_thought_response(config_questions[config_type]['safe_coach'])
-        scrum_master_response = scrum_master.generate_chain_of_thought_response(config_questions[config_type]['scrum_master'])
-        developer_response = developer.generate_chain_of_thought_response(config_questions[config_type]['developer'])
-        
-        # Convert markdown to HTML for display
-        coach_thought_html = [markdown.markdown(step) for step in coach_response['thought_process']]
-        coach_conclusion_html = markdown.markdown(coach_response['conclusion'])
-        
-        sm_thought_html = [markdown.markdown(step) for step in scrum_master_response['thought_process']]
-        sm_conclusion_html = markdown.markdown(scrum_master_response['conclusion'])
-        
-        dev_thought_html = [markdown.markdown(step) for step in developer_response['thought_process']]
-        dev_conclusion_html = markdown.markdown(developer_response['conclusion'])
-        
-        # Log the interaction
-        simulation.add_event(f"SAFe {config_type.capitalize()} Configuration Demonstration", "All agents provided explanations")
+        with simulation_transaction(simulation.simulation_id) as simulation:
+            agents = _agents_by_type(simulation)
+            
+            # Precomputed answers are served at once; only missing ones call the models
+            answers = {}
+            for agent_type, question in CONFIG_QUESTIONS[config_type].items():
+                entry, source = demo_answers.answer(agent_type, agents[agent_type], question)
+                answers[agent_type] = {
+                    'thought_process': entry['thought_process'],
+                    'thought_process_html': entry['thought_process_html'],
+                    'conclusion': entry['conclusion'],
+                    'conclusion_html': entry['conclusion_html'],
+                    'source': source
+                }
+            
+            # Log the interaction
+            simulation.log_event(f"SAFe {config_type.capitalize()} Configuration Demonstration", "All agents provided explanations")
         
         return jsonify({
             'status': 'success',
             'config_type': config_type,
-            'coach': {
-                'thought_process': coach_response['thought_process'],
-                'thought_process_html': coach_thought_html,
-                'conclusion': coach_response['conclusion'],
-                'conclusion_html': coach_conclusion_html
-            },
-            'scrum_master': {
-                'thought_process': scrum_master_response['thought_process'],
-                'thought_process_html': sm_thought_html,
-                'conclusion': scrum_master_response['conclusion'],
-                'conclusion_html': sm_conclusion_html
-            },
-            'developer': {
-                'thought_process': developer_response['thought_process'],
-                'thought_process_html': dev_thought_html,
-                'conclusion': developer_response['conclusion'],
-                'conclusion_html': dev_conclusion_html
-            },
-            'timestamp': simulation.current_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'coach': answers['safe_coach'],
+            'scrum_master': answers['scrum_master'],
+            'developer': answers['developer'],
+            'timestamp': simulation.events_log[-1]['datetime'],
             'state': simulation.get_simulation_state()
         })
+    except SimulationNotFound:
+        raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("SAFe configuration demonstration failed")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/api/demonstrate_cot', methods=['POST'])
 def demonstrate_cot():
     """Demonstrate Chain of Thought reasoning for a specific agent."""
-    print("\n[DEBUG] /api/demonstrate_cot endpoint called")
+    logger.debug("/api/demonstrate_cot endpoint called")
+    simulation = current_simulation()
     if not simulation:
-        print("[DEBUG] Error: Simulation not initialized")
+        logger.debug("demonstrate_cot: simulation not initialized")
         return jsonify({'status': 'error', 'message': 'Simulation not initialized'}), 400
     
     data = request.json
-    print(f"[DEBUG] Request data: {data}")
+    logger.debug("demonstrate_cot request data: %s", data)
     agent_type = data.get('agent_type')  # 'safe_coach', 'scrum_master', or 'developer'
     question = data.get('question')
     
     if not agent_type or not question:
-        print(f"[DEBUG] Error: Missing agent_type or question. agent_type: {agent_type}, question: {question}")
+        logger.debug("demonstrate_cot: missing agent_type or question (agent_type=%r, question=%r)",
+                     agent_type, question)
         return jsonify({'status': 'error', 'message': 'Missing agent_type or question'}), 400
     
-    # Get the right agent based on type
-    agent = None
-    if agent_type == 'safe_coach':
-        agent = simulation.safe_coach
-    elif agent_type == 'scrum_master':
-        agent = simulation.scrum_master
-    elif agent_type == 'developer':
-        agent = simulation.developer
-    else:
-        print(f"[DEBUG] Error: Unknown agent type: {agent_type}")
+    if agent_type not in AGENT_TYPES:
+        logger.debug("demonstrate_cot: unknown agent type %r", agent_type)
         return jsonify({'status': 'error', 'message': f'Unknown agent type: {agent_type}'}), 400
     
-    print(f"[DEBUG] Using agent: {agent_type}, Question: {question}")
+    logger.debug("demonstrate_cot using agent %s for question %r", agent_type, question)
     
     # Generate the chain of thought response from the agent
     try:
-        print("[DEBUG] Calling generate_chain_of_thought_response")
-        cot_response = agent.generate_chain_of_thought_response(question)
-        print(f"[DEBUG] Response received: {str(cot_response)[:200]}...")
-        
-        # Convert markdown to HTML for display
-        print("[DEBUG] Converting to HTML")
-        thought_process_html = [markdown.markdown(step) for step in cot_response['thought_process']]
-        conclusion_html = markdown.markdown(cot_response['conclusion'])
-        
-        # Add the communication to the simulation log
-        simulation.add_communication('User', agent.role, question)
-        simulation.add_communication(agent.role, 'User', cot_response['conclusion'])
-        
-        # Log the interaction as an event
-        simulation.add_event(f"CoT Question to {agent.role}", question)
+        with simulation_transaction(simulation.simulation_id) as simulation:
+            agent = _agents_by_type(simulation)[agent_type]
+            if (agent_type, question) in DEMO_QUESTIONS:
+                # One of the questions offered on the page: served precomputed when possible
+                cot_response, source = demo_answers.answer(agent_type, agent, question)
+                thought_process_html = cot_response['thought_process_html']
+                conclusion_html = cot_response['conclusion_html']
+            else:
+                logger.debug("Calling generate_chain_of_thought_response")
+                cot_response = agent.generate_chain_of_thought_response(question)
+                logger.debug("Chain of thought response received: %.200s", cot_response)
+                source = 'live'
+                
+                # Convert markdown to HTML for display
+                thought_process_html = [markdown(step) for step in cot_response['thought_process']]
+                conclusion_html = markdown(cot_response['conclusion'])
+            
+            # Add the communication to the simulation log
+            simulation.log_communication('User', agent.role, question)
+            simulation.log_communication(agent.role, 'User', cot_response['conclusion'])
+            
+            # Log the interaction as an event
+            simulation.log_event(f"CoT Question to {agent.role}", question)
         
         response_data = {
             'status': 'success',
@@ -506,86 +933,223 @@ def demonstrate_cot():
             'thought_process_html': thought_process_html,
             'conclusion': cot_response['conclusion'],
             'conclusion_html': conclusion_html,
-            'timestamp': simulation.current_time.strftime('%Y-%m-%d %H:%M:%S'),
+            'source': source,
+            'timestamp': simulation.events_log[-1]['datetime'],
             'state': simulation.get_simulation_state()
         }
-        print("[DEBUG] Sending successful response")
+        logger.debug("demonstrate_cot sending successful response")
         return jsonify(response_data)
+    except SimulationNotFound:
+        raise
     except Exception as e:
-        import traceback
-        print("[DEBUG] Error in Chain of Thought generation:")
-        traceback.print_exc()
+        logger.exception("Chain of Thought generation failed")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def _on_config_image_processed(config_type, result):
+    """Serve the new variants and tell clients once an uploaded image is processed."""
+    image_cache.invalidate(config_type)
+    socketio.emit('config_image_updated', {
+        'config_type': config_type,
+        'success': result['success'],
+        'url': f"/api/safe_config_image/{config_type}"
+    })
+
 @app.route('/api/upload_safe_config_image/<config_type>', methods=['POST'])
 def upload_safe_config_image(config_type):
     """Upload a SAFe configuration image."""
+    # Validate config_type before reading the body
+    if config_type not in CONFIG_IMAGE_NUMBERS:
+        return jsonify({'status': 'error', 'message': 'Invalid configuration type'}), 400
+    
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'status': 'error', 'message': 'Image is too large'}), 413
+    
     if not request.files or 'image' not in request.files:
         return jsonify({'status': 'error', 'message': 'No image provided'}), 400
         
     file = request.files['image']
     if file.filename == '':
         return jsonify({'status': 'error', 'message': 'No image selected'}), 400
+    
+    # Ensure directory exists
+    config_dir = os.path.join(app.static_folder, 'images', 'safe_configurations')
+    os.makedirs(config_dir, exist_ok=True)
+    
+    # Werkzeug has already spooled the body (bounded by MAX_CONTENT_LENGTH); save it next to its
+    # destination so the final rename is atomic
+    fd, temp_path = tempfile.mkstemp(dir=config_dir, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            file.save(temp_file)
+            size = temp_file.tell()
+        if size > UPLOAD_MAX_BYTES:
+            os.unlink(temp_path)
+            return jsonify({'status': 'error', 'message': 'Image is too large'}), 413
         
-    if file:
-        # Validate config_type
-        valid_configs = ['big_picture', 'core_competencies', 'essential', 'large_solution', 'portfolio', 'full']
-        if config_type not in valid_configs:
-            return jsonify({'status': 'error', 'message': 'Invalid configuration type'}), 400
-            
-        # Ensure directory exists
-        config_dir = os.path.join(app.static_folder, 'images', 'safe_configurations')
-        os.makedirs(config_dir, exist_ok=True)
-        
-        # Save file
-        filename = f"{config_type}.jpg"
-        file_path = os.path.join(config_dir, filename)
-        file.save(file_path)
-        
-        return jsonify({
-            'status': 'success', 
-            'message': 'Image uploaded successfully',
-            'path': f"/static/images/safe_configurations/{filename}"
-        })
-        
-    return jsonify({'status': 'error', 'message': 'Failed to upload image'}), 500
+        image_format, width, height = validate_image(temp_path, max_pixels=UPLOAD_MAX_PIXELS)
+    except ValueError as e:
+        os.unlink(temp_path)
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    
+    filename = f"{config_type}.{UPLOAD_FORMATS[image_format]}"
+    file_path = os.path.join(config_dir, filename)
+    os.replace(temp_path, file_path)
+    
+    # Decoding and resizing happen in a worker process; clients get config_image_updated when done
+    image_processor.submit_configuration_image(config_type, file_path, callback=_on_config_image_processed)
+    
+    return jsonify({
+        'status': 'success', 
+        'message': 'Image uploaded successfully; variants are being generated',
+        'path': f"/static/images/safe_configurations/{filename}",
+        'width': width,
+        'height': height
+    })
 
 @app.route('/api/safe_config_image/<config_type>')
 def get_safe_config_image(config_type):
     """Return a SAFe configuration image."""
-    # Validate config_type
-    valid_configs = ['big_picture', 'core_competencies', 'essential', 'large_solution', 'portfolio', 'full']
-    if config_type not in valid_configs:
+    # Validate config_type against the same list as uploads and the variant manifest
+    if config_type not in CONFIG_IMAGE_NUMBERS:
         return jsonify({'status': 'error', 'message': 'Invalid configuration type'}), 400
     
-    # Map the config_type to a specific file number (based on the order of images provided)
-    config_map = {
-        'big_picture': 1,      # Image 1
-        'core_competencies': 2, # Image 2
-        'essential': 3,         # Image 3
-        'large_solution': 4,    # Image 4
-        'portfolio': 5,         # Image 5
-        'full': 6               # Image 6
-    }
-    
-    img_num = config_map[config_type]
-    img_path = os.path.join(app.static_folder, f"images/safe_config_{img_num}.jpg")
+    # Serve the best pre-built variant for the client's format support and display width
+    accept_webp = any(mimetype == 'image/webp' and quality > 0 for mimetype, quality in request.accept_mimetypes)
+    width = request.args.get('w', type=int)
+    variant = choose_variant(image_manifest.get(config_type), accept_webp=accept_webp, width=width)
+    if variant:
+        image = image_cache.get((config_type, variant['file']),
+                                os.path.join(image_manifest.images_dir, variant['file']), variant['mimetype'])
+        if image:
+            response = _send_cached_image(image)
+            response.vary.add('Accept')
+            # Permanent URL of this exact variant, for clients that want to cache it forever
+            response.headers['Content-Location'] = f"/api/safe_config_image/{config_type}/{variant['file']}"
+            return response
     
     # Return the image if it exists, otherwise return a default image
-    if os.path.exists(img_path):
-        return send_file(img_path, mimetype='image/jpeg')
-    else:
+    image = image_cache.get((config_type, 'original'),
+                            os.path.join(app.static_folder, "images", config_image_filename(config_type)), 'image/jpeg')
+    if image is None:
         # Return a default image from the static folder
-        default_img = os.path.join(app.static_folder, "images/default_safe_config.jpg")
-        return send_file(default_img, mimetype='image/jpeg')
+        image = image_cache.get(('default', 'original'),
+                                os.path.join(app.static_folder, "images/default_safe_config.jpg"), 'image/jpeg')
+    if image is None:
+        return jsonify({'status': 'error', 'message': 'Image not found'}), 404
+    return _send_cached_image(image)
+
+@app.route('/api/safe_config_image/<config_type>/<path:variant_file>')
+def get_safe_config_image_variant(config_type, variant_file):
+    """Return one content-hashed variant of a SAFe configuration image."""
+    entry = image_manifest.get(config_type)
+    variant = next((v for v in (entry or {}).get('variants', []) if v['file'] == variant_file), None)
+    if not variant:
+        return jsonify({'status': 'error', 'message': 'Unknown image variant'}), 404
+    
+    image = image_cache.get((config_type, variant_file),
+                            os.path.join(image_manifest.images_dir, variant_file), variant['mimetype'])
+    if image is None:
+        return jsonify({'status': 'error', 'message': 'Unknown image variant'}), 404
+    # The filename contains a hash of the content, so the URL never changes meaning
+    return _send_cached_image(image, immutable=True)
+
+def _send_cached_image(image, immutable=False):
+    """Build a conditional (304-capable) response for a cached image."""
+    response = app.response_class(image.data, mimetype=image.mimetype)
+    response.set_etag(image.etag)
+    response.last_modified = image.mtime_ns / 1e9
+    if immutable:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def _join_simulation_room(simulation):
+    """Move the current client into the room of the given simulation."""
+    for room in rooms():
+        if room != request.sid:
+            leave_room(room)
+    join_room(simulation.simulation_id)
+    
+    # Later handlers on this connection use the Socket.IO session's simulation
+    session['simulation_id'] = simulation.simulation_id
+    
+    # New members start from the full state and receive patches once they ack it
+    with broadcast_lock:
+        broadcaster = _broadcaster(simulation.simulation_id)
+    broadcaster.publish(simulation.get_simulation_state())
+    broadcaster.register(request.sid)
+    emit('simulation_state', broadcaster.full_state())
 
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection to WebSocket."""
+    SOCKETIO_CONNECTIONS.inc()
+    simulation = current_simulation()
     if simulation:
-        socketio.emit('simulation_state', {
-            'state': simulation.get_simulation_state()
-        })
+        _join_simulation_room(simulation)
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    """Stop tracking state acknowledgements for a disconnected client."""
+    SOCKETIO_CONNECTIONS.dec()
+    with broadcast_lock:
+        for broadcaster in broadcasters.values():
+            broadcaster.forget(request.sid)
+
+@socketio.on('join_simulation')
+def handle_join_simulation(data):
+    """Subscribe the client to updates for a specific simulation."""
+    simulation_id = (data or {}).get('simulation_id')
+    try:
+        simulation = simulation_store.get(simulation_id) if simulation_id else None
+    except ValueError:
+        simulation = None
+    if simulation:
+        _join_simulation_room(simulation)
+
+@socketio.on('state_ack')
+def handle_state_ack(data):
+    """Record the state version a client has applied."""
+    simulation_id = session.get('simulation_id')
+    with broadcast_lock:
+        broadcaster = broadcasters.get(simulation_id)
+    if broadcaster and isinstance(data, dict):
+        broadcaster.ack(request.sid, data.get('version'))
+
+@socketio.on('state_resync')
+def handle_state_resync():
+    """Send the full state to a client whose copy could not be patched."""
+    simulation = current_simulation()
+    if simulation:
+        with broadcast_lock:
+            broadcaster = _broadcaster(simulation.simulation_id)
+        broadcaster.publish(simulation.get_simulation_state())
+        emit('simulation_state', broadcaster.full_state())
+
+@socketio.on('resume')
+def handle_resume(data):
+    """Send a reconnecting client the log entries it has not seen yet."""
+    simulation = current_simulation()
+    if not simulation:
+        return
+    
+    if not isinstance(data, dict):
+        data = {}
+    since = data.get('since')
+    if not isinstance(since, int) or isinstance(since, bool) or since < 0:
+        since = 0
+    
+    # Clients from a previous simulation, or ahead of it, get the full log
+    if data.get('simulation_id') != simulation.simulation_id or since > simulation.log_sequence:
+        since = 0
+    
+    # Long gaps are cut to the newest page; the client pages older entries in on scroll
+    emit('log_delta', _render_log_delta(simulation.get_log_delta(since, limit=LOG_PAGE_SIZE)))
 
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
@@ -596,4 +1160,5 @@ if __name__ == '__main__':
     if not os.path.exists('static'):
         os.makedirs('static')
         
+    start_demo_warmup()
     socketio.run(app, debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,124 @@
+"""Compare JSON serialization backends on the API's largest payloads.
+
+Builds a simulation with a large synthetic log (no LLM calls), then for each
+backend (stdlib, and orjson if installed) times:
+
+* serializing each endpoint's payload directly, and
+* full GET requests to /api/state, /api/events and /api/communications through
+  the Flask test client, with lists above SAFE_JSON_STREAM_MIN_ITEMS streamed.
+
+    python benchmarks/json_serialization.py --entries 5000 --repeat 20
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app, simulation_store, _render_communication
+from safe_simulation import SAFeSimulation, create_sample_backlog
+from utils.json_provider import orjson, dumps_bytes
+
+MESSAGE = """## Sprint Update
+
+- **Completed**: user authentication flow, password reset
+- **In progress**: dashboard widgets (`chart.js` integration)
+- **Blocked**: waiting on API keys for the payment sandbox
+
+| Story | Points | Status |
+|-------|--------|--------|
+| Login | 5 | Done |
+| Reset | 3 | Done |
+| Widgets | 8 | In Progress |
+"""
+
+
+def build_simulation(entries):
+    """Create a simulation with `entries` events and communications."""
+    simulation = SAFeSimulation("full")
+    simulation.setup_project("Benchmark Project", create_sample_backlog())
+    for index in range(entries):
+        simulation.log_event("Daily Standup", f"Day {index} standup completed with 3 updates")
+        simulation.log_communication("Scrum Master", "Team", f"{MESSAGE}\nEntry {index}")
+    for comm in simulation.communication_log:
+        _render_communication(comm)
+    return simulation
+
+
+def time_call(func, repeat):
+    """Return per-call durations in milliseconds."""
+    durations = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - started) * 1000)
+    return durations
+
+
+def summarize(durations):
+    """Median and min of a list of durations."""
+    return {'median_ms': round(statistics.median(durations), 3), 'min_ms': round(min(durations), 3)}
+
+
+def run(args):
+    """Time every backend on every endpoint."""
+    simulation = build_simulation(args.entries)
+    simulation_store.put(simulation)
+    payloads = {
+        '/api/state': {'status': 'success', 'data': simulation.get_simulation_state()},
+        '/api/events': {'status': 'success', 'data': simulation.get_events_log()},
+        '/api/communications': {'status': 'success', 'data': simulation.get_communication_log()},
+    }
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['simulation_id'] = simulation.simulation_id
+
+    backends = ['stdlib'] + (['orjson'] if orjson is not None else [])
+    report = {'entries': args.entries, 'repeat': args.repeat, 'backends': {}}
+    for backend in backends:
+        app.json.backend = backend
+        results = {}
+        for url, payload in payloads.items():
+            body_size = len(dumps_bytes(payload, backend))
+            serialize = time_call(lambda: dumps_bytes(payload, backend), args.repeat)
+            request = time_call(lambda: client.get(url, headers={'Accept-Encoding': args.encoding}).get_data(),
+                                args.repeat)
+            results[url] = {
+                'body_bytes': body_size,
+                'serialize': summarize(serialize),
+                'request': summarize(request)
+            }
+        report['backends'][backend] = results
+
+    if len(backends) == 2:
+        report['speedup'] = {
+            url: round(report['backends']['stdlib'][url]['serialize']['median_ms']
+                       / max(report['backends']['orjson'][url]['serialize']['median_ms'], 1e-6), 2)
+            for url in payloads
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=2000, help='Events and communications in the log')
+    parser.add_argument('--repeat', type=int, default=10, help='Timed runs per measurement')
+    parser.add_argument('--encoding', default='identity', help='Accept-Encoding sent with requests (e.g. gzip)')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
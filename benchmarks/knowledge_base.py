@@ -0,0 +1,91 @@
+"""Benchmark the SAFe knowledge base: index build, load and query latency.
+
+Builds the BM25 index from the bundled PDF into a temporary directory (needs
+pypdf), then times loading it (memory-mapped) and answering the questions the
+demos ask, and reports how much text retrieval adds to a prompt:
+
+    python benchmarks/knowledge_base.py --repeat 200
+    python benchmarks/knowledge_base.py --index knowledge_index   # skip the build
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.knowledge_base import KnowledgeBase, build_index
+from config import KNOWLEDGE_SOURCE, KNOWLEDGE_TOP_K
+
+QUESTIONS = [
+    "What is PI planning and how should it be run?",
+    "How do Agile Release Trains coordinate dependencies between teams?",
+    "What are the risks of adopting SAFe in a large organisation?",
+    "How should we measure business value and PI objectives?",
+    "What role does the Release Train Engineer play?",
+    "How does Lean Portfolio Management handle budgeting?",
+    "Which companies dropped SAFe and why?",
+    "How do Scrum teams estimate stories in SAFe?",
+]
+
+
+def summarize(values):
+    """Latency distribution of a list of durations in milliseconds."""
+    ordered = sorted(values)
+    return {
+        'count': len(values),
+        'mean_ms': round(statistics.mean(values), 4),
+        'p50_ms': round(ordered[len(ordered) // 2], 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        'max_ms': round(ordered[-1], 4)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--index', help='Use an existing index directory instead of building one')
+    parser.add_argument('--source', default=KNOWLEDGE_SOURCE, help='PDF to index')
+    parser.add_argument('--repeat', type=int, default=100, help='Loads and query rounds to time')
+    parser.add_argument('--top-k', type=int, default=KNOWLEDGE_TOP_K, help='Passages per query')
+    args = parser.parse_args(argv)
+
+    report = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        index_dir = args.index
+        if not index_dir:
+            index_dir = scratch
+            started = time.perf_counter()
+            meta = build_index(args.source, index_dir)
+            report['build_s'] = round(time.perf_counter() - started, 3)
+            report['passages'] = meta['passages']
+            report['terms'] = len(meta['terms'])
+        report['index_bytes'] = sum(os.path.getsize(os.path.join(index_dir, name)) for name in os.listdir(index_dir))
+
+        loads = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            knowledge_base = KnowledgeBase(index_dir)
+            loads.append((time.perf_counter() - started) * 1000)
+        report['load'] = summarize(loads)
+
+        queries = []
+        for _ in range(args.repeat):
+            for question in QUESTIONS:
+                started = time.perf_counter()
+                knowledge_base.search(question, args.top_k)
+                queries.append((time.perf_counter() - started) * 1000)
+        report['query'] = summarize(queries)
+        report['context_chars'] = round(statistics.mean(len(knowledge_base.context(question, args.top_k))
+                                                        for question in QUESTIONS))
+        report['top_pages'] = {question: [passage['page'] for passage in knowledge_base.search(question, args.top_k)]
+                               for question in QUESTIONS}
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
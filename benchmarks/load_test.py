@@ -0,0 +1,415 @@
+"""HTTP and Socket.IO load test of realistic user sessions.
+
+Each virtual user behaves like a browser tab: it loads the page, opens a
+Socket.IO connection, initializes a simulation, joins its room and then runs
+ceremonies (start PI, start sprint, standups, a change request, end sprint,
+end PI) while polling /api/communications with If-None-Match. Background jobs
+are awaited through the job_finished event, checking /api/jobs/<id> only if it
+does not arrive in time.
+
+Run against a server with stubbed models, or let the script start one
+(benchmarks/stub_server.py) and sample its CPU and memory:
+
+    python benchmarks/load_test.py --spawn --users 200 --stub-latency-ms 200
+    python benchmarks/load_test.py --url http://localhost:5000 --server-pid 1234 --users 200
+
+The report gives requests per second, p50/p95/p99 latency and error counts per
+endpoint, Socket.IO events received, and the server's CPU and RSS. 429
+responses (full job queue) are retried after a pause and counted as rejected.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import statistics
+
+import aiohttp
+import socketio
+
+try:
+    import psutil  # Optional; /proc is read directly on Linux without it
+except ImportError:
+    psutil = None
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers (nearest rank)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class LoadStats:
+    """Latencies, errors and Socket.IO events shared by all virtual users."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.error_kinds = {}  # By endpoint and status code or exception type
+        self.rejected = {}
+        self.not_modified = 0
+        self.events = {}
+        self.socket_connect = []
+        self.socket_failures = 0
+        self.users_completed = 0
+        self.users_failed = 0
+
+    def record(self, name, latency, status):
+        """Record one request by endpoint name."""
+        self.latencies.setdefault(name, []).append(latency * 1000)
+        if status == 429:
+            self.rejected[name] = self.rejected.get(name, 0) + 1
+        elif status == 304:
+            self.not_modified += 1
+        elif status >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            key = f"{name}: HTTP {status}"
+            self.error_kinds[key] = self.error_kinds.get(key, 0) + 1
+
+    def record_exception(self, name, error):
+        """Count a request that failed without a response."""
+        self.errors[name] = self.errors.get(name, 0) + 1
+        key = f"{name}: {type(error).__name__}"
+        self.error_kinds[key] = self.error_kinds.get(key, 0) + 1
+
+
+class ServerMonitor:
+    """Samples the CPU and memory use of the server process."""
+
+    def __init__(self, pid, interval=1.0):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._process = psutil.Process(pid) if psutil else None
+
+    def _cpu_seconds_and_rss(self):
+        if self._process is not None:
+            times = self._process.cpu_times()
+            return times.user + times.system, self._process.memory_info().rss
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        ticks = os.sysconf('SC_CLK_TCK')
+        rss = int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+        return (int(fields[11]) + int(fields[12])) / ticks, rss
+
+    async def run(self):
+        """Sample until cancelled."""
+        last_cpu, _ = self._cpu_seconds_and_rss()
+        last_time = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                cpu, rss = self._cpu_seconds_and_rss()
+            except (OSError, IndexError):
+                return
+            now = time.monotonic()
+            self.samples.append({'cpu_percent': (cpu - last_cpu) / (now - last_time) * 100, 'rss': rss})
+            last_cpu, last_time = cpu, now
+
+    def summary(self):
+        """CPU and RSS statistics over the run."""
+        if not self.samples:
+            return None
+        cpu = [sample['cpu_percent'] for sample in self.samples]
+        rss = [sample['rss'] / (1024 * 1024) for sample in self.samples]
+        return {
+            'pid': self.pid,
+            'samples': len(self.samples),
+            'cpu_percent_mean': round(statistics.mean(cpu), 1),
+            'cpu_percent_max': round(max(cpu), 1),
+            'rss_mb_start': round(rss[0], 1),
+            'rss_mb_peak': round(max(rss), 1),
+            'rss_mb_end': round(rss[-1], 1)
+        }
+
+
+class VirtualUser:
+    """One browser session driving the simulation."""
+
+    def __init__(self, index, args, stats):
+        self.index = index
+        self.args = args
+        self.stats = stats
+        self.http = None
+        self.etag = None
+        self.finished_jobs = {}
+
+    async def request(self, method, path, name=None, json_body=None, headers=None):
+        """Send a request, retrying while the job queue is full; returns (status, body)."""
+        name = name or path
+        for attempt in range(self.args.retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self.http.request(method, self.args.url + path, json=json_body, headers=headers) as response:
+                    body = await response.read()
+                    self.stats.record(name, time.perf_counter() - started, response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.stats.record_exception(name, e)
+                return None, None
+            if response.status != 429 or attempt == self.args.retries:
+                break
+            await asyncio.sleep(self.args.retry_delay * (attempt + 1))
+
+        data = None
+        if body and response.headers.get('Content-Type', '').startswith('application/json'):
+            data = json.loads(body)
+        return response.status, data
+
+    async def run_job(self, path):
+        """Start a background job and wait for it to finish, as the UI does, via job_finished."""
+        status, data = await self.request('POST', path)
+        if status != 202:
+            return False
+        job_id = data['job']['id']
+        finished = self.finished_jobs.setdefault(job_id, asyncio.get_running_loop().create_future())
+        deadline = time.monotonic() + self.args.job_timeout
+        while time.monotonic() < deadline:
+            try:
+                return await asyncio.wait_for(asyncio.shield(finished), self.args.job_poll)
+            except asyncio.TimeoutError:
+                pass
+            # Fall back to polling in case the event was missed (e.g. no socket connection)
+            status, data = await self.request('GET', f'/api/jobs/{job_id}', name='/api/jobs/<id>')
+            if status == 200 and data['data']['status'] in ('succeeded', 'failed', 'cancelled'):
+                return data['data']['status'] == 'succeeded'
+        return False
+
+    def on_job_finished(self, job):
+        """Resolve the wait of run_job(), which may not have started yet."""
+        finished = self.finished_jobs.setdefault(job['id'], asyncio.get_running_loop().create_future())
+        if not finished.done():
+            finished.set_result(job['status'] == 'succeeded')
+
+    async def poll_communications(self):
+        """Poll the communications log like a client without a socket would."""
+        while True:
+            await asyncio.sleep(self.args.poll_interval * random.uniform(0.8, 1.2))
+            headers = {'If-None-Match': self.etag} if self.etag else None
+            started = time.perf_counter()
+            try:
+                async with self.http.get(f"{self.args.url}/api/communications?limit=50", headers=headers) as response:
+                    await response.read()
+                    self.stats.record('/api/communications', time.perf_counter() - started, response.status)
+                    self.etag = response.headers.get('ETag', self.etag)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.stats.record_exception('/api/communications', e)
+
+    async def connect_socket(self):
+        """Open the Socket.IO connection with the session cookie, counting received events."""
+        client = socketio.AsyncClient(reconnection=False)
+
+        async def count_event(event, *data):
+            self.stats.events[event] = self.stats.events.get(event, 0) + 1
+            if event == 'job_finished' and data:
+                self.on_job_finished(data[0])
+
+        client.on('*', count_event)
+        cookies = '; '.join(f"{cookie.key}={cookie.value}" for cookie in self.http.cookie_jar)
+        started = time.perf_counter()
+        try:
+            await client.connect(self.args.url, headers={'Cookie': cookies} if cookies else {},
+                                 transports=['websocket'], wait_timeout=30)
+        except Exception:
+            self.stats.socket_failures += 1
+            return None
+        self.stats.socket_connect.append((time.perf_counter() - started) * 1000)
+        return client
+
+    async def run(self):
+        """Run the user flow."""
+        timeout = aiohttp.ClientTimeout(total=self.args.request_timeout)
+        async with aiohttp.ClientSession(timeout=timeout, cookie_jar=aiohttp.CookieJar(unsafe=True),
+                                         headers={'Accept-Encoding': self.args.accept_encoding}) as http:
+            self.http = http
+            await self.request('GET', '/')
+            client = await self.connect_socket()
+
+            status, data = await self.request('POST', '/api/initialize', json_body={
+                'project_name': f"Load Test {self.index}",
+                'configuration': random.choice(['essential', 'portfolio', 'full']),
+                'use_sample_backlog': True
+            })
+            if status != 200:
+                self.stats.users_failed += 1
+                if client:
+                    await client.disconnect()
+                return
+            if client:
+                await client.emit('join_simulation', {'simulation_id': data['state']['simulation_id']})
+
+            poller = asyncio.create_task(self.poll_communications())
+            ok = True
+            try:
+                for _ in range(self.args.pis):
+                    ok = await self.run_job('/api/start_pi') and ok
+                    for sprint in range(self.args.sprints):
+                        await self.think()
+                        status, _ = await self.request('POST', '/api/start_sprint')
+                        ok = status == 200 and ok
+                        for _ in range(self.args.standups):
+                            await self.think()
+                            status, _ = await self.request('POST', '/api/daily_standup')
+                            ok = status == 200 and ok
+                        status, _ = await self.request('POST', '/api/change_request', json_body={
+                            'description': f"Add audit logging (sprint {sprint + 1})",
+                            'priority': random.randint(1, 10)
+                        })
+                        ok = status == 200 and ok
+                        await self.think()
+                        ok = await self.run_job('/api/end_sprint') and ok
+                    ok = await self.run_job('/api/end_pi') and ok
+                await self.request('GET', '/api/state')
+                await self.request('GET', '/api/events?limit=100', name='/api/events')
+            finally:
+                poller.cancel()
+                if client:
+                    await client.disconnect()
+
+            if ok:
+                self.stats.users_completed += 1
+            else:
+                self.stats.users_failed += 1
+
+    async def think(self):
+        """Pause between actions like a user reading the results."""
+        if self.args.think_time:
+            await asyncio.sleep(self.args.think_time * random.uniform(0.5, 1.5))
+
+
+def spawn_server(args):
+    """Start benchmarks/stub_server.py and wait until it answers."""
+    env = dict(os.environ, SAFE_STUB_LATENCY_MS=str(args.stub_latency_ms))
+    env.setdefault('SAFE_PORT', str(args.port))
+    process = subprocess.Popen([sys.executable, os.path.join(BENCHMARKS_DIR, 'stub_server.py')], env=env,
+                               stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+    args.url = f"http://127.0.0.1:{env['SAFE_PORT']}"
+    return process
+
+
+async def wait_for_server(url, timeout=30):
+    """Wait until the server answers GET /."""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            try:
+                async with http.get(url + '/') as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+async def run(args, server_pid=None):
+    """Ramp up the virtual users and gather the report."""
+    stats = LoadStats()
+    monitor = ServerMonitor(server_pid) if server_pid else None
+    monitor_task = asyncio.create_task(monitor.run()) if monitor else None
+
+    started = time.perf_counter()
+    tasks = []
+    for index in range(args.users):
+        tasks.append(asyncio.create_task(VirtualUser(index, args, stats).run()))
+        await asyncio.sleep(args.ramp / max(args.users, 1))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    elapsed = time.perf_counter() - started
+
+    if monitor_task:
+        monitor_task.cancel()
+    crashed = [result for result in results if isinstance(result, BaseException)]
+    for error in crashed:
+        stats.record_exception('user', error)
+
+    total = sum(len(values) for values in stats.latencies.values())
+    errors = sum(stats.errors.values())
+    return {
+        'url': args.url,
+        'users': args.users,
+        'users_completed': stats.users_completed,
+        'users_failed': stats.users_failed + len(crashed),
+        'elapsed_s': round(elapsed, 2),
+        'requests': total,
+        'requests_per_second': round(total / elapsed, 1),
+        'error_rate': round(errors / total, 4) if total else None,
+        'rejected_429': sum(stats.rejected.values()),
+        'not_modified_304': stats.not_modified,
+        'endpoints': {
+            name: {
+                'count': len(values),
+                'p50_ms': round(percentile(values, 50), 1),
+                'p95_ms': round(percentile(values, 95), 1),
+                'p99_ms': round(percentile(values, 99), 1),
+                'max_ms': round(max(values), 1),
+                'errors': stats.errors.get(name, 0),
+                'rejected': stats.rejected.get(name, 0)
+            }
+            for name, values in sorted(stats.latencies.items())
+        },
+        'errors': stats.error_kinds,
+        'socketio': {
+            'connected': len(stats.socket_connect),
+            'failed': stats.socket_failures,
+            'connect_p50_ms': round(percentile(stats.socket_connect, 50), 1) if stats.socket_connect else None,
+            'connect_p95_ms': round(percentile(stats.socket_connect, 95), 1) if stats.socket_connect else None,
+            'events': stats.events
+        },
+        'server': monitor.summary() if monitor else None
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='Server URL (ignored with --spawn)')
+    parser.add_argument('--spawn', action='store_true', help='Start benchmarks/stub_server.py for the run')
+    parser.add_argument('--port', type=int, default=5055, help='Port of the spawned server')
+    parser.add_argument('--stub-latency-ms', type=float, default=200, help='Model latency of the spawned server')
+    parser.add_argument('--server-pid', type=int, help='Process to sample CPU/RSS of (set by --spawn)')
+    parser.add_argument('--users', type=int, default=200, help='Concurrent virtual users')
+    parser.add_argument('--ramp', type=float, default=10, help='Seconds over which users start')
+    parser.add_argument('--pis', type=int, default=1, help='PIs per user')
+    parser.add_argument('--sprints', type=int, default=2, help='Sprints per PI')
+    parser.add_argument('--standups', type=int, default=3, help='Standups per sprint')
+    parser.add_argument('--think-time', type=float, default=1.0, help='Mean seconds between user actions')
+    parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between communications polls')
+    parser.add_argument('--job-poll', type=float, default=5.0, help='Seconds to wait for job_finished before polling')
+    parser.add_argument('--job-timeout', type=float, default=120, help='Seconds to wait for a job')
+    parser.add_argument('--request-timeout', type=float, default=60, help='Seconds before a request fails')
+    parser.add_argument('--retries', type=int, default=5, help='Retries of a request answered with 429')
+    parser.add_argument('--retry-delay', type=float, default=1.0, help='Base pause before retrying a 429')
+    # Some aiohttp releases intermittently fail to decode brotli bodies under concurrency
+    parser.add_argument('--accept-encoding', default='gzip', help='Accept-Encoding sent with requests')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the users\' random choices')
+    parser.add_argument('--verbose', action='store_true', help='Show the spawned server\'s log')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+
+    process = spawn_server(args) if args.spawn else None
+    try:
+        if process:
+            asyncio.run(wait_for_server(args.url))
+        report = asyncio.run(run(args, server_pid=process.pid if process else args.server_pid))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    return 0 if report['users_failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Throughput benchmark of the simulation lifecycle with the model layer stubbed.
+
+Drives SAFeSimulation through
+
+    setup_project -> (start_pi -> (start_sprint -> daily_standup x N
+        -> handle_change_request -> end_sprint) x sprints -> end_pi) x PIs
+
+with benchmarks/stub_models.py in place of the model APIs, and reports steps
+per second, the latency distribution of each phase and the peak RSS of the
+process. Save a run as a baseline and compare a later commit against it:
+
+    python benchmarks/simulation_lifecycle.py --pis 4 --output baseline.json
+    python benchmarks/simulation_lifecycle.py --pis 4 --compare baseline.json --fail-over 20
+
+Scale with --backlog (items), --pis, --sprints, --standups and --log-entries
+(synthetic entries logged before the run, to measure long-log behaviour).
+--fast-mechanics runs the ceremonies without their narratives (see
+SAFeSimulation), which shows what a headless capacity run costs.
+--profile DIR also writes cProfile and tracemalloc reports of the run,
+including collapsed stacks for flame graphs (see utils/profiling.py); the
+profilers slow the run down, so do not compare profiled timings.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import contextlib
+import platform
+import resource
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stub_models
+from utils import profiling
+from safe_simulation import SAFeSimulation, create_sample_backlog
+
+PHASES = ["setup_project", "start_pi", "start_sprint", "daily_standup",
+          "handle_change_request", "end_sprint", "end_pi"]
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers (nearest rank)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    """The commit being benchmarked, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_backlog(size):
+    """A backlog of `size` items, cycling through the sample backlog."""
+    sample = create_sample_backlog()
+    return [dict(sample[index % len(sample)], name=f"{sample[index % len(sample)]['name']} {index + 1}")
+            for index in range(size)]
+
+
+def run_lifecycle(args, durations):
+    """Run one full lifecycle, appending each phase's duration (ms) to durations."""
+    def timed(phase, func, *func_args):
+        started = time.perf_counter()
+        result = func(*func_args)
+        durations[phase].append((time.perf_counter() - started) * 1000)
+        return result
+
+    simulation = SAFeSimulation(args.config, fast_mechanics=args.fast_mechanics)
+    for index in range(args.log_entries):
+        simulation.log_event("Benchmark", f"Synthetic entry {index}")
+        simulation.log_communication("Benchmark", "Team", f"Synthetic message {index}")
+
+    timed("setup_project", simulation.setup_project, "Benchmark Project", build_backlog(args.backlog))
+    for _ in range(args.pis):
+        timed("start_pi", simulation.start_pi)
+        for sprint in range(args.sprints):
+            timed("start_sprint", simulation.start_sprint)
+            for _ in range(args.standups):
+                timed("daily_standup", simulation.run_daily_standup)
+            change_request = {
+                "description": f"Add audit logging to sprint {sprint + 1} deliverables",
+                "priority": 8 if sprint % 2 else 5  # Alternate strategic and team-level changes
+            }
+            timed("handle_change_request", simulation.handle_change_request, change_request)
+            timed("end_sprint", simulation.end_sprint)
+        timed("end_pi", simulation.end_pi)
+    return simulation
+
+
+def summarize(values):
+    """Latency distribution of a list of durations in milliseconds."""
+    return {
+        'count': len(values),
+        'mean_ms': round(statistics.mean(values), 3),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(max(values), 3)
+    }
+
+
+def run(args):
+    """Run the benchmark and return the report."""
+    calls = stub_models.install(latency=args.model_latency_ms / 1000)
+    random.seed(args.seed)
+
+    durations = {phase: [] for phase in PHASES}
+    with (profiling.profile(profiling.profile_name('simulation_lifecycle'), directory=args.profile)
+          if args.profile else contextlib.nullcontext()) as profile:
+        for _ in range(args.repeat):
+            simulation = run_lifecycle(args, durations)
+    if profile:
+        print(f"Profile written to {', '.join(profile.paths)}", file=sys.stderr)
+    # Time spent in the steps themselves, excluding the synthetic log written up front
+    elapsed = sum(sum(values) for values in durations.values()) / 1000
+    steps = sum(len(values) for values in durations.values())
+
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'parameters': {name: getattr(args, name) for name in
+                       ('config', 'backlog', 'pis', 'sprints', 'standups', 'log_entries', 'repeat',
+                        'model_latency_ms', 'seed', 'fast_mechanics')},
+        'steps': steps,
+        'elapsed_s': round(elapsed, 3),
+        'steps_per_second': round(steps / elapsed, 1),
+        'model_calls': sum(calls.values()),
+        'deferred_narratives': len(simulation.pending_narratives()),
+        'final_log_length': len(simulation.events_log) + len(simulation.communication_log),
+        'peak_rss_mb': peak_rss_mb(),
+        'phases': {phase: summarize(values) for phase, values in durations.items() if values}
+    }
+
+
+def compare(report, baseline, fail_over):
+    """
+    Print the change of each metric against a baseline report.
+
+    Returns the metrics that got worse by more than fail_over percent.
+    """
+    rows = [('steps_per_second', baseline['steps_per_second'], report['steps_per_second'], False),
+            ('peak_rss_mb', baseline['peak_rss_mb'], report['peak_rss_mb'], True)]
+    for phase, stats in report['phases'].items():
+        if phase in baseline.get('phases', {}):
+            rows.append((f"{phase}.p50_ms", baseline['phases'][phase]['p50_ms'], stats['p50_ms'], True))
+            rows.append((f"{phase}.p95_ms", baseline['phases'][phase]['p95_ms'], stats['p95_ms'], True))
+
+    if baseline.get('parameters') != report['parameters']:
+        print("warning: baseline was run with different parameters", file=sys.stderr)
+
+    regressions = []
+    print(f"{'metric':36} {'baseline':>12} {'current':>12} {'change':>9}", file=sys.stderr)
+    for name, before, after, lower_is_better in rows:
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change if lower_is_better else -change
+        flag = ''
+        if fail_over is not None and worse > fail_over:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:36} {before:>12} {after:>12} {change:>+8.1f}%{flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', default='full', help='SAFe configuration to simulate')
+    parser.add_argument('--backlog', type=int, default=12, help='Backlog items')
+    parser.add_argument('--pis', type=int, default=2, help='Program Increments per lifecycle')
+    parser.add_argument('--sprints', type=int, default=4, help='Sprints per PI')
+    parser.add_argument('--standups', type=int, default=10, help='Daily standups per sprint')
+    parser.add_argument('--log-entries', type=int, default=0, help='Synthetic log entries written before the run')
+    parser.add_argument('--repeat', type=int, default=20, help='Lifecycles to run')
+    parser.add_argument('--model-latency-ms', type=float, default=0.0, help='Simulated latency of each model call')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the simulation\'s random choices')
+    parser.add_argument('--output', help='Write the JSON report to this file (e.g. as a baseline)')
+    parser.add_argument('--compare', help='Baseline report to compare against')
+    parser.add_argument('--fail-over', type=float, help='With --compare, exit 1 if a metric is this many percent worse')
+    parser.add_argument('--fast-mechanics', action='store_true', help='Defer the ceremony narratives')
+    parser.add_argument('--profile', metavar='DIR', help='Write cProfile and tracemalloc reports of the run to DIR')
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.fail_over):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
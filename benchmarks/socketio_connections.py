@@ -0,0 +1,152 @@
+"""Measure how many concurrent Socket.IO clients one server process can hold.
+
+Start the server first (e.g. `SAFE_ASYNC_MODE=gevent python serve.py`), then:
+
+    python benchmarks/socketio_connections.py --url http://localhost:5000 --clients 2000
+
+Clients connect in batches, stay connected for --hold seconds while sending a
+`resume` request every --interval seconds, and the script reports how many
+connections succeeded, the peak number held at the same time, connect latency
+and resume round-trip latency. Use a --hold longer than the ramp-up so all
+clients overlap.
+"""
+import sys
+import time
+import json
+import asyncio
+import argparse
+import statistics
+
+import socketio
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile of a list of numbers (nearest rank)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class ClientStats:
+    """Counters shared by all simulated clients."""
+
+    def __init__(self):
+        self.connected = 0
+        self.failed = 0
+        self.disconnected = 0
+        self.peak = 0
+        self.connect_latencies = []
+        self.round_trips = []
+        self.errors = {}
+
+    def record_error(self, error):
+        """Count an error by its type."""
+        name = type(error).__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+
+
+async def run_client(url, stats, hold, interval, transports):
+    """Connect one client, ping the server periodically, then disconnect."""
+    client = socketio.AsyncClient(reconnection=False)
+    pending = {}
+
+    @client.on('log_delta')
+    async def on_log_delta(data):
+        started = pending.pop('resume', None)
+        if started is not None:
+            stats.round_trips.append(time.perf_counter() - started)
+
+    @client.event
+    async def disconnect():
+        stats.disconnected += 1
+
+    started = time.perf_counter()
+    try:
+        await client.connect(url, transports=transports, wait_timeout=30)
+    except Exception as e:
+        stats.failed += 1
+        stats.record_error(e)
+        return
+    stats.connect_latencies.append(time.perf_counter() - started)
+    stats.connected += 1
+    stats.peak = max(stats.peak, stats.connected - stats.disconnected)
+
+    deadline = time.monotonic() + hold
+    while time.monotonic() < deadline:
+        # resume is answered only when a simulation exists; unanswered pings are not counted
+        pending['resume'] = time.perf_counter()
+        try:
+            await client.emit('resume', {'since': 0})
+        except Exception as e:
+            stats.record_error(e)
+            break
+        await asyncio.sleep(interval)
+
+    await client.disconnect()
+
+
+async def run(args):
+    """Ramp up all clients and gather statistics."""
+    stats = ClientStats()
+    transports = ['websocket'] if args.websocket_only else ['polling', 'websocket']
+    tasks = []
+    ramp_started = time.perf_counter()
+
+    for start in range(0, args.clients, args.batch):
+        for _ in range(min(args.batch, args.clients - start)):
+            tasks.append(asyncio.create_task(run_client(args.url, stats, args.hold, args.interval, transports)))
+        await asyncio.sleep(args.ramp_delay)
+
+    ramp_seconds = time.perf_counter() - ramp_started
+    await asyncio.gather(*tasks)
+
+    connect_ms = [latency * 1000 for latency in stats.connect_latencies]
+    round_trip_ms = [latency * 1000 for latency in stats.round_trips]
+    return {
+        'url': args.url,
+        'clients_requested': args.clients,
+        'connected': stats.connected,
+        'failed': stats.failed,
+        'peak_concurrent': stats.peak,
+        'ramp_seconds': round(ramp_seconds, 2),
+        'connect_ms': {
+            'p50': percentile(connect_ms, 50),
+            'p95': percentile(connect_ms, 95),
+            'p99': percentile(connect_ms, 99),
+            'mean': statistics.mean(connect_ms) if connect_ms else None
+        },
+        'resume_round_trip_ms': {
+            'samples': len(round_trip_ms),
+            'p50': percentile(round_trip_ms, 50),
+            'p95': percentile(round_trip_ms, 95),
+            'p99': percentile(round_trip_ms, 99)
+        },
+        'errors': stats.errors
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='Server URL')
+    parser.add_argument('--clients', type=int, default=500, help='Number of concurrent clients')
+    parser.add_argument('--batch', type=int, default=50, help='Clients started per ramp step')
+    parser.add_argument('--ramp-delay', type=float, default=0.5, help='Seconds between ramp steps')
+    parser.add_argument('--hold', type=float, default=30, help='Seconds each client stays connected')
+    parser.add_argument('--interval', type=float, default=5, help='Seconds between resume requests per client')
+    parser.add_argument('--websocket-only', action='store_true', help='Skip the long-polling handshake')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    return 0 if report['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
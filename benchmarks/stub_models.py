@@ -0,0 +1,104 @@
+"""Deterministic stand-in for the model APIs, for benchmarks and load tests.
+
+install() replaces BaseAgent.call_openai/call_anthropic/call_google with a
+function that returns a markdown reply of realistic size without any network
+access, optionally sleeping to simulate model latency. Replies depend only on
+the agent role and the prompt, so runs are repeatable. Calls in JSON mode get a
+JSON object with the keys listed in the system prompt's format instructions
+(see agents.structured_output), with decisions and list items picked by prompt
+hash.
+"""
+import os
+import sys
+import re
+import json
+import time
+import hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.base_agent import BaseAgent
+
+# Phrases of the replies, picked by prompt hash
+_VERDICTS = [
+    "The team can accept this within the current plan.",
+    "There is a blocker on the integration environment.",
+    "We should escalate this to the SAFe Coach.",
+    "No impediments; work is on track.",
+]
+
+_BODY = """
+- **Context**: {role} reviewed the request against the current PI objectives
+- **Assessment**: scope, dependencies and capacity were checked with the team
+- **Next steps**: update the board, confirm owners and revisit at the next sync
+
+| Item | Owner | Status |
+|------|-------|--------|
+| Planning | {role} | Done |
+| Follow-up | Team | In Progress |
+"""
+
+
+# Items of list fields (impediments, technical debt), for one reply in four
+_ITEMS = [
+    "Waiting on access to the integration environment",
+    "Error handling in the new endpoint needs refactoring",
+]
+
+# One field of the format instructions: - "name": kind - description
+_FIELD = re.compile(r'^- "(\w+)": (string|list of strings|true or false|one of (.+?)) - ', re.MULTILINE)
+
+
+def stub_reply(role, messages, json_mode=False):
+    """Build the reply a stubbed model gives to a conversation."""
+    prompt = messages[-1]["content"] if messages else ""
+    digest = hashlib.blake2b(prompt.encode('utf-8'), digest_size=4).digest()
+    verdict = _VERDICTS[digest[0] % len(_VERDICTS)]
+    narrative = f"## {role} response\n\n{verdict}\n{_BODY.format(role=role)}"
+    if not json_mode:
+        return narrative
+
+    instructions = messages[0]["content"] if messages and messages[0]["role"] == "system" else ""
+    reply = {}
+    for position, (field, kind, values) in enumerate(_FIELD.findall(instructions)):
+        pick = digest[(position + 1) % len(digest)]
+        if kind == "string":
+            reply[field] = narrative
+        elif kind == "list of strings":
+            reply[field] = [_ITEMS[pick % len(_ITEMS)]] if pick % 4 == 0 else []
+        elif kind == "true or false":
+            reply[field] = bool(pick % 2)
+        else:
+            choices = re.findall(r'"(\w+)"', values)
+            reply[field] = choices[pick % len(choices)]
+    return json.dumps(reply)
+
+
+def install(latency=0.0):
+    """
+    Replace the model API calls of every agent with stub_reply().
+
+    Parameters:
+    -----------
+    latency : float
+        Seconds each stubbed call sleeps, to approximate a real model.
+
+    Returns:
+    --------
+    dict
+        Call counters by provider, updated as the stub is used.
+    """
+    calls = {'openai': 0, 'anthropic': 0, 'google': 0}
+
+    def make_stub(provider):
+        def call(self, messages, json_mode=False):
+            calls[provider] += 1
+            if latency:
+                time.sleep(latency)
+            return stub_reply(self.role, messages, json_mode)
+        return call
+
+    BaseAgent.call_openai = make_stub('openai')
+    BaseAgent.call_anthropic = make_stub('anthropic')
+    BaseAgent.call_google = make_stub('google')
+    return calls
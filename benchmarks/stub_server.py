@@ -0,0 +1,21 @@
+"""Run the production server (serve.py) with the model APIs stubbed out.
+
+For load tests: every agent reply comes from benchmarks/stub_models.py after
+SAFE_STUB_LATENCY_MS milliseconds, so results measure the app, not a provider.
+
+    SAFE_ASYNC_MODE=gevent SAFE_STUB_LATENCY_MS=200 python benchmarks/stub_server.py
+"""
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import serve  # Applies the async mode's monkey patching before anything else is imported
+
+import stub_models
+
+if __name__ == "__main__":
+    stub_models.install(latency=float(os.getenv("SAFE_STUB_LATENCY_MS", "0")) / 1000)
+    sys.exit(serve.main([]))  # One process: --workers would start unstubbed copies of serve.py
@@ -30,6 +30,71 @@ DEFAULT_TEAM_SIZE = 7
 DEFAULT_PI_LENGTH = 5  # Number of sprints in a Program Increment
 DEFAULT_SPRINT_LENGTH = 2  # Weeks
 DEFAULT_DAILY_DURATION = 15  # Minutes
+FAST_MECHANICS = os.getenv("SAFE_FAST_MECHANICS", "false").lower() in ("1", "true", "yes")  # Defer ceremony narratives by default
+
+# Background Job Settings
+JOB_WORKERS = int(os.getenv("SAFE_JOB_WORKERS", "2"))  # Jobs running at the same time
+JOB_QUEUE_LIMIT = int(os.getenv("SAFE_JOB_QUEUE_LIMIT", "10"))  # Jobs waiting before new ones are rejected
+RUN_PLAN_MAX_STEPS = int(os.getenv("SAFE_RUN_PLAN_MAX_STEPS", "500"))  # Largest plan accepted by /api/run
+RUN_UPDATE_INTERVAL = float(os.getenv("SAFE_RUN_UPDATE_INTERVAL", "1.0"))  # Seconds between coalesced state pushes
+SPECULATION = os.getenv("SAFE_SPECULATION", "false").lower() in ("1", "true", "yes")  # Run the predicted next step ahead
+SPECULATION_WORKERS = int(os.getenv("SAFE_SPECULATION_WORKERS", "2"))  # Speculative steps running at the same time
+
+# Server Settings (see serve.py)
+SERVER_HOST = os.getenv("SAFE_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SAFE_PORT", "5000"))
+SOCKETIO_ASYNC_MODE = os.getenv("SAFE_ASYNC_MODE") or None  # eventlet, gevent or threading; None auto-detects
+SERVER_MAX_CONNECTIONS = int(os.getenv("SAFE_MAX_CONNECTIONS", "1000"))  # Concurrent HTTP/WebSocket connections
+SOCKETIO_PING_INTERVAL = int(os.getenv("SAFE_PING_INTERVAL", "25"))  # Seconds
+SOCKETIO_PING_TIMEOUT = int(os.getenv("SAFE_PING_TIMEOUT", "20"))  # Seconds
+GOOGLE_TRANSPORT = os.getenv("SAFE_GOOGLE_TRANSPORT") or None  # "rest" keeps Gemini calls cooperative under eventlet/gevent
+
+# HTTP Response Settings
+COMPRESS_MIN_SIZE = int(os.getenv("SAFE_COMPRESS_MIN_SIZE", "1024"))  # Bytes; smaller bodies are sent uncompressed
+COMPRESS_LEVEL = int(os.getenv("SAFE_COMPRESS_LEVEL", "6"))  # gzip level 1-9 (brotli quality is capped at 11)
+JSON_BACKEND = os.getenv("SAFE_JSON_BACKEND", "auto")  # auto (orjson if installed), orjson or stdlib
+JSON_STREAM_MIN_ITEMS = int(os.getenv("SAFE_JSON_STREAM_MIN_ITEMS", "500"))  # Longer log responses are streamed
+LOG_PAGE_SIZE = int(os.getenv("SAFE_LOG_PAGE_SIZE", "200"))  # Log entries per page; also caps socket resume deltas
+METRICS_ENABLED = os.getenv("SAFE_METRICS", "true").lower() in ("1", "true", "yes")  # Serve /metrics
+TRACE_EXPORT = os.getenv("SAFE_TRACE_EXPORT", "")  # jsonl:///path/spans.jsonl or http://collector:4318; off if empty
+PROFILE_MODE = os.getenv("SAFE_PROFILE", "off")  # off, header (X-SAFE-Profile: 1 requests) or all
+PROFILE_DIR = os.getenv("SAFE_PROFILE_DIR", "profiles")  # Where .prof, .folded and .txt profiles are written
+PROFILE_FRAMES = int(os.getenv("SAFE_PROFILE_FRAMES", "30"))  # Stack depth of tracemalloc allocation records
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("SAFE_IMAGE_CACHE_MB", "32")) * 1024 * 1024  # In-memory configuration image cache
+IMAGE_CACHE_REVALIDATE = float(os.getenv("SAFE_IMAGE_CACHE_REVALIDATE", "2.0"))  # Seconds between mtime checks
+UPLOAD_MAX_BYTES = int(float(os.getenv("SAFE_UPLOAD_MAX_MB", "10")) * 1024 * 1024)  # Largest accepted image upload
+UPLOAD_MAX_PIXELS = int(os.getenv("SAFE_UPLOAD_MAX_PIXELS", "40000000"))  # Width * height limit for uploaded images
+IMAGE_WORKERS = int(os.getenv("SAFE_IMAGE_WORKERS", "2"))  # Processes generating image variants
+
+# Multi-Process Settings (see `python serve.py --workers N`)
+SECRET_KEY = os.getenv("SAFE_SECRET_KEY")  # Must be shared by all workers; random per process if unset
+WORKER_ID = os.getenv("SAFE_WORKER_ID", f"{os.uname().nodename}-{os.getpid()}")
+SIMULATION_STORE_URL = os.getenv("SAFE_SIMULATION_STORE", "memory://")  # memory://, file:///dir or redis://host:port/db
+SIMULATION_STORE_LIMIT = int(os.getenv("SAFE_SIMULATION_STORE_LIMIT", "100"))  # Simulations kept in memory
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SAFE_MESSAGE_QUEUE") or None  # redis://, amqp:// or file:///dir (local stand-in)
+
+# Knowledge Base Settings (see agents/knowledge_base.py)
+KNOWLEDGE_SOURCE = os.getenv("SAFE_KNOWLEDGE_SOURCE", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "Information for decision-makers considering the SAFe framework.pdf"))
+KNOWLEDGE_INDEX_DIR = os.getenv("SAFE_KNOWLEDGE_INDEX", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "knowledge_index"))  # Written by `python agents/knowledge_base.py build`
+KNOWLEDGE_TOP_K = int(os.getenv("SAFE_KNOWLEDGE_TOP_K", "3"))  # Passages added to each prompt; 0 turns retrieval off
+KNOWLEDGE_MAX_CHARS = int(os.getenv("SAFE_KNOWLEDGE_MAX_CHARS", "2000"))  # Budget for passage text per prompt
+
+# Agent Memory Settings (see agents/memory.py)
+MEMORY_RECENT_TURNS = int(os.getenv("SAFE_MEMORY_RECENT_TURNS", "2"))  # Exchanges replayed verbatim; negative replays all
+MEMORY_TOP_K = int(os.getenv("SAFE_MEMORY_TOP_K", "4"))  # Earlier turns and facts recalled into each prompt
+MEMORY_MAX_CHARS = int(os.getenv("SAFE_MEMORY_MAX_CHARS", "2000"))  # Budget for recalled text per prompt
+
+# Semantic Answer Cache Settings (see utils/semantic_cache.py)
+SEMANTIC_CACHE_SIZE = int(os.getenv("SAFE_SEMANTIC_CACHE_SIZE", "256"))  # Answers kept per agent; 0 turns the cache off
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SAFE_SEMANTIC_CACHE_THRESHOLD", "0.85"))  # Cosine similarity for a hit
+
+# Demo Answer Settings (see utils/demo_answers.py)
+DEMO_ANSWERS_PATH = os.getenv("SAFE_DEMO_ANSWERS", os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "demo_answers.json"))  # Precomputed demo answers, shared by workers
+DEMO_WARMUP = os.getenv("SAFE_DEMO_WARMUP", "true").lower() in ("1", "true", "yes")  # Precompute when the server starts
+DEMO_REFRESH_INTERVAL = float(os.getenv("SAFE_DEMO_REFRESH_INTERVAL", "3600"))  # Seconds between checks for outdated answers
 
 # Default System Prompts
 DEFAULT_SAFE_COACH_PROMPT = """
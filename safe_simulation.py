@@ -1,25 +1,50 @@
 import json
 import time
+import uuid
 import random
+import functools
 from datetime import datetime, timedelta
 
 from agents.safe_coach import SAFeCoach
 from agents.scrum_master import ScrumMaster
 from agents.developer import Developer
-from config import DEFAULT_PI_LENGTH, DEFAULT_SPRINT_LENGTH, DEFAULT_CONFIGURATION, CONFIGURATIONS
+from config import DEFAULT_PI_LENGTH, DEFAULT_SPRINT_LENGTH, DEFAULT_CONFIGURATION, CONFIGURATIONS, FAST_MECHANICS
+from utils.metrics import timed_phase
+from utils.tracing import traced
+
+def ceremony(method):
+    """Defer the agents' narratives while a ceremony runs, if the simulation uses fast mechanics."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.fast_mechanics:
+            return method(self, *args, **kwargs)
+        agents = self.agents()
+        for agent in agents:
+            agent.defer_narratives = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            for agent in agents:
+                agent.defer_narratives = False
+    return wrapper
 
 class SAFeSimulation:
     """A simulation environment for SAFe Agile implementation with AI agents."""
     
-    def __init__(self, config=DEFAULT_CONFIGURATION):
+    def __init__(self, config=DEFAULT_CONFIGURATION, fast_mechanics=None):
         """Initialize the SAFe simulation with the three AI agents.
         
         Args:
             config (str): SAFe configuration to use (essential, portfolio, full)
+            fast_mechanics (bool, optional): Run ceremonies without waiting for the agents'
+                narratives, which are generated later on demand; defaults to SAFE_FAST_MECHANICS
         """
         self.config = config.lower()
         if self.config not in CONFIGURATIONS:
             self.config = DEFAULT_CONFIGURATION
+        self.fast_mechanics = FAST_MECHANICS if fast_mechanics is None else bool(fast_mechanics)
+        # Own generator, so a copy of the simulation draws the same numbers (see utils/speculation.py)
+        self.random = random.Random(random.getrandbits(64))
             
         # Initialize the three AI agents
         self.safe_coach = SAFeCoach(model_provider="openai")
@@ -38,8 +63,12 @@ class SAFeSimulation:
         self.sprint_start_date = datetime.now()
         
         # Initialize events and communication log
+        self.simulation_id = uuid.uuid4().hex
         self.events_log = []
         self.communication_log = []
+        self.log_sequence = 0  # Shared, monotonically increasing sequence for both logs
+        self.log_revisions = []  # Entries changed in place, by the sequence number of the change
+        self.revision = 0  # Bumped by every change outside the simulation steps (see utils/speculation.py)
         
         # Track metrics
         self.metrics = {}
@@ -55,6 +84,22 @@ class SAFeSimulation:
             self.solutions = []
             self.arts = []  # Agile Release Trains
     
+    def agents(self):
+        """The simulation's agents."""
+        return [self.safe_coach, self.scrum_master, self.developer]
+    
+    def span_attributes(self, *args, **kwargs):
+        """Trace span attributes describing where the simulation is (for tracing.traced)."""
+        return {
+            "simulation_id": self.simulation_id,
+            "config": self.config,
+            "pi": self.current_pi,
+            "sprint": self.current_sprint,
+            "day": self.current_day
+        }
+    
+    @timed_phase("setup_project")
+    @traced(attributes=span_attributes)
     def setup_project(self, project_name, initial_backlog, strategic_themes=None):
         """Set up a new project.
         
@@ -75,6 +120,9 @@ class SAFeSimulation:
             self.strategic_themes = strategic_themes
             self.log_event("Strategic Themes", f"Configured {len(strategic_themes)} strategic themes")
     
+    @timed_phase("start_pi")
+    @traced(attributes=span_attributes)
+    @ceremony
     def start_pi(self):
         """Start a new Program Increment."""
         self.current_pi += 1
@@ -101,6 +149,9 @@ class SAFeSimulation:
             "planning_details": planning_response
         }
     
+    @timed_phase("start_sprint")
+    @traced(attributes=span_attributes)
+    @ceremony
     def start_sprint(self):
         """Start a new sprint within the current PI."""
         self.current_sprint += 1
@@ -128,6 +179,9 @@ class SAFeSimulation:
             "planning_details": planning_response
         }
     
+    @timed_phase("daily_standup")
+    @traced(attributes=span_attributes)
+    @ceremony
     def run_daily_standup(self):
         """Run a daily standup for the current sprint."""
         self.current_day += 1
@@ -137,7 +191,7 @@ class SAFeSimulation:
             {
                 "member": "Developer",
                 "status": "Working on task implementation",
-                "impediment": None if random.random() > 0.2 else f"Technical issue #{self.current_day}"
+                "impediment": None if self.random.random() > 0.2 else f"Technical issue #{self.current_day}"
             }
         ]
         
@@ -160,12 +214,12 @@ class SAFeSimulation:
         for update in team_updates:
             if update.get("impediment"):
                 impediment = update["impediment"]
-                resolution = self.scrum_master.resolve_impediment(impediment)
+                resolution, escalate = self.scrum_master.resolve_impediment(impediment)
                 self.log_event("Impediment Resolution", f"Scrum Master addressing: {impediment}")
                 self.log_communication("Scrum Master", update["member"], resolution)
                 
                 # If Scrum Master can't resolve, escalate to SAFe Coach
-                if "escalate" in resolution.lower() or "cannot resolve" in resolution.lower():
+                if escalate:
                     coach_response = self.safe_coach.handle_impediment(impediment, self.config)
                     self.log_event("Impediment Escalation", f"Escalated to SAFe Coach: {impediment}")
                     self.log_communication("SAFe Coach", "Scrum Master", coach_response)
@@ -179,17 +233,28 @@ class SAFeSimulation:
             "impediments_addressed": [u["impediment"] for u in team_updates if u.get("impediment")]
         }
     
-    def end_sprint(self):
-        """End the current sprint with review and retrospective."""
+    @timed_phase("end_sprint")
+    @traced(attributes=span_attributes)
+    @ceremony
+    def end_sprint(self, progress_callback=None):
+        """End the current sprint with review and retrospective.
+        
+        Args:
+            progress_callback (callable, optional): Called as progress_callback(message, **progress)
+                as each completed item is reported
+        """
         # Simulate sprint completion (simplified for demo)
         # In real use, would track actual completed items throughout sprint
-        completion_rate = random.uniform(0.7, 1.0)  # 70-100% completion
+        completion_rate = self.random.uniform(0.7, 1.0)  # 70-100% completion
         sprint_backlog = self.scrum_master.sprint_backlog
         completed_items = sprint_backlog[:int(len(sprint_backlog) * completion_rate)]
         
         # For each completed item, have the Developer provide completion details
         completed_details = []
-        for item in completed_items:
+        for index, item in enumerate(completed_items):
+            if progress_callback:
+                progress_callback(f"Reporting completion of {item['name']}",
+                                  completed=index, total=len(completed_items))
             completion_report, tech_debt = self.developer.complete_task(item)
             self.log_communication("Developer", "Team", completion_report)
             completed_details.append({
@@ -221,6 +286,9 @@ class SAFeSimulation:
             "technical_debt": [d["technical_debt"] for d in completed_details if d["technical_debt"]]
         }
     
+    @timed_phase("end_pi")
+    @traced(attributes=span_attributes)
+    @ceremony
     def end_pi(self):
         """End the current Program Increment with System Demo and I&A workshop."""
         # Gather all achievements from the PI
@@ -238,8 +306,8 @@ class SAFeSimulation:
         predictability = (total_completed / total_planned * 100) if total_planned > 0 else 100
         
         # Simulate business value and team satisfaction
-        business_value = random.uniform(7, 10)  # Scale of 1-10
-        team_satisfaction = random.uniform(6, 9)  # Scale of 1-10
+        business_value = self.random.uniform(7, 10)  # Scale of 1-10
+        team_satisfaction = self.random.uniform(6, 9)  # Scale of 1-10
         
         pi_summary_metrics = {
             "predictability": predictability,
@@ -266,6 +334,8 @@ class SAFeSimulation:
             "inspect_and_adapt": ia_response
         }
     
+    @timed_phase("change_request")
+    @traced(attributes=span_attributes)
     def handle_change_request(self, change_request):
         """Process a change request based on its urgency and scope."""
         # Determine if change is strategic (portfolio level) or tactical (team level)
@@ -275,7 +345,7 @@ class SAFeSimulation:
             # Portfolio-level change, handled by SAFe Coach
             if "strategic_themes" in change_request and self.strategic_themes:
                 # Strategic alignment check
-                alignment_response = self.safe_coach.align_with_strategy(
+                alignment_response, decision = self.safe_coach.align_with_strategy(
                     self.strategic_themes, 
                     [{"name": change_request["description"]}], 
                     self.config
@@ -286,26 +356,23 @@ class SAFeSimulation:
                     "level": "portfolio",
                     "handler": "SAFe Coach",
                     "response": alignment_response,
-                    "accepted": "recommended" in alignment_response.lower() or "prioritize" in alignment_response.lower()
+                    "accepted": decision == "prioritize"
                 }
             else:
                 # General strategic change
-                coach_response = self.safe_coach.handle_impediment(
-                    f"Strategic change request: {change_request['description']}",
-                    self.config
-                )
+                coach_response, decision = self.safe_coach.evaluate_change_request(change_request, self.config)
                 self.log_event("Strategic Change", f"Processing change: {change_request['description']}")
                 self.log_communication("SAFe Coach", "Leadership", coach_response)
                 return {
                     "level": "program",
                     "handler": "SAFe Coach",
                     "response": coach_response,
-                    "accepted": "accept" in coach_response.lower() and "not" not in coach_response.lower()[:coach_response.lower().find("accept")]
+                    "accepted": decision == "accept"
                 }
         else:
             # Tactical/Team-level change during sprint
             progress = (self.current_day / (self.sprint_length * 5)) * 100  # Assuming 5-day work week
-            scrum_master_response = self.scrum_master.handle_change_request(change_request, progress)
+            scrum_master_response, decision = self.scrum_master.handle_change_request(change_request, progress)
             self.log_event("Sprint Change", f"Evaluating mid-sprint change: {change_request['description']}")
             self.log_communication("Scrum Master", "Team", scrum_master_response)
             
@@ -320,16 +387,49 @@ class SAFeSimulation:
                     "handler": "Scrum Master & Developer",
                     "sm_response": scrum_master_response,
                     "dev_response": dev_response,
-                    "accepted": "accept" in scrum_master_response.lower() and "not" not in scrum_master_response.lower()[:scrum_master_response.lower().find("accept")]
+                    "accepted": decision == "accept"
                 }
             else:
                 return {
                     "level": "team",
                     "handler": "Scrum Master",
                     "response": scrum_master_response,
-                    "accepted": "accept" in scrum_master_response.lower() and "not" not in scrum_master_response.lower()[:scrum_master_response.lower().find("accept")]
+                    "accepted": decision == "accept"
                 }
     
+    def run_step(self, step, progress_callback=None):
+        """Run a single named simulation step, checking that it is valid now.
+        
+        Args:
+            step (str): One of the names in SIMULATION_STEPS
+            progress_callback (callable, optional): Passed to steps that report progress
+            
+        Returns:
+            dict: The result of the step
+            
+        Raises:
+            ValueError: If the step is unknown or not allowed in the current state
+        """
+        if step not in SIMULATION_STEPS:
+            raise ValueError(f"Unknown simulation step: {step}")
+        if step in ("start_sprint", "end_pi") and self.current_pi == 0:
+            raise ValueError(f"Cannot run {step}: no active PI")
+        if step in ("daily_standup", "end_sprint") and self.current_sprint == 0:
+            raise ValueError(f"Cannot run {step}: no active sprint")
+        
+        if step == "start_pi":
+            return self.start_pi()
+        elif step == "start_sprint":
+            return self.start_sprint()
+        elif step == "daily_standup":
+            return self.run_daily_standup()
+        elif step == "end_sprint":
+            return self.end_sprint(progress_callback=progress_callback)
+        else:
+            return self.end_pi()
+    
+    @timed_phase("technical_guidance")
+    @traced(attributes=span_attributes)
     def get_technical_guidance(self, topic):
         """Get technical guidance from the Developer agent."""
         response = self.developer.provide_technical_input(topic)
@@ -339,7 +439,9 @@ class SAFeSimulation:
     def log_event(self, event_type, description):
         """Log a simulation event."""
         timestamp = time.time()
+        self.log_sequence += 1
         self.events_log.append({
+            "seq": self.log_sequence,
             "timestamp": timestamp,
             "datetime": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
             "type": event_type,
@@ -352,22 +454,81 @@ class SAFeSimulation:
     def log_communication(self, sender, recipient, message):
         """Log communication between agents."""
         timestamp = time.time()
-        self.communication_log.append({
+        self.log_sequence += 1
+        entry = {
+            "seq": self.log_sequence,
             "timestamp": timestamp,
             "datetime": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
             "sender": sender,
             "recipient": recipient,
-            "message": message,
+            "message": str(message),
             "pi": self.current_pi,
             "sprint": self.current_sprint,
             "day": self.current_day
-        })
+        }
+        if hasattr(message, "key"):
+            entry["narrative"] = message.key  # Deferred; see render_narrative()
+        self.communication_log.append(entry)
+    
+    def restamp_log(self, since_seq):
+        """Set the time of the log entries recorded after since_seq to now.
+        
+        Used when a step that ran ahead of time (see utils/speculation.py) is
+        committed, so its entries carry the time it was requested.
+        
+        Args:
+            since_seq (int): Last sequence number to leave unchanged
+        """
+        timestamp = time.time()
+        formatted = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        for log in (self.events_log, self.communication_log):
+            for entry in self._entries_between(log, since_seq, self.log_sequence):
+                entry["timestamp"] = timestamp
+                entry["datetime"] = formatted
+    
+    def pending_narratives(self):
+        """Keys of the deferred narratives in the communication log, oldest first."""
+        return [comm["narrative"] for comm in self.communication_log if "narrative" in comm]
+    
+    @traced(attributes=span_attributes)
+    def render_narrative(self, key):
+        """Generate a deferred narrative and put it into the communication log.
+        
+        Args:
+            key (str): The "narrative" key of a communication log entry
+            
+        Returns:
+            list: The communication log entries updated (empty if key is unknown or already rendered)
+        
+        The entries keep their place and sequence number, but the change takes a
+        new sequence number of its own, so cached logs are revalidated and log
+        deltas carry the updated entries (see get_log_delta).
+        """
+        for agent in self.agents():
+            message = agent.render_deferred(key)
+            if message is not None:
+                break
+        else:
+            return []
+        
+        updated = []
+        for comm in self.communication_log:
+            if comm.get("narrative") == key:
+                comm["message"] = message
+                comm.pop("narrative")
+                comm.pop("message_html", None)  # Rendered HTML of the placeholder
+                updated.append(comm)
+        if updated:
+            self.log_sequence += 1
+            self.log_revisions.append({"seq": self.log_sequence, "entries": updated})
+        return updated
     
     def get_simulation_state(self):
         """Get the current state of the simulation."""
         return {
             "project_name": getattr(self, "project_name", "Unnamed Project"),
             "configuration": self.config,
+            "fast_mechanics": self.fast_mechanics,
             "current_pi": self.current_pi,
             "current_sprint": self.current_sprint,
             "current_day": self.current_day,
@@ -377,7 +538,9 @@ class SAFeSimulation:
             "sprint_start_date": self.sprint_start_date.strftime("%Y-%m-%d") if self.current_sprint > 0 else None,
             "metrics": self.metrics,
             "events": len(self.events_log),
-            "communications": len(self.communication_log)
+            "communications": len(self.communication_log),
+            "simulation_id": self.simulation_id,
+            "log_sequence": self.log_sequence
         }
     
     def get_events_log(self, limit=None):
@@ -391,6 +554,183 @@ class SAFeSimulation:
         if limit:
             return self.communication_log[-limit:]
         return self.communication_log
+    
+    def get_log_delta(self, since_seq=0, limit=None):
+        """Get the log entries recorded after a given sequence number.
+        
+        Args:
+            since_seq (int): Last sequence number the caller has already seen
+            limit (int, optional): Keep only the newest entries of each log. The
+                caller is then told which logs have older entries to page in.
+            
+        Returns:
+            dict: New events and communications, older communications changed
+                since then ("revised"), plus the latest sequence number
+        """
+        # Snapshot the sequence first so entries appended concurrently are left for the next delta
+        last_seq = self.log_sequence
+        events = self._entries_between(self.events_log, since_seq, last_seq)
+        communications = self._entries_between(self.communication_log, since_seq, last_seq)
+        revised = [comm for revision in self._entries_between(self.log_revisions, since_seq, last_seq)
+                   for comm in revision["entries"] if comm["seq"] <= since_seq]
+        delta = {
+            "simulation_id": self.simulation_id,
+            "since": since_seq,
+            "last_seq": last_seq,
+            "events": events,
+            "communications": communications,
+            "revised": revised
+        }
+        
+        if limit is not None and (len(events) > limit or len(communications) > limit):
+            # The caller cannot apply this as a contiguous delta; it restarts from the newest page
+            delta["truncated"] = True
+            delta["events"] = events[-limit:]
+            delta["communications"] = communications[-limit:]
+            delta["events_has_more"] = len(self.events_log) > len(delta["events"])
+            delta["communications_has_more"] = len(self.communication_log) > len(delta["communications"])
+        return delta
+    
+    def get_log_page(self, log_name, after=None, before=None, limit=100):
+        """Get a page of a log, addressed by sequence number cursors.
+        
+        Args:
+            log_name (str): "events" or "communications"
+            after (int, optional): Return the oldest entries with seq > after
+            before (int, optional): Return the newest entries with seq < before
+            limit (int): Maximum number of entries
+            
+        Returns:
+            dict: The entries (oldest first), whether more exist beyond the page
+                in the paging direction, and the total length of the log
+        """
+        log = self.events_log if log_name == "events" else self.communication_log
+        if before is not None:
+            end = self._index_after(log, before - 1)
+            if after is not None:
+                start = max(self._index_after(log, after), end - limit)
+            else:
+                start = max(0, end - limit)
+            has_more = start > 0 and (after is None or log[start - 1]["seq"] > after)
+        else:
+            start = self._index_after(log, after) if after is not None else 0
+            end = min(len(log), start + limit)
+            has_more = end < len(log)
+        
+        return {
+            "entries": log[start:end],
+            "has_more": has_more,
+            "total": len(log)
+        }
+    
+    @staticmethod
+    def _index_after(log, seq):
+        """Return the index of the first entry of a log with a sequence number above seq."""
+        low, high = 0, len(log)
+        while low < high:
+            middle = (low + high) // 2
+            if log[middle]["seq"] > seq:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+    
+    @staticmethod
+    def _entries_between(log, since_seq, last_seq):
+        """Return the entries of a log with since_seq < seq <= last_seq.
+        
+        Logs are append-only and ordered by sequence, so walking back from the
+        end keeps the cost proportional to the number of new entries.
+        """
+        end = len(log)
+        while end > 0 and log[end - 1]["seq"] > last_seq:
+            end -= 1
+        start = end
+        while start > 0 and log[start - 1]["seq"] > since_seq:
+            start -= 1
+        return log[start:end]
+
+
+# Steps that can be scheduled in a run plan
+SIMULATION_STEPS = ["start_pi", "start_sprint", "daily_standup", "end_sprint", "end_pi"]
+
+
+def predict_next_step(step, simulation):
+    """Predict the step that will follow a step, for speculative prefetch.
+    
+    Only steps that do not stamp a start date are predicted: a standup after
+    sprint planning or a standup, the sprint review after the last standup of
+    a sprint, and the PI end after its last sprint.
+    
+    Args:
+        step (str): The step that has just run
+        simulation (SAFeSimulation): The simulation it ran on
+        
+    Returns:
+        str: The name of the predicted step, or None
+    """
+    if step == "start_sprint":
+        return "daily_standup"
+    if step == "daily_standup":
+        return "daily_standup" if simulation.current_day < simulation.sprint_length * 5 else "end_sprint"  # 5-day work week
+    if step == "end_sprint" and simulation.current_sprint >= simulation.pi_length:
+        return "end_pi"
+    return None
+
+
+def expand_plan(plan, max_steps=None):
+    """Expand a run plan into the flat list of simulation steps it describes.
+    
+    Each plan entry is a dict with a "step" name and an optional "repeat" count.
+    Besides the names in SIMULATION_STEPS, the composite step "sprint" runs
+    start_sprint, "standups" daily standups (default: one per working day) and
+    end_sprint. For example, a full PI of 5 sprints with 10 standups each:
+    
+        [{"step": "start_pi"}, {"step": "sprint", "repeat": 5, "standups": 10}, {"step": "end_pi"}]
+    
+    Args:
+        plan (list): Plan entries
+        max_steps (int, optional): Maximum number of expanded steps allowed
+        
+    Returns:
+        list: Step names in execution order
+        
+    Raises:
+        ValueError: If the plan is malformed or expands beyond max_steps
+    """
+    if not isinstance(plan, list) or not plan:
+        raise ValueError("Plan must be a non-empty list of steps")
+    
+    steps = []
+    for entry in plan:
+        if not isinstance(entry, dict) or "step" not in entry:
+            raise ValueError(f"Invalid plan entry: {entry!r}")
+        
+        repeat = entry.get("repeat", 1)
+        if isinstance(repeat, bool) or not isinstance(repeat, int) or repeat < 1:
+            raise ValueError(f"Invalid repeat count for {entry['step']}: {repeat!r}")
+        
+        if entry["step"] == "sprint":
+            standups = entry.get("standups", DEFAULT_SPRINT_LENGTH * 5)  # Assuming 5-day work week
+            if isinstance(standups, bool) or not isinstance(standups, int) or standups < 0:
+                raise ValueError(f"Invalid standup count: {standups!r}")
+            block_size = standups + 2
+        elif entry["step"] in SIMULATION_STEPS:
+            block_size = 1
+        else:
+            raise ValueError(f"Unknown simulation step: {entry['step']}")
+        
+        # Checked before anything is built, so a huge count cannot exhaust memory
+        if max_steps and len(steps) + block_size * repeat > max_steps:
+            raise ValueError(f"Plan expands to more than {max_steps} steps")
+        
+        if entry["step"] == "sprint":
+            block = ["start_sprint"] + ["daily_standup"] * standups + ["end_sprint"]
+        else:
+            block = [entry["step"]]
+        steps.extend(block * repeat)
+    
+    return steps
 
 
 # Example usage (for testing)
@@ -0,0 +1,150 @@
+"""Production entry point for the SAFe AI Agents web application.
+
+`python app.py` runs the Werkzeug development server. This module runs the same
+app on a cooperative (green-thread) server instead, so one process can hold
+many concurrent WebSocket clients while LLM calls are in flight:
+
+    SAFE_ASYNC_MODE=gevent python serve.py
+    SAFE_ASYNC_MODE=eventlet SAFE_MAX_CONNECTIONS=2000 python serve.py
+
+`--workers N` starts N such processes on consecutive ports after SAFE_PORT.
+They share simulations (SAFE_SIMULATION_STORE), Socket.IO emits
+(SAFE_MESSAGE_QUEUE, which must be set) and the session key (SAFE_SECRET_KEY);
+put a load balancer in front that routes on the `safe_worker` cookie:
+
+    SAFE_MESSAGE_QUEUE=redis://localhost:6379/1 python serve.py --workers 4
+
+Install the server dependencies with `pip install -r requirements-prod.txt`.
+"""
+import os
+import sys
+import argparse
+
+# The async mode must be chosen, and the standard library patched, before
+# anything else (Flask, the provider SDKs, threading) is imported.
+ASYNC_MODE = os.getenv("SAFE_ASYNC_MODE", "gevent")
+
+if ASYNC_MODE == "eventlet":
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == "gevent":
+    from gevent import monkey
+    monkey.patch_all()
+elif ASYNC_MODE != "threading":
+    sys.exit(f"Unsupported SAFE_ASYNC_MODE: {ASYNC_MODE} (use eventlet, gevent or threading)")
+
+os.environ["SAFE_ASYNC_MODE"] = ASYNC_MODE
+if ASYNC_MODE != "threading":
+    # The OpenAI and Anthropic clients use plain sockets and become cooperative once
+    # patched; Gemini's default gRPC transport does not, so use its REST transport.
+    os.environ.setdefault("SAFE_GOOGLE_TRANSPORT", "rest")
+
+import logging
+
+from app import app, socketio, start_demo_warmup
+from config import SERVER_HOST, SERVER_PORT, SERVER_MAX_CONNECTIONS
+
+
+def server_options(async_mode, max_connections):
+    """Return the keyword arguments that cap concurrent connections for a server type."""
+    if async_mode == "eventlet":
+        return {"max_size": max_connections}
+    if async_mode == "gevent":
+        from gevent.pool import Pool
+        return {"spawn": Pool(max_connections)}
+    return {}
+
+
+NGINX_TEMPLATE = """\
+# Sticky routing for the SAFe workers; the app sets the safe_worker cookie
+map $cookie_safe_worker $safe_backend {{
+{routes}    default {default};
+}}
+
+server {{
+    listen {port};
+    location / {{
+        proxy_pass http://$safe_backend;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection "upgrade";
+        proxy_set_header Host $host;
+    }}
+}}
+"""
+
+
+def nginx_config(port, workers):
+    """Return an nginx snippet routing each safe_worker cookie to its worker."""
+    routes = "".join(f"    {worker_id} 127.0.0.1:{worker_port};\n" for worker_id, worker_port in workers)
+    return NGINX_TEMPLATE.format(routes=routes, default=f"127.0.0.1:{workers[0][1]}", port=port)
+
+
+def run_workers(count):
+    """Start count worker processes sharing state, and wait for them to exit."""
+    import shutil
+    import secrets
+    import subprocess
+    import tempfile
+
+    queue = os.getenv("SAFE_MESSAGE_QUEUE")
+    if not queue:
+        sys.exit("--workers needs a Socket.IO message queue shared by the workers: set SAFE_MESSAGE_QUEUE "
+                 "to a Redis or kombu URL, e.g. redis://localhost:6379/1 (file:///dir for local testing only)")
+    if queue.startswith("file://"):
+        logging.warning("SAFE_MESSAGE_QUEUE=%s is a local stand-in: it works on one host only and its file "
+                        "is never truncated; use Redis or another kombu queue in production", queue)
+
+    env = dict(os.environ)
+    env.setdefault("SAFE_SECRET_KEY", secrets.token_hex(32))
+    shared = None
+    if not env.get("SAFE_SIMULATION_STORE"):
+        # Simulations of this launch only; removed once the workers exit
+        shared = tempfile.mkdtemp(prefix="safe-")
+        env["SAFE_SIMULATION_STORE"] = f"file://{shared}/simulations"
+
+    workers = [(f"w{index}", SERVER_PORT + index) for index in range(1, count + 1)]
+    processes = []
+    try:
+        for worker_id, worker_port in workers:
+            worker_env = dict(env, SAFE_WORKER_ID=worker_id, SAFE_PORT=str(worker_port))
+            processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=worker_env))
+
+        print(nginx_config(SERVER_PORT, workers))
+        try:
+            for process in processes:
+                process.wait()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+        return max(process.wait() for process in processes)
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if shared:
+            shutil.rmtree(shared, ignore_errors=True)
+
+
+def main(argv=None):
+    """Run the app on the configured production server."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    args = parser.parse_args(argv)
+    if args.workers > 1:
+        return run_workers(args.workers)
+
+    logging.info(
+        "Serving on %s:%s with %s (max %d connections)",
+        SERVER_HOST, SERVER_PORT, ASYNC_MODE, SERVER_MAX_CONNECTIONS
+    )
+    options = server_options(ASYNC_MODE, SERVER_MAX_CONNECTIONS)
+    start_demo_warmup()
+    if ASYNC_MODE == "threading":
+        options["allow_unsafe_werkzeug"] = True
+    socketio.run(app, host=SERVER_HOST, port=SERVER_PORT, debug=False, use_reloader=False, **options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -83,6 +83,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Button elements
     const startPiBtn = document.getElementById('start-pi');
     const endPiBtn = document.getElementById('end-pi');
+    const autoRunPiBtn = document.getElementById('auto-run-pi');
     const startSprintBtn = document.getElementById('start-sprint');
     const runStandupBtn = document.getElementById('run-standup');
     const endSprintBtn = document.getElementById('end-sprint');
@@ -147,11 +148,11 @@ document.addEventListener('DOMContentLoaded', function() {
         } else if (panel === 'communication') {
             communicationPanel.classList.remove('d-none');
             navCommunication.classList.add('active');
-            loadCommunications();
+            communicationsTable.refresh();
         } else if (panel === 'events') {
             eventsPanel.classList.remove('d-none');
             navEvents.classList.add('active');
-            loadEvents();
+            eventsTable.refresh();
         }
     }
     
@@ -183,6 +184,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const projectName = document.getElementById('project-name').value || 'SAFe Demo Project';
         const configuration = document.getElementById('configuration').value;
         const useSampleBacklog = document.getElementById('use-sample-backlog').checked;
+        const fastMechanics = document.getElementById('fast-mechanics').checked;
         
         fetch('/api/initialize', {
             method: 'POST',
@@ -192,7 +194,8 @@ document.addEventListener('DOMContentLoaded', function() {
             body: JSON.stringify({
                 project_name: projectName,
                 configuration: configuration,
-                use_sample_backlog: useSampleBacklog
+                use_sample_backlog: useSampleBacklog,
+                fast_mechanics: fastMechanics
             })
         })
         .then(response => response.json())
@@ -203,6 +206,10 @@ document.addEventListener('DOMContentLoaded', function() {
                 showControls();
                 showPanel('simulation');
                 
+                // Subscribe to updates for the new simulation only
+                socket.emit('join_simulation', {simulation_id: data.state.simulation_id});
+                socket.emit('resume', {simulation_id: logSimulationId, since: lastLogSeq});
+                
                 activityContent.innerHTML = `
                     <div class="alert alert-success">
                         <h6>Simulation Initialized</h6>
@@ -232,6 +239,7 @@ document.addEventListener('DOMContentLoaded', function() {
             body: JSON.stringify({})
         })
         .then(response => response.json())
+        .then(waitForJob)
         .then(data => {
             if (data.status === 'success') {
                 simulationState = data.state;
@@ -362,6 +370,7 @@ document.addEventListener('DOMContentLoaded', function() {
             body: JSON.stringify({})
         })
         .then(response => response.json())
+        .then(waitForJob)
         .then(data => {
             if (data.status === 'success') {
                 simulationState = data.state;
@@ -404,6 +413,7 @@ document.addEventListener('DOMContentLoaded', function() {
             body: JSON.stringify({})
         })
         .then(response => response.json())
+        .then(waitForJob)
         .then(data => {
             if (data.status === 'success') {
                 simulationState = data.state;
@@ -435,6 +445,47 @@ document.addEventListener('DOMContentLoaded', function() {
         .catch(error => console.error('Error ending PI:', error));
     });
     
+    // Auto-run a full PI server-side in a single request
+    autoRunPiBtn.addEventListener('click', function() {
+        fetch('/api/run', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                plan: [
+                    {step: 'start_pi'},
+                    {step: 'sprint', repeat: 5, standups: 10},
+                    {step: 'end_pi'}
+                ]
+            })
+        })
+        .then(response => response.json())
+        .then(waitForJob)
+        .then(data => {
+            if (data.status === 'success') {
+                const piEnd = data.data.results.filter(result => result.step === 'end_pi').pop();
+                
+                activityContent.innerHTML = `
+                    <div class="alert alert-success">
+                        <h6>Auto-run Completed</h6>
+                        <p>Steps Run: ${data.data.steps_completed}<br>
+                        ${piEnd ? `PI ${piEnd.pi_number} Predictability: ${piEnd.metrics.predictability.toFixed(1)}%` : ''}</p>
+                    </div>
+                `;
+                
+                responseContent.innerHTML = `
+                    <div class="alert alert-info">
+                        <p>All ceremony narratives are available in the Communication log.</p>
+                    </div>
+                `;
+            } else {
+                activityContent.innerHTML = `<div class="alert alert-danger">Error: ${data.message}</div>`;
+            }
+        })
+        .catch(error => console.error('Error running PI:', error));
+    });
+    
     // Handle Change Request
     changeRequestForm.addEventListener('submit', function(e) {
         e.preventDefault();
@@ -556,65 +607,194 @@ document.addEventListener('DOMContentLoaded', function() {
         .catch(error => console.error('Error requesting technical guidance:', error));
     });
     
-    // Load communications
-    function loadCommunications() {
-        fetch('/api/communications')
+    // Background jobs: callbacks waiting for a job to finish, and finished jobs
+    // whose Socket.IO event beat the HTTP 202 response
+    const pendingJobs = {};
+    const finishedJobs = {};
+    
+    /**
+     * Resolve a 202 job response into the usual success payload once the job finishes
+     * @param {Object} data - Parsed JSON response from a job endpoint
+     * @returns {Promise|Object} Promise for the job result, or data unchanged if it was not a job
+     */
+    function waitForJob(data) {
+        if (data.status !== 'accepted') {
+            return data;
+        }
+        
+        activityContent.innerHTML = `
+            <div class="alert alert-info">
+                <div class="spinner-border spinner-border-sm text-primary" role="status"></div>
+                <span id="job-progress-message">${data.job.message}</span>
+            </div>
+        `;
+        
+        return new Promise((resolve, reject) => {
+            const settle = job => {
+                if (job.status === 'succeeded') {
+                    resolve({status: 'success', data: job.result, state: simulationState});
+                } else {
+                    activityContent.innerHTML = `<div class="alert alert-danger">${job.name} ${job.status}: ${job.error || job.message}</div>`;
+                    reject(new Error(`Job ${job.id} ${job.status}`));
+                }
+            };
+            
+            if (finishedJobs[data.job.id]) {
+                settle(finishedJobs[data.job.id]);
+                delete finishedJobs[data.job.id];
+            } else {
+                pendingJobs[data.job.id] = settle;
+            }
+        });
+    }
+    
+    // Log sync state: entries arrive as Socket.IO deltas keyed by sequence number
+    let logSimulationId = null;
+    let lastLogSeq = 0;
+    
+    // Server page size for older log entries (SAFE_LOG_PAGE_SIZE caps it)
+    const LOG_PAGE_SIZE = 200;
+    
+    /**
+     * Fill a communications table row
+     * @param {Object} comm - Communication entry
+     * @param {HTMLElement} row - Row to render into
+     */
+    function renderCommunicationRow(comm, row) {
+        const truncatedMessage = truncateHTML(comm.message_html, 100);
+        row.innerHTML = `
+            <td>${comm.datetime}</td>
+            <td>${comm.sender}</td>
+            <td>${comm.recipient}</td>
+            <td>
+                <span class="message-content">${truncatedMessage}</span>
+                ${comm.narrative ?
+                    `<span class="expand-message" onclick="generateNarrative('${comm.narrative}', '${comm.sender} to ${comm.recipient}')">Generate narrative</span>` :
+                  comm.message.length > 100 ? 
+                    `<span class="expand-message" onclick="showFullResponse('${comm.sender} to ${comm.recipient}', '${encodeURIComponent(comm.message_html)}')">View full message</span>` : ''}
+            </td>
+            <td>${comm.pi}</td>
+            <td>${comm.sprint}</td>
+        `;
+    }
+    
+    /**
+     * Fill an events table row
+     * @param {Object} event - Event entry
+     * @param {HTMLElement} row - Row to render into
+     */
+    function renderEventRow(event, row) {
+        row.classList.add('event-row');
+        row.innerHTML = `
+            <td>${event.datetime}</td>
+            <td>${event.type}</td>
+            <td>${event.description}</td>
+            <td>${event.pi}</td>
+            <td>${event.sprint}</td>
+            <td>${event.day}</td>
+        `;
+    }
+    
+    /**
+     * Load the page of a log before the oldest row of a table
+     * @param {VirtualTable} table - Table to prepend to
+     * @param {string} url - Log endpoint
+     * @returns {Promise}
+     */
+    function loadOlderEntries(table, url) {
+        const oldest = table.oldest();
+        const before = oldest ? oldest.seq : lastLogSeq + 1;
+        const generation = table.generation;
+        return fetch(`${url}?before=${before}&limit=${LOG_PAGE_SIZE}`)
             .then(response => response.json())
             .then(data => {
-                if (data.status === 'success' && data.data.length > 0) {
-                    communicationsTableBody.innerHTML = '';
-                    
-                    data.data.forEach(comm => {
-                        const truncatedMessage = truncateHTML(comm.message_html, 100);
-                        const row = document.createElement('tr');
-                        row.innerHTML = `
-                            <td>${comm.datetime}</td>
-                            <td>${comm.sender}</td>
-                            <td>${comm.recipient}</td>
-                            <td>
-                                <div class="message-content">${truncatedMessage}</div>
-                                ${comm.message.length > 100 ? 
-                                    `<div class="expand-message" onclick="showFullResponse('${comm.sender} to ${comm.recipient}', '${encodeURIComponent(comm.message_html)}')">View full message</div>` : ''}
-                            </td>
-                            <td>${comm.pi}</td>
-                            <td>${comm.sprint}</td>
-                        `;
-                        communicationsTableBody.appendChild(row);
-                    });
-                } else {
-                    communicationsTableBody.innerHTML = '<tr><td colspan="6" class="text-center">No communications yet</td></tr>';
+                // Drop pages of a log the table has been reset from in the meantime
+                if (data.status === 'success' && generation === table.generation) {
+                    table.prepend(data.data, data.has_more);
                 }
             })
-            .catch(error => console.error('Error loading communications:', error));
+            .catch(error => console.error('Error loading older log entries:', error));
+    }
+    
+    // Only the rows in view are rendered, so the tables stay fast with long logs
+    const communicationsTable = new VirtualTable(communicationsTableBody, {
+        rowHeight: 44,
+        columns: 6,
+        emptyText: 'No communications yet',
+        renderRow: renderCommunicationRow,
+        onReachTop: () => loadOlderEntries(communicationsTable, '/api/communications')
+    });
+    
+    const eventsTable = new VirtualTable(eventsTableBody, {
+        rowHeight: 44,
+        columns: 6,
+        emptyText: 'No events yet',
+        renderRow: renderEventRow,
+        onReachTop: () => loadOlderEntries(eventsTable, '/api/events')
+    });
+    
+    /**
+     * Apply a log delta pushed by the server
+     * @param {Object} delta - New entries since a sequence number
+     */
+    function applyLogDelta(delta) {
+        // A new simulation restarts the sequence, and a truncated delta leaves a gap,
+        // so start the tables over; older entries are paged in on scrolling up
+        if (delta.simulation_id !== logSimulationId || delta.truncated) {
+            logSimulationId = delta.simulation_id;
+            lastLogSeq = 0;
+            communicationsTable.reset([], Boolean(delta.communications_has_more));
+            eventsTable.reset([], Boolean(delta.events_has_more));
+        }
+        
+        // Skip entries already applied (e.g. a resume racing a broadcast)
+        communicationsTable.append(delta.communications.filter(comm => comm.seq > lastLogSeq));
+        eventsTable.append(delta.events.filter(event => event.seq > lastLogSeq));
+        if (delta.revised && delta.revised.length) {
+            applyRenderedNarratives(delta.revised);
+        }
+        lastLogSeq = Math.max(lastLogSeq, delta.last_seq);
     }
     
-    // Load events
-    function loadEvents() {
-        fetch('/api/events')
+    /**
+     * Replace the rows of communications whose deferred narrative has been generated
+     * @param {Array} communications - Updated entries
+     */
+    function applyRenderedNarratives(communications) {
+        const bySeq = new Map(communications.map(comm => [comm.seq, comm]));
+        communicationsTable.items.forEach((comm, index) => {
+            if (bySeq.has(comm.seq)) {
+                communicationsTable.items[index] = bySeq.get(comm.seq);
+            }
+        });
+        communicationsTable.render(true);
+    }
+    
+    /**
+     * Generate a deferred narrative of a fast mechanics simulation and show it
+     * @param {string} key - Narrative key of the communication
+     * @param {string} title - Modal title
+     */
+    window.generateNarrative = function(key, title) {
+        responseModalTitle.textContent = title;
+        responseModalBody.innerHTML = '<div class="text-center"><div class="spinner-border" role="status"></div><p>Generating narrative...</p></div>';
+        responseModal.show();
+        
+        fetch(`/api/narratives/${key}`, {method: 'POST'})
             .then(response => response.json())
             .then(data => {
-                if (data.status === 'success' && data.data.length > 0) {
-                    eventsTableBody.innerHTML = '';
-                    
-                    data.data.forEach(event => {
-                        const row = document.createElement('tr');
-                        row.classList.add('event-row');
-                        row.innerHTML = `
-                            <td>${event.datetime}</td>
-                            <td>${event.type}</td>
-                            <td>${event.description}</td>
-                            <td>${event.pi}</td>
-                            <td>${event.sprint}</td>
-                            <td>${event.day}</td>
-                        `;
-                        eventsTableBody.appendChild(row);
-                    });
+                if (data.status === 'success') {
+                    applyRenderedNarratives(data.data);
+                    responseModalBody.innerHTML = data.data[0].message_html;
                 } else {
-                    eventsTableBody.innerHTML = '<tr><td colspan="6" class="text-center">No events yet</td></tr>';
+                    responseModalBody.innerHTML = `<div class="alert alert-warning">${data.message}</div>`;
                 }
             })
-            .catch(error => console.error('Error loading events:', error));
-    }
+            .catch(error => {
+                console.error('Error generating narrative:', error);
+                responseModalBody.innerHTML = '<div class="alert alert-danger">Could not generate the narrative.</div>';
+            });
+    };
     
     /**
      * Update simulation status displays
@@ -715,6 +895,7 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Enable/disable buttons based on state
         startPiBtn.disabled = simulationState.current_pi > 0;
+        autoRunPiBtn.disabled = !simulationState.initialized;
         endPiBtn.disabled = simulationState.current_pi === 0;
         
         startSprintBtn.disabled = simulationState.current_sprint > 0 || simulationState.current_pi === 0;
@@ -741,35 +922,119 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Socket event handlers
-    socket.on('simulation_state', function(data) {
-        simulationState = data.state;
-        updateSimulationStatus();
-        showControls();
+    socket.on('connect', function() {
+        // Ask only for the entries missed while disconnected
+        socket.emit('resume', {
+            simulation_id: logSimulationId,
+            since: lastLogSeq
+        });
     });
     
-    socket.on('pi_started', function(data) {
-        simulationState = data.state;
-        updateSimulationStatus();
+    socket.on('job_progress', function(job) {
+        const message = document.getElementById('job-progress-message');
+        if (pendingJobs[job.id] && message) {
+            message.textContent = job.message;
+        }
     });
     
-    socket.on('sprint_started', function(data) {
-        simulationState = data.state;
-        updateSimulationStatus();
+    socket.on('job_finished', function(job) {
+        if (pendingJobs[job.id]) {
+            pendingJobs[job.id](job);
+            delete pendingJobs[job.id];
+        } else {
+            finishedJobs[job.id] = job;
+        }
     });
     
-    socket.on('standup_completed', function(data) {
-        simulationState = data.state;
-        updateSimulationStatus();
+    socket.on('log_delta', function(data) {
+        applyLogDelta(data);
+    });
+    
+    socket.on('narratives_rendered', function(data) {
+        if (data.simulation_id === logSimulationId) {
+            applyRenderedNarratives(data.communications);
+        }
     });
     
-    socket.on('sprint_ended', function(data) {
+    // Reload a configuration image once the server has built the variants of a new upload
+    socket.on('config_image_updated', function(data) {
+        const image = $('#config-image');
+        const src = image.attr('src') || '';
+        if (data.success && src.startsWith(data.url)) {
+            const url = new URL(src, window.location.origin);
+            url.searchParams.set('v', Date.now());
+            image.attr('src', url.pathname + url.search);
+        }
+    });
+    
+    // Last state version received from the server; patches are applied against it
+    let stateVersion = null;
+    
+    /**
+     * Apply JSON-patch style operations to an object
+     * @param {Object} target - Object to modify
+     * @param {Array} operations - Operations with op, path and value
+     * @returns {Object} The patched object
+     */
+    function applyStatePatch(target, operations) {
+        operations.forEach(operation => {
+            if (operation.path === '') {
+                target = operation.value;
+                return;
+            }
+            
+            const keys = operation.path.split('/').slice(1)
+                .map(key => key.replace(/~1/g, '/').replace(/~0/g, '~'));
+            const last = keys.pop();
+            let parent = target;
+            keys.forEach(key => {
+                parent = parent[key];
+            });
+            
+            if (operation.op === 'remove') {
+                delete parent[last];
+            } else {
+                parent[last] = operation.value;
+            }
+        });
+        return target;
+    }
+    
+    /**
+     * Replace the local state with a full copy from the server
+     * @param {Object} data - Payload with version and state
+     */
+    function applyFullState(data) {
+        if (!data.state) {
+            return;
+        }
+        stateVersion = data.version;
         simulationState = data.state;
         updateSimulationStatus();
+        showControls();
+        socket.emit('state_ack', {version: stateVersion});
+    }
+    
+    socket.on('simulation_state', function(data) {
+        applyFullState(data);
     });
     
-    socket.on('pi_ended', function(data) {
-        simulationState = data.state;
+    socket.on('state_patch', function(data) {
+        if (data.state) {
+            applyFullState(data);
+            return;
+        }
+        
+        // Our copy is not the base of this patch, so ask for a full state instead
+        if (data.base_version !== stateVersion) {
+            socket.emit('state_resync');
+            return;
+        }
+        
+        simulationState = applyStatePatch(simulationState, data.patch);
+        stateVersion = data.version;
         updateSimulationStatus();
+        socket.emit('state_ack', {version: stateVersion});
     });
     
     // Show full response in modal
@@ -903,6 +1168,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     <div class="alert alert-info">
                         <strong>You asked:</strong> ${question}
                     </div>
+                    ${data.cached ? `<div class="small text-muted mb-2">Reused the answer to a similar earlier question (${Math.round(data.cached.similarity * 100)}% match)</div>` : ''}
                     <div class="rendered-markdown">
                         ${data.response_html || data.response}
                     </div>
@@ -973,23 +1239,16 @@ document.addEventListener('DOMContentLoaded', function() {
      * @param {string} timestamp - Timestamp of the communication
      */
     function addCommunication(from, to, message, timestamp) {
-        const truncatedMessage = truncateHTML(message, 50);
-        const row = document.createElement('tr');
-        row.innerHTML = `
-            <td>${timestamp || new Date().toLocaleTimeString()}</td>
-            <td>${from}</td>
-            <td>${to}</td>
-            <td>${truncatedMessage}</td>
-            <td>${simulationState.current_pi || 'N/A'}</td>
-            <td>${simulationState.current_sprint || 'N/A'}</td>
-        `;
-        
-        // Remove "No communications yet" row if it exists
-        if (communicationsTableBody.querySelector('td[colspan="6"]')) {
-            communicationsTableBody.innerHTML = '';
-        }
-        
-        communicationsTableBody.prepend(row);
+        // Not part of the simulation log, so it has no sequence number
+        communicationsTable.append([{
+            datetime: timestamp || new Date().toLocaleTimeString(),
+            sender: from,
+            recipient: to,
+            message: message,
+            message_html: message,
+            pi: simulationState.current_pi || 'N/A',
+            sprint: simulationState.current_sprint || 'N/A'
+        }]);
     }
     
     // SAFe Demonstration event handlers
@@ -1202,22 +1461,12 @@ document.addEventListener('DOMContentLoaded', function() {
             'full': 'Full SAFe - Enterprise-scale Transformation Methodology'
         };
         
-        // Map the config_type to the image number based on the user-provided images
-        const configImageMapping = {
-            'big_picture': 1,      // First image
-            'core_competencies': 2, // Second image
-            'essential': 3,         // Third image
-            'large_solution': 4,    // Fourth image
-            'portfolio': 5,         // Fifth image
-            'full': 6               // Sixth image
-        };
-        
         // Set configuration title with enhanced semantic description
         $('#config-title').text(configurationNomenclature[configType]);
         
-        // Use the mapped image number to load the correct image
-        const imgNum = configImageMapping[configType];
-        $('#config-image').attr('src', `/static/images/safe_config_${imgNum}.jpg`);
+        // Ask for a variant sized to the container (in device pixels); the server picks WebP or JPEG
+        const displayWidth = Math.round(($('#config-image-container').width() || 800) * (window.devicePixelRatio || 1));
+        $('#config-image').attr('src', `/api/safe_config_image/${configType}?w=${displayWidth}`);
         $('#config-loading').show();
         
         // Reset all agent tabs with methodologically sound initialization
@@ -0,0 +1,188 @@
+// Virtualized Table Rendering
+
+/**
+ * Renders only the rows of a long table that are in (or near) view.
+ *
+ * Rows have a fixed height, so the rows above and below the window are
+ * replaced by two spacer rows of the same total height and the scrollbar
+ * stays accurate. The table body lives in a scrolling container; entries are
+ * appended as log deltas arrive and older pages are prepended on scrolling
+ * to the top.
+ */
+class VirtualTable {
+    /**
+     * @param {HTMLElement} tbody - Table body to render into
+     * @param {Object} options - rowHeight (px), columns, emptyText, renderRow(item, tr),
+     *     overscan (rows rendered beyond the viewport) and onReachTop() to load older rows
+     */
+    constructor(tbody, options) {
+        this.tbody = tbody;
+        this.container = tbody.closest('.virtual-scroll');
+        this.rowHeight = options.rowHeight;
+        this.columns = options.columns;
+        this.emptyText = options.emptyText;
+        this.renderRow = options.renderRow;
+        this.overscan = options.overscan || 10;
+        this.onReachTop = options.onReachTop || null;
+
+        this.items = [];
+        this.hasMore = false;
+        this.loading = false;
+        this.following = true;  // Whether the newest rows are in view and new ones should scroll in
+        this.generation = 0;  // Bumped on reset so stale page loads are dropped
+        this.range = null;
+        this.frame = null;
+
+        this.topSpacer = this.createSpacer();
+        this.bottomSpacer = this.createSpacer();
+        this.container.addEventListener('scroll', () => {
+            const container = this.container;
+            this.following = container.scrollTop + container.clientHeight >= container.scrollHeight - this.rowHeight;
+            this.scheduleRender();
+        }, {passive: true});
+        window.addEventListener('resize', () => this.scheduleRender());
+        this.render(true);
+    }
+
+    createSpacer() {
+        const row = document.createElement('tr');
+        row.className = 'virtual-spacer';
+        row.innerHTML = `<td colspan="${this.columns}"></td>`;
+        return row;
+    }
+
+    /**
+     * Replace all rows
+     * @param {Array} items - Entries, oldest first
+     * @param {boolean} hasMore - Whether older entries can be loaded
+     */
+    reset(items = [], hasMore = false) {
+        this.items = items.slice();
+        this.hasMore = hasMore;
+        this.loading = false;
+        this.generation++;
+        this.following = true;
+        this.refresh();
+    }
+
+    /**
+     * Re-render, e.g. once a hidden table is shown and its viewport size is known
+     */
+    refresh() {
+        this.render(true);
+        if (this.following) {
+            this.container.scrollTop = this.container.scrollHeight;
+            this.render(false);
+        }
+    }
+
+    /**
+     * Add entries at the end, following the tail if it was in view
+     * @param {Array} items - New entries, oldest first
+     */
+    append(items) {
+        if (items.length === 0) {
+            return;
+        }
+
+        const previousLength = this.items.length;
+        this.items.push(...items);
+
+        if (this.following) {
+            this.refresh();
+        } else if (!this.range || this.range.end >= previousLength) {
+            this.render(true);
+        } else {
+            // The new rows are out of view; only the scroll height changes
+            this.bottomSpacer.firstChild.style.height = `${(this.items.length - this.range.end) * this.rowHeight}px`;
+        }
+    }
+
+    /**
+     * Add older entries at the start without moving the rows in view
+     * @param {Array} items - Older entries, oldest first
+     * @param {boolean} hasMore - Whether even older entries can be loaded
+     */
+    prepend(items, hasMore) {
+        this.hasMore = hasMore;
+        if (items.length === 0) {
+            return;
+        }
+        // Grow the top spacer first, so the scroll position can move past the old top
+        const scrollTop = this.container.scrollTop;
+        this.items.unshift(...items);
+        this.render(true);
+        this.container.scrollTop = scrollTop + items.length * this.rowHeight;
+        this.render(false);
+    }
+
+    /**
+     * The first entry with a sequence number, used as the cursor for older pages
+     * @returns {Object|undefined}
+     */
+    oldest() {
+        return this.items.find(item => item.seq !== undefined);
+    }
+
+    scheduleRender() {
+        if (this.frame === null) {
+            this.frame = requestAnimationFrame(() => {
+                this.frame = null;
+                this.render(false);
+                this.maybeLoadOlder();
+            });
+        }
+    }
+
+    maybeLoadOlder() {
+        if (!this.onReachTop || !this.hasMore || this.loading) {
+            return;
+        }
+        if (this.container.scrollTop < this.overscan * this.rowHeight) {
+            this.loading = true;
+            const generation = this.generation;
+            Promise.resolve(this.onReachTop())
+                .finally(() => {
+                    if (generation === this.generation) {
+                        this.loading = false;
+                    }
+                });
+        }
+    }
+
+    /**
+     * Render the rows in the visible window
+     * @param {boolean} force - Re-render even if the window did not move
+     */
+    render(force) {
+        if (this.items.length === 0) {
+            this.range = null;
+            this.tbody.innerHTML = `<tr><td colspan="${this.columns}" class="text-center">${this.emptyText}</td></tr>`;
+            return;
+        }
+
+        const scrollTop = this.container.scrollTop;
+        const height = this.container.clientHeight || this.rowHeight * 20;
+        let start = Math.max(0, Math.floor(scrollTop / this.rowHeight) - this.overscan);
+        start -= start % 2;  // Keep table-striped rows from flipping colour while scrolling
+        const end = Math.min(this.items.length, Math.ceil((scrollTop + height) / this.rowHeight) + this.overscan);
+
+        if (!force && this.range && this.range.start === start && this.range.end === end) {
+            return;
+        }
+        this.range = {start, end};
+
+        this.topSpacer.firstChild.style.height = `${start * this.rowHeight}px`;
+        this.bottomSpacer.firstChild.style.height = `${(this.items.length - end) * this.rowHeight}px`;
+
+        const fragment = document.createDocumentFragment();
+        fragment.appendChild(this.topSpacer);
+        for (let index = start; index < end; index++) {
+            const row = document.createElement('tr');
+            this.renderRow(this.items[index], row);
+            fragment.appendChild(row);
+        }
+        fragment.appendChild(this.bottomSpacer);
+        this.tbody.replaceChildren(fragment);
+    }
+}
@@ -0,0 +1,53 @@
+"""Shared fixtures: the Flask app with the model APIs stubbed out (see benchmarks/stub_models.py)."""
+import os
+import sys
+import time
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# Set before config.py is imported
+os.environ.setdefault('SAFE_DEMO_ANSWERS', os.path.join(tempfile.mkdtemp(prefix='safe-tests-'), 'demo_answers.json'))
+os.environ['SAFE_DEMO_WARMUP'] = 'false'
+
+import stub_models  # noqa: E402
+
+MODEL_CALLS = stub_models.install()
+
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The app module, imported once with stubbed models."""
+    import app
+    app.app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    """A test client with its own session cookie."""
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def simulation_id(client):
+    """Initialize an essential simulation for the client's session and return its id."""
+    response = client.post('/api/initialize', json={'configuration': 'essential', 'project_name': 'Test Project'})
+    assert response.status_code == 200
+    return response.get_json()['state']['simulation_id']
+
+
+def wait_for_job(client, job_id, timeout=30.0):
+    """Poll a job until it finishes and return its description."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f'/api/jobs/{job_id}').get_json()['data']
+        if job['status'] in ('succeeded', 'failed', 'cancelled'):
+            return job
+        if time.monotonic() > deadline:
+            raise AssertionError(f"Job {job_id} did not finish: {job}")
+        time.sleep(0.01)
@@ -0,0 +1,23 @@
+import pytest
+
+from utils.image_manifest import CONFIG_IMAGE_NUMBERS
+
+
+@pytest.mark.parametrize('config_type', sorted(CONFIG_IMAGE_NUMBERS))
+def test_every_manifest_config_type_is_served(client, config_type):
+    response = client.get(f'/api/safe_config_image/{config_type}')
+    assert response.status_code == 200
+    assert response.mimetype.startswith('image/')
+
+
+def test_unknown_config_type_is_rejected(client):
+    assert client.get('/api/safe_config_image/unknown').status_code == 400
+    assert client.post('/api/upload_safe_config_image/unknown').status_code == 400
+
+
+def test_config_image_revalidates_with_304(client):
+    response = client.get('/api/safe_config_image/essential')
+    etag = response.headers['ETag']
+    cached = client.get('/api/safe_config_image/essential', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
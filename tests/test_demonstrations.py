@@ -0,0 +1,28 @@
+import logging
+
+from agents.scrum_master import ScrumMaster
+from utils.demo_answers import COT_QUESTIONS
+
+
+def test_demonstrate_cot_logs_instead_of_printing(client, simulation_id, caplog, capsys):
+    question = COT_QUESTIONS['scrum_master'][0][0]
+    with caplog.at_level(logging.DEBUG, logger='app'):
+        response = client.post('/api/demonstrate_cot', json={'agent_type': 'scrum_master', 'question': question})
+    assert response.status_code == 200
+    assert 'demonstrate_cot' in caplog.text
+    assert '[DEBUG]' not in capsys.readouterr().out
+
+
+def test_demonstrate_cot_failure_is_logged_with_traceback(client, simulation_id, caplog, monkeypatch):
+    def fail(self, question, include_steps=True):
+        raise RuntimeError('model unavailable')
+
+    monkeypatch.setattr(ScrumMaster, 'generate_chain_of_thought_response', fail)
+    with caplog.at_level(logging.ERROR, logger='app'):
+        response = client.post('/api/demonstrate_cot', json={'agent_type': 'scrum_master',
+                                                             'question': 'Something nobody asked before?'})
+    assert response.status_code == 500
+    assert response.get_json() == {'status': 'error', 'message': 'model unavailable'}
+    failure = caplog.records[-1]
+    assert failure.getMessage() == 'Chain of Thought generation failed'
+    assert failure.exc_info[0] is RuntimeError
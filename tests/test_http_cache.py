@@ -0,0 +1,93 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask
+
+from utils.http_cache import (brotli, cached_jsonify, compress_response, content_etag, not_modified,
+                              streamed_jsonify, version_etag)
+
+ITEMS = [{'seq': index, 'message': f'message {index} ' * 8} for index in range(50)]
+
+
+@pytest.fixture
+def cache_app():
+    app = Flask(__name__)
+
+    @app.route('/cached')
+    def cached():
+        etag = version_etag('items', 'simulation', 7)
+        return not_modified(etag) or cached_jsonify(etag, {'data': ITEMS})
+
+    @app.route('/streamed')
+    def streamed():
+        return streamed_jsonify('stream-1', {'status': 'success'}, 'data', ITEMS, batch_size=7,
+                                transform=lambda item: {**item, 'seen': True})
+
+    @app.route('/small')
+    def small():
+        return {'status': 'success'}
+
+    app.after_request(lambda response: compress_response(response, min_size=256))
+    return app.test_client()
+
+
+def test_etags_are_stable_and_version_sensitive():
+    assert version_etag('state', 3, None) == 'state-3-None'
+    assert content_etag({'a': 1, 'b': 2}) == content_etag({'b': 2, 'a': 1})
+    assert content_etag({'a': 1}) != content_etag({'a': 2})
+
+
+def test_matching_etag_gets_empty_304(cache_app):
+    response = cache_app.get('/cached')
+    assert response.status_code == 200
+    assert response.headers['ETag'] == 'W/"items-simulation-7"'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    revalidated = cache_app.get('/cached', headers={'If-None-Match': response.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+    assert revalidated.headers['ETag'] == response.headers['ETag']
+    assert cache_app.get('/cached', headers={'If-None-Match': 'W/"items-simulation-6"'}).status_code == 200
+
+
+def test_gzip_is_used_when_accepted(cache_app):
+    response = cache_app.get('/cached', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.get_data()))['data'] == ITEMS
+
+
+@pytest.mark.skipif(brotli is None, reason='brotli is not installed')
+def test_brotli_is_preferred_when_installed(cache_app):
+    response = cache_app.get('/cached', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert json.loads(brotli.decompress(response.get_data()))['data'] == ITEMS
+
+
+def test_small_or_unaccepted_responses_are_not_compressed(cache_app):
+    assert 'Content-Encoding' not in cache_app.get('/small', headers={'Accept-Encoding': 'gzip'}).headers
+    response = cache_app.get('/cached')
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_json()['data'] == ITEMS
+
+
+def test_streamed_body_matches_jsonify(cache_app):
+    response = cache_app.get('/streamed')
+    assert response.is_streamed
+    assert response.get_json() == {'status': 'success', 'data': [{**item, 'seen': True} for item in ITEMS]}
+
+    compressed = cache_app.get('/streamed', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.get_data())) == response.get_json()
+
+
+def test_polled_endpoints_revalidate_until_the_simulation_changes(client, simulation_id):
+    for url in ('/api/state', '/api/events', '/api/communications'):
+        etag = client.get(url).headers['ETag']
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    etags = {url: client.get(url).headers['ETag'] for url in ('/api/state', '/api/events', '/api/communications')}
+    client.post('/api/ask_agent', json={'agent_type': 'developer', 'question': 'Is the build green?'})
+    for url, etag in etags.items():
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 200, url
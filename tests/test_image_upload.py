@@ -0,0 +1,57 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+
+def _png(width=8, height=6):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'navy').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def uploads(app_module, tmp_path, monkeypatch):
+    """Save uploads under a temporary static folder and record the images queued for processing."""
+    monkeypatch.setattr(app_module.app, 'static_folder', str(tmp_path))
+    submitted = []
+    monkeypatch.setattr(app_module.image_processor, 'submit_configuration_image',
+                        lambda config_type, path, callback=None: submitted.append((config_type, path)))
+    return tmp_path / 'images' / 'safe_configurations', submitted
+
+
+def _upload(client, data, config_type='essential'):
+    return client.post(f'/api/upload_safe_config_image/{config_type}',
+                       data={'image': (io.BytesIO(data), 'diagram.png')}, content_type='multipart/form-data')
+
+
+def test_upload_saves_validated_image_and_queues_processing(client, uploads):
+    upload_dir, submitted = uploads
+    data = _png()
+    response = _upload(client, data)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body['width'], body['height']) == (8, 6)
+
+    saved = upload_dir / 'essential.png'
+    assert saved.read_bytes() == data
+    assert submitted == [('essential', str(saved))]
+    assert os.listdir(upload_dir) == ['essential.png']  # No temporary file left behind
+
+
+def test_upload_over_the_size_limit_is_rejected(app_module, client, uploads, monkeypatch):
+    upload_dir, submitted = uploads
+    monkeypatch.setattr(app_module, 'UPLOAD_MAX_BYTES', 50)
+    response = _upload(client, _png(64, 64))
+    assert response.status_code == 413
+    assert os.listdir(upload_dir) == []
+    assert submitted == []
+
+
+def test_upload_of_a_non_image_is_rejected(client, uploads):
+    upload_dir, submitted = uploads
+    response = _upload(client, b'not an image at all')
+    assert response.status_code == 400
+    assert os.listdir(upload_dir) == []
+    assert submitted == []
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from conftest import wait_for_job
+from utils.jobs import JobManager, JobQueueFull, CANCELLED, SUCCEEDED
+
+
+def _blocking_job(started, release):
+    """A job function that runs until release is set, checking for cancellation afterwards."""
+    def run(job):
+        started.set()
+        release.wait(5)
+        job.check_cancelled()
+        return 'done'
+    return run
+
+
+def test_cancel_queued_job_never_runs_it():
+    manager = JobManager(max_workers=1, max_queue=5)
+    started, release = threading.Event(), threading.Event()
+    running = manager.submit('blocker', _blocking_job(started, release))
+    assert started.wait(5)
+    ran = []
+    queued = manager.submit('queued', lambda job: ran.append(True))
+
+    assert manager.cancel(queued.id)
+    assert queued.status == CANCELLED
+    release.set()
+    running.future.result(5)
+    assert running.status == SUCCEEDED
+    assert not ran
+    assert not manager.cancel(queued.id)  # Already finished
+    manager.shutdown()
+
+
+def test_cancel_running_job_stops_at_next_check():
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+    job = manager.submit('running', _blocking_job(started, release))
+    assert started.wait(5)
+
+    assert manager.cancel(job.id)
+    release.set()
+    job.future.result(5)
+    assert job.status == CANCELLED
+    assert job.result is None
+    manager.shutdown()
+
+
+def test_queue_limit_rejects_submissions():
+    manager = JobManager(max_workers=1, max_queue=1)
+    started, release = threading.Event(), threading.Event()
+    manager.submit('blocker', _blocking_job(started, release))
+    assert started.wait(5)
+    manager.submit('waiting', lambda job: None)
+    with pytest.raises(JobQueueFull):
+        manager.submit('rejected', lambda job: None)
+    release.set()
+    manager.shutdown()
+
+
+def test_prune_drops_oldest_finished_jobs():
+    manager = JobManager(max_workers=1, retain=3)
+    jobs = [manager.submit(f'job-{index}', lambda job: None) for index in range(3)]
+    for job in jobs:
+        job.future.result(5)
+    newest = manager.submit('newest', lambda job: None)
+    newest.future.result(5)
+
+    assert manager.get(jobs[0].id) is None
+    assert [job.id for job in manager.jobs.values()] == [jobs[1].id, jobs[2].id, newest.id]
+    manager.shutdown()
+
+
+def test_jobs_are_only_visible_to_their_simulation(app_module, client, simulation_id):
+    response = client.post('/api/start_pi')
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['id']
+    assert wait_for_job(client, job_id)['status'] == 'succeeded'
+
+    other = app_module.app.test_client()
+    assert other.get(f'/api/jobs/{job_id}').status_code == 404
+    assert other.post(f'/api/jobs/{job_id}/cancel').status_code == 404
+    other.post('/api/initialize', json={'configuration': 'essential'})
+    assert other.get(f'/api/jobs/{job_id}').status_code == 404
+    assert client.get(f'/api/jobs/{job_id}').status_code == 200
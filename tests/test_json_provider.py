@@ -0,0 +1,52 @@
+import json
+from datetime import datetime
+
+import pytest
+from flask import Flask
+
+from utils.json_provider import FastJSONProvider, dumps_bytes, orjson
+
+BACKENDS = ['stdlib'] + (['orjson'] if orjson is not None else [])
+
+PAYLOAD = {'status': 'success', 'data': {'zeta': 1, 'alpha': [3, 2, 1], 'mid': {'b': None, 'a': True}},
+           'when': datetime(2024, 1, 2, 3, 4, 5)}
+
+
+def _provider(backend):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    app.json.backend = backend
+    return app
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_dumps_sorts_keys_like_flask(backend):
+    app = _provider(backend)
+    decoded = json.loads(app.json.dumps(PAYLOAD))
+    assert list(decoded) == ['data', 'status', 'when']
+    assert list(decoded['data']) == ['alpha', 'mid', 'zeta']
+    assert list(decoded['data']['mid']) == ['a', 'b']
+    assert decoded['when'] == 'Tue, 02 Jan 2024 03:04:05 GMT'
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_responses_are_identical_across_backends():
+    bodies = []
+    for backend in ('stdlib', 'orjson'):
+        app = _provider(backend)
+        with app.app_context():
+            bodies.append(app.json.response(PAYLOAD).get_data())
+    assert bodies[0] == bodies[1]
+
+
+@pytest.mark.skipif(orjson is None, reason='orjson is not installed')
+def test_unsorted_provider_keeps_insertion_order():
+    app = _provider('orjson')
+    app.json.sort_keys = False
+    assert list(json.loads(app.json.dumps({'b': 1, 'a': 2}))) == ['b', 'a']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_dumps_bytes_sort_keys(backend):
+    assert dumps_bytes({'b': 1, 'a': 2}, backend, sort_keys=True) == b'{"a":2,"b":1}'
+    assert dumps_bytes({'b': 1, 'a': 2}, backend) == b'{"b":1,"a":2}'
@@ -0,0 +1,104 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import agents.knowledge_base as knowledge_base
+from agents.knowledge_base import CHUNK_WORDS, OVERLAP_WORDS, KnowledgeBase, build_index, chunk_pages
+
+
+def _pages(count=4, sentences=12):
+    """Pages of numbered ten-word sentences, e.g. 'Page 2 sentence 3 ...'."""
+    return [" ".join(f"Page {page} sentence {index} talks about agile release trains today."
+                     for index in range(sentences))
+            for page in range(1, count + 1)]
+
+
+def _overlap(previous, following):
+    """Words at the end of previous that start following."""
+    before, after = previous.split(), following.split()
+    return max((size for size in range(1, min(len(before), len(after)) + 1) if before[-size:] == after[:size]),
+               default=0)
+
+
+def test_chunk_pages_covers_every_sentence_with_bounded_overlap():
+    pages = _pages()
+    passages = chunk_pages(pages)
+    assert len(passages) > 1
+    text = " ".join(pages)
+    for page in range(1, 5):
+        for index in range(12):
+            assert any(f"Page {page} sentence {index} " in passage["text"] for passage in passages)
+    for previous, following in zip(passages, passages[1:]):
+        assert len(previous["text"].split()) >= CHUNK_WORDS
+        assert 0 < _overlap(previous["text"], following["text"]) <= OVERLAP_WORDS
+        assert previous["text"] in text
+
+
+def test_chunk_pages_numbers_passages_by_their_first_sentence():
+    for passage in chunk_pages(_pages()):
+        assert passage["text"].startswith(f"Page {passage['page']} sentence ")
+
+
+def test_chunk_pages_keeps_a_tail_only_if_it_has_new_sentences():
+    # 12 ten-word sentences fill one passage; the 30 words carried over add nothing new
+    assert [len(passage["text"].split()) for passage in chunk_pages(_pages(count=1, sentences=12))] == [120]
+    # A 13th sentence is kept, after the 30 words carried over for context
+    assert [len(passage["text"].split()) for passage in chunk_pages(_pages(count=1, sentences=13))] == [120, 40]
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    """A small index of synthetic pages; only the source file's hash is read from the 'PDF'."""
+    pages = [
+        "PI planning aligns every team of the release train. Teams commit to PI objectives.",
+        "Lean portfolio management funds value streams. Epics move through the portfolio kanban.",
+        "The system demo shows the integrated increment. PI planning follows the inspect and adapt event.",
+        "Architectural runway supports upcoming features. Enablers extend the runway.",
+    ]
+    source = tmp_path / "guide.pdf"
+    source.write_bytes(b"not a real pdf")
+    monkeypatch.setattr(knowledge_base, "extract_pages", lambda path: pages)
+    meta = build_index(str(source), str(tmp_path / "index"))
+    return meta, KnowledgeBase(str(tmp_path / "index"))
+
+
+def test_build_index_writes_loadable_metadata(index):
+    meta, knowledge = index
+    assert meta["passages"] == len(knowledge.passages) == 1  # Short pages join into one passage
+    assert "portfolio" in meta["terms"]
+
+
+@pytest.fixture
+def passages_index(tmp_path, monkeypatch):
+    """One passage per page, so ranking between pages can be observed."""
+    pages = [
+        "PI planning aligns every team of the release train around shared objectives.",
+        "Lean portfolio management funds value streams and guides epics through the kanban.",
+        "PI planning planning planning happens every quarter with all teams.",
+        "Architectural runway supports upcoming features so teams avoid rework.",
+    ]
+    source = tmp_path / "guide.pdf"
+    source.write_bytes(b"not a real pdf")
+    monkeypatch.setattr(knowledge_base, "extract_pages", lambda path: pages)
+    monkeypatch.setattr(knowledge_base, "chunk_pages",
+                        lambda texts: [{"page": number, "text": text} for number, text in enumerate(texts, 1)])
+    build_index(str(source), str(tmp_path / "index"))
+    return KnowledgeBase(str(tmp_path / "index"))
+
+
+def test_search_ranks_by_bm25(passages_index):
+    results = passages_index.search("PI planning", top_k=4)
+    assert [result["page"] for result in results] == [3, 1]  # Term frequency wins, saturating with K1
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert passages_index.search("portfolio epics")[0]["page"] == 2
+    assert passages_index.search("unknown words only") == []
+    assert passages_index.search("PI planning", top_k=1)[0]["page"] == 3
+
+
+def test_context_numbers_passages_within_the_character_budget(passages_index):
+    context = passages_index.context("PI planning teams", top_k=3, max_chars=100)
+    lines = context.splitlines()
+    assert lines[0].startswith("[1] (p. 3) PI planning")
+    texts = [line.split(") ", 1)[1] for line in lines]
+    assert sum(map(len, texts)) == 100
+    assert passages_index.context("PI planning", max_chars=0) == ""
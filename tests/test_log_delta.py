@@ -0,0 +1,83 @@
+import pytest
+
+from safe_simulation import SAFeSimulation
+
+
+@pytest.fixture
+def simulation():
+    """A simulation with interleaved events (odd seq) and communications (even seq) 1..20."""
+    simulation = SAFeSimulation('essential')
+    for index in range(10):
+        simulation.log_event('Event', f'event {index}')
+        simulation.log_communication('Agent', 'Team', f'message {index}')
+    return simulation
+
+
+def _seqs(entries):
+    return [entry['seq'] for entry in entries]
+
+
+def test_log_delta_returns_entries_after_cursor(simulation):
+    delta = simulation.get_log_delta(14)
+    assert delta['since'] == 14 and delta['last_seq'] == 20
+    assert _seqs(delta['events']) == [15, 17, 19]
+    assert _seqs(delta['communications']) == [16, 18, 20]
+    assert 'truncated' not in delta
+
+    caught_up = simulation.get_log_delta(20)
+    assert caught_up['events'] == [] and caught_up['communications'] == []
+    assert _seqs(simulation.get_log_delta(0)['events']) == list(range(1, 21, 2))
+
+
+def test_log_delta_over_the_limit_is_truncated_to_newest_entries(simulation):
+    delta = simulation.get_log_delta(0, limit=3)
+    assert delta['truncated'] is True
+    assert _seqs(delta['events']) == [15, 17, 19]
+    assert _seqs(delta['communications']) == [16, 18, 20]
+    assert delta['events_has_more'] and delta['communications_has_more']
+
+    assert 'truncated' not in simulation.get_log_delta(14, limit=3)
+
+
+def test_log_page_after_cursor_pages_forward(simulation):
+    page = simulation.get_log_page('events', after=0, limit=4)
+    assert _seqs(page['entries']) == [1, 3, 5, 7]
+    assert page['has_more'] is True and page['total'] == 10
+
+    page = simulation.get_log_page('events', after=page['entries'][-1]['seq'], limit=4)
+    assert _seqs(page['entries']) == [9, 11, 13, 15]
+    page = simulation.get_log_page('events', after=15, limit=4)
+    assert _seqs(page['entries']) == [17, 19]
+    assert page['has_more'] is False
+
+
+def test_log_page_before_cursor_pages_backward(simulation):
+    page = simulation.get_log_page('communications', before=21, limit=4)
+    assert _seqs(page['entries']) == [14, 16, 18, 20]
+    assert page['has_more'] is True
+
+    page = simulation.get_log_page('communications', before=6, limit=4)
+    assert _seqs(page['entries']) == [2, 4]
+    assert page['has_more'] is False
+
+
+def test_log_page_between_cursors(simulation):
+    page = simulation.get_log_page('events', after=4, before=12, limit=10)
+    assert _seqs(page['entries']) == [5, 7, 9, 11]
+    assert page['has_more'] is False
+
+    page = simulation.get_log_page('events', after=4, before=12, limit=2)
+    assert _seqs(page['entries']) == [9, 11]
+    assert page['has_more'] is True
+
+
+def test_log_page_endpoint(client, simulation_id):
+    client.post('/api/ask_agent', json={'agent_type': 'developer', 'question': 'How do we test this?'})
+    body = client.get('/api/communications?before=1000&limit=1').get_json()
+    assert body['status'] == 'success' and body['has_more'] is True
+    newest = body['data'][0]
+    assert newest['message_html'] and body['total'] >= 2
+
+    older = client.get(f"/api/communications?before={newest['seq']}&limit=1").get_json()
+    assert older['data'][0]['seq'] < newest['seq']
+    assert older['data'][0]['message'] == 'How do we test this?'
@@ -0,0 +1,124 @@
+import pytest
+
+import agents.base_agent as base_agent
+from agents.base_agent import DeferredNarrative
+from agents.developer import Developer
+from agents.memory import FACT_BOOST, AgentMemory
+
+
+def _exchange(prompt, reply):
+    return [{"role": "user", "content": prompt}, {"role": "assistant", "content": reply}]
+
+
+def test_sync_indexes_completed_exchanges_once():
+    memory = AgentMemory()
+    history = _exchange("Plan the sprint", "We take five stories")
+    memory.sync(history)
+    memory.sync(history)
+    assert [item["turn"] for item in memory.items] == [0]
+    assert memory.indexed == 2
+
+    history += _exchange("Review the demo", "The demo went well")
+    memory.sync(history)
+    assert [item["turn"] for item in memory.items] == [0, 2]
+
+
+def test_sync_waits_for_the_reply_of_a_trailing_prompt():
+    memory = AgentMemory()
+    history = _exchange("Plan the sprint", "We take five stories") + [{"role": "user", "content": "Any risks?"}]
+    memory.sync(history)
+    assert memory.indexed == 2 and len(memory) == 1
+
+    history.append({"role": "assistant", "content": "The database migration"})
+    memory.sync(history)
+    assert memory.indexed == 4
+    assert "database migration" in memory.items[-1]["text"]
+
+
+def test_sync_skips_unpaired_messages():
+    memory = AgentMemory()
+    history = ([{"role": "assistant", "content": "Hello team"}, {"role": "user", "content": "Orphan question"},
+                {"role": "user", "content": "Plan the sprint"}, {"role": "assistant", "content": "Five stories"}])
+    memory.sync(history)
+    assert memory.indexed == 4
+    assert [item["turn"] for item in memory.items] == [2]
+
+
+def test_sync_passes_over_deferred_narratives():
+    memory = AgentMemory()
+    history = (_exchange("Run the standup", DeferredNarrative("n1", "Developer"))
+               + _exchange("Plan the sprint", "Five stories"))
+    memory.sync(history)
+    assert memory.indexed == 4  # The deferred reply is indexed by render_deferred once generated
+    assert [item["turn"] for item in memory.items] == [2]
+
+
+def test_before_turn_excludes_replayed_exchanges_but_not_facts():
+    memory = AgentMemory()
+    memory.sync(_exchange("Database migration plan", "Migrate in sprint two")
+                + _exchange("Database migration risk", "Locking during migration"))
+    memory.add_fact("tech_debt", "Database migration scripts lack tests")
+    turns = lambda results: sorted(item["turn"] for item in results if item["kind"] == "turn")
+    assert turns(memory.search("database migration")) == [0, 2]
+    results = memory.search("database migration", before_turn=2)
+    assert turns(results) == [0]
+    assert any(item["kind"] == "tech_debt" for item in results)
+    assert memory.search("database migration", before_turn=0)[0]["kind"] == "tech_debt"
+
+
+def test_facts_rank_above_equally_relevant_turns():
+    memory = AgentMemory()
+    memory.add_turn("velocity", "thirty points", turn=0)
+    memory.add_fact("velocity", "velocity thirty points")
+    memory.add_fact("impediment", "unrelated build server outage")
+    fact, turn = memory.search("velocity")
+    assert fact["kind"] == "velocity" and turn["kind"] == "turn"
+    assert fact["score"] == pytest.approx(turn["score"] * FACT_BOOST, rel=1e-2)
+
+
+def test_terms_found_in_nearly_every_item_are_not_scored():
+    memory = AgentMemory()
+    for index in range(20):
+        memory.add_fact("note", f"sprint note number{index}")
+    assert memory.search("sprint") == []
+    assert [item["text"] for item in memory.search("sprint number7")] == ["sprint note number7"]
+
+
+def test_recall_keeps_to_the_character_budget():
+    memory = AgentMemory()
+    for index in range(5):
+        memory.add_fact("impediment", f"database outage {index} " + "detail " * 30)
+        memory.add_fact("velocity", f"sprint {index} velocity")
+    notes = memory.recall("database outage", max_chars=250)
+    texts = [line.split(") ", 1)[1] for line in notes.splitlines()]
+    assert sum(map(len, texts)) <= 250 and len(texts) == 2
+    assert memory.recall("nothing matches this") == ""
+
+
+@pytest.fixture
+def developer():
+    return Developer(model_provider="anthropic")
+
+
+@pytest.mark.parametrize("recent_turns", [0, 1, 2])
+def test_prepared_history_replays_recent_exchanges_and_the_pending_prompt(developer, monkeypatch, recent_turns):
+    monkeypatch.setattr(base_agent, "MEMORY_RECENT_TURNS", recent_turns)
+    for index in range(4):
+        developer.conversation_history += _exchange(f"Question {index} about caching", f"Answer {index}")
+    developer.conversation_history.append({"role": "user", "content": "Question 4 about caching"})
+
+    messages = developer._prepare_conversation_history("Question 4 about caching")
+    assert messages[0]["role"] == "system"
+    replayed = messages[1:]
+    assert replayed == developer.conversation_history[8 - 2 * recent_turns:]
+    # Earlier exchanges come back through the notes, never twice
+    notes = messages[0]["content"]
+    for index in range(4):
+        assert (f"Answer {index}" in notes) == (index < 4 - recent_turns)
+
+
+def test_prepared_history_appends_a_query_not_in_the_history(developer, monkeypatch):
+    monkeypatch.setattr(base_agent, "MEMORY_RECENT_TURNS", 1)
+    developer.conversation_history += _exchange("First", "One") + _exchange("Second", "Two")
+    messages = developer._prepare_conversation_history("Third")
+    assert messages[1:] == _exchange("Second", "Two") + [{"role": "user", "content": "Third"}]
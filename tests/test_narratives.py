@@ -0,0 +1,48 @@
+from conftest import wait_for_job
+from safe_simulation import SAFeSimulation
+
+
+def test_rendered_narrative_invalidates_cached_logs(client):
+    client.post('/api/initialize', json={'configuration': 'essential', 'fast_mechanics': True})
+    job = wait_for_job(client, client.post('/api/start_pi').get_json()['job']['id'])
+    assert job['status'] == 'succeeded'
+    communications = client.get('/api/communications')
+    state = client.get('/api/state')
+    placeholder = next(comm for comm in communications.get_json()['data'] if 'narrative' in comm)
+    page_url = f"/api/communications?after={placeholder['seq'] - 1}&limit=1"
+    page = client.get(page_url)
+
+    response = client.post(f"/api/narratives/{placeholder['narrative']}")
+    assert response.status_code == 200
+    message = response.get_json()['data'][0]['message']
+    assert message != placeholder['message']
+
+    revalidated = client.get('/api/communications', headers={'If-None-Match': communications.headers['ETag']})
+    assert revalidated.status_code == 200
+    entry = next(comm for comm in revalidated.get_json()['data'] if comm['seq'] == placeholder['seq'])
+    assert entry['message'] == message and 'narrative' not in entry
+    assert client.get('/api/state', headers={'If-None-Match': state.headers['ETag']}).status_code == 200
+    revalidated = client.get(page_url, headers={'If-None-Match': page.headers['ETag']})
+    assert revalidated.status_code == 200
+    assert revalidated.get_json()['data'][0]['message'] == message
+
+
+def test_log_delta_carries_rendered_narratives():
+    simulation = SAFeSimulation('essential', fast_mechanics=True)
+    simulation.start_pi()
+    seen = simulation.log_sequence
+    placeholder = next(comm for comm in simulation.communication_log if 'narrative' in comm)
+    key = placeholder['narrative']
+
+    updated = simulation.render_narrative(key)
+    assert updated and simulation.log_sequence == seen + 1
+    delta = simulation.get_log_delta(seen)
+    assert delta['communications'] == [] and delta['events'] == []
+    assert [comm['seq'] for comm in delta['revised']] == [comm['seq'] for comm in updated]
+    assert delta['revised'][0]['message'] == placeholder['message']  # Updated in place
+
+    # A caller that is already past the change, or has not seen the entry yet, gets nothing twice
+    assert simulation.get_log_delta(simulation.log_sequence)['revised'] == []
+    full = simulation.get_log_delta(0)
+    assert full['revised'] == [] and placeholder in full['communications']
+    assert simulation.render_narrative(key) == []
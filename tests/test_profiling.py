@@ -0,0 +1,110 @@
+import cProfile
+import pstats
+import tracemalloc
+
+import pytest
+
+from utils import profiling
+from utils.profiling import folded_allocations, folded_stacks
+
+
+def shared(units):
+    total = 0
+    for _ in range(units):
+        total += sum(i * i for i in range(5000))
+    return total
+
+
+def first():
+    return shared(3)
+
+
+def second():
+    return shared(1)
+
+
+def recursive(depth):
+    return shared(1) if depth == 0 else recursive(depth - 1)
+
+
+def root():
+    first()
+    second()
+    recursive(3)
+
+
+@pytest.fixture(scope="module")
+def stats():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    root()
+    profiler.disable()
+    return pstats.Stats(profiler)
+
+
+def _functions(stack):
+    return [frame.split(" (")[0] for frame in stack.split(";")]
+
+
+def _key(stats, function):
+    return next(func for func in stats.stats if func[2] == function)
+
+
+def test_folded_weight_adds_up_to_the_profiled_time(stats):
+    folded = folded_stacks(stats)
+    total = sum(weight for _, weight in folded)
+    assert total == pytest.approx(stats.total_tt * 1e6, rel=0.01, abs=len(folded))
+
+
+def test_stacks_start_at_the_root_and_follow_calls(stats):
+    stacks = {tuple(_functions(stack)): weight for stack, weight in folded_stacks(stats)}
+    assert ("root", "first", "shared") in stacks
+    assert ("root", "second", "shared") in stacks
+    assert ("root", "recursive", "shared") in stacks  # Recursion is not followed into a cycle
+    assert all(path.count("recursive") <= 1 for path in stacks)
+    assert all(path[0] == "root" for path in stacks if "shared" in path)
+
+
+def test_time_of_a_shared_function_is_split_between_its_callers(stats):
+    stacks = {tuple(_functions(stack)): weight for stack, weight in folded_stacks(stats)}
+    entries = stats.stats
+    shared_key = _key(stats, "shared")
+    own, cumulative, callers = entries[shared_key][2], entries[shared_key][3], entries[shared_key][4]
+    for caller in ("first", "second"):
+        expected = own * callers[_key(stats, caller)][3] / cumulative * 1e6
+        assert stacks[("root", caller, "shared")] == pytest.approx(expected, abs=1)
+    assert stacks[("root", "first", "shared")] > stacks[("root", "second", "shared")]
+
+
+def test_small_paths_are_dropped(stats):
+    assert all(weight >= 1000 for _, weight in folded_stacks(stats, min_us=1000))
+
+
+def _allocate():
+    return [bytearray(1024) for _ in range(100)]
+
+
+def test_folded_allocations_keep_memory_held_at_the_end():
+    tracemalloc.start(10)
+    try:
+        before = tracemalloc.take_snapshot()
+        held = _allocate()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    folded = folded_allocations(after.compare_to(before, "traceback"))
+    assert held
+    sites = [(stack, size) for stack, size in folded if stack.split(";")[-1].startswith("tests/test_profiling.py:")]
+    assert sum(size for _, size in sites) >= 100 * 1024
+    assert all(size > 0 for _, size in folded)
+
+
+def test_profile_writes_every_file(tmp_path):
+    with profiling.profile("unit", directory=str(tmp_path)) as profile:
+        root()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "unit.cpu.folded", "unit.mem.folded", "unit.prof", "unit.txt"]
+    assert [str(tmp_path / name) for name in ("unit.prof", "unit.cpu.folded", "unit.mem.folded", "unit.txt")] \
+        == profile.paths
+    lines = (tmp_path / "unit.cpu.folded").read_text().splitlines()
+    assert any(_functions(line.rsplit(" ", 1)[0])[-3:] == ["root", "first", "shared"] for line in lines)
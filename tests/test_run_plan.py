@@ -0,0 +1,57 @@
+import pytest
+
+from conftest import wait_for_job
+from safe_simulation import expand_plan
+
+
+def test_expand_plan_composite_sprint():
+    steps = expand_plan([{"step": "start_pi"}, {"step": "sprint", "repeat": 2, "standups": 1}, {"step": "end_pi"}])
+    assert steps == ["start_pi",
+                     "start_sprint", "daily_standup", "end_sprint",
+                     "start_sprint", "daily_standup", "end_sprint",
+                     "end_pi"]
+
+
+def test_expand_plan_allows_exactly_max_steps():
+    assert len(expand_plan([{"step": "daily_standup", "repeat": 5}], max_steps=5)) == 5
+
+
+@pytest.mark.parametrize("plan", [
+    [{"step": "sprint", "standups": 10 ** 8, "repeat": 10 ** 6}],  # Rejected before anything is allocated
+    [{"step": "daily_standup", "repeat": 10 ** 12}],
+    [{"step": "daily_standup", "repeat": 400}, {"step": "sprint", "repeat": 10, "standups": 10}],
+])
+def test_expand_plan_rejects_plans_over_the_limit(plan):
+    with pytest.raises(ValueError, match="more than 500 steps"):
+        expand_plan(plan, max_steps=500)
+
+
+@pytest.mark.parametrize("plan", [
+    None,
+    [],
+    [{"repeat": 2}],
+    [{"step": "unknown"}],
+    [{"step": "start_pi", "repeat": 0}],
+    [{"step": "start_pi", "repeat": True}],
+    [{"step": "start_pi", "repeat": "2"}],
+    [{"step": "sprint", "standups": -1}],
+    [{"step": "sprint", "standups": False}],
+])
+def test_expand_plan_rejects_malformed_plans(plan):
+    with pytest.raises(ValueError):
+        expand_plan(plan, max_steps=500)
+
+
+def test_run_endpoint_rejects_oversized_plan(client, simulation_id):
+    response = client.post('/api/run', json={"plan": [{"step": "sprint", "standups": 10 ** 8, "repeat": 10 ** 6}]})
+    assert response.status_code == 400
+    assert "more than" in response.get_json()['message']
+
+
+def test_run_endpoint_runs_plan(client, simulation_id):
+    response = client.post('/api/run', json={"plan": [{"step": "start_pi"}, {"step": "sprint", "standups": 2}]})
+    assert response.status_code == 202
+    job = wait_for_job(client, response.get_json()['job']['id'])
+    assert job['status'] == 'succeeded'
+    assert [result['step'] for result in job['result']['results']] == [
+        "start_pi", "start_sprint", "daily_standup", "daily_standup", "end_sprint"]
@@ -0,0 +1,65 @@
+from conftest import wait_for_job
+from utils.semantic_cache import SemanticCache
+
+
+def test_near_duplicate_question_hits():
+    cache = SemanticCache('test', max_entries=8, threshold=0.5)
+    cache.put('What is PI planning?', 'answer')
+    hit = cache.get('Explain PI planning')
+    assert hit is not None and hit.answer == 'answer'
+    assert 0.5 <= hit.similarity <= 1.0
+
+
+def test_unrelated_question_misses():
+    cache = SemanticCache('test', max_entries=8, threshold=0.5)
+    cache.put('What is PI planning?', 'answer')
+    assert cache.get('How do we reduce technical debt?') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_threshold_decides_between_hit_and_miss():
+    strict = SemanticCache('strict', max_entries=8, threshold=0.99)
+    loose = SemanticCache('loose', max_entries=8, threshold=0.3)
+    for cache in (strict, loose):
+        cache.put('What is PI planning in SAFe?', 'answer')
+    assert strict.get('What is PI planning?') is None
+    assert loose.get('What is PI planning?') is not None
+
+
+def test_scopes_are_isolated():
+    cache = SemanticCache('test', max_entries=8, threshold=0.5)
+    cache.put('What is our velocity?', 'first simulation', scope=('a', 1))
+    assert cache.get('What is our velocity?', scope=('b', 1)) is None
+    assert cache.get('What is our velocity?', scope=('a', 2)) is None
+    assert cache.get('What is our velocity?') is None
+    assert cache.get('What is our velocity?', scope=('a', 1)).answer == 'first simulation'
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticCache('test', max_entries=2, threshold=0.9)
+    cache.put('What is PI planning?', 'planning', scope='a')
+    cache.put('What is a release train?', 'train', scope='b')
+    cache.get('What is PI planning?', scope='a')
+    cache.put('What is technical debt?', 'debt', scope='c')
+    assert cache.get('What is a release train?', scope='b') is None
+    assert cache.get('What is PI planning?', scope='a').answer == 'planning'
+    assert set(cache.scope_slots) == {'a', 'c'}
+
+
+def test_ask_agent_answers_are_not_shared_between_simulations(app_module, client, simulation_id):
+    question = {'agent_type': 'scrum_master', 'question': 'Which impediments are open right now?'}
+    first = client.post('/api/ask_agent', json=question).get_json()
+    assert first['cached'] is None
+    assert client.post('/api/ask_agent', json=question).get_json()['cached'] is not None
+
+    other = app_module.app.test_client()
+    other.post('/api/initialize', json={'configuration': 'essential'})
+    assert other.post('/api/ask_agent', json=question).get_json()['cached'] is None
+
+
+def test_ask_agent_answers_expire_when_the_simulation_moves_on(client, simulation_id):
+    question = {'agent_type': 'scrum_master', 'question': 'What is our current velocity?'}
+    client.post('/api/ask_agent', json=question)
+    job = wait_for_job(client, client.post('/api/start_pi').get_json()['job']['id'])
+    assert job['status'] == 'succeeded'
+    assert client.post('/api/ask_agent', json=question).get_json()['cached'] is None
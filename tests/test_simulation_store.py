@@ -0,0 +1,182 @@
+import os
+import uuid
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+from utils.simulation_store import (MemorySimulationStore, FileSimulationStore, RedisSimulationStore,
+                                    SimulationNotFound, create_simulation_store)
+
+
+class Counter:
+    """A minimal stand-in for a simulation: stores only need a simulation_id and pickling."""
+
+    def __init__(self):
+        self.simulation_id = uuid.uuid4().hex
+        self.count = 0
+
+
+def _redis_store():
+    pytest.importorskip('redis')
+    url = os.getenv('SAFE_TEST_REDIS_URL')
+    if not url:
+        pytest.skip('SAFE_TEST_REDIS_URL is not set')
+    return RedisSimulationStore(url, ttl=60)
+
+
+@pytest.fixture(params=['memory', 'file', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemorySimulationStore()
+    if request.param == 'file':
+        return FileSimulationStore(str(tmp_path / 'simulations'))
+    return _redis_store()
+
+
+def test_transaction_yields_none_for_unknown_simulation(store):
+    with store.transaction(uuid.uuid4().hex) as simulation:
+        assert simulation is None
+
+
+def test_transaction_saves_changes(store):
+    counter = Counter()
+    store.put(counter)
+    with store.transaction(counter.simulation_id) as simulation:
+        simulation.count += 1
+    assert store.get(counter.simulation_id).count == 1
+
+
+def test_concurrent_transactions_do_not_lose_updates(store):
+    counter = Counter()
+    store.put(counter)
+
+    def increment():
+        for _ in range(20):
+            with store.transaction(counter.simulation_id) as simulation:
+                simulation.count += 1
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.get(counter.simulation_id).count == 80
+
+
+def test_file_store_changes_are_visible_to_other_processes(tmp_path):
+    directory = str(tmp_path / 'simulations')
+    counter = Counter()
+    FileSimulationStore(directory).put(counter)
+    writer = FileSimulationStore(directory)
+    with writer.transaction(counter.simulation_id) as simulation:
+        simulation.count = 5
+    # A second store instance stands in for another worker process
+    assert FileSimulationStore(directory).get(counter.simulation_id).count == 5
+
+
+def test_file_store_rejects_unsafe_ids(tmp_path):
+    store = FileSimulationStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.get('../escape')
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySimulationStore(max_simulations=2)
+    first, second, third = Counter(), Counter(), Counter()
+    store.put(first)
+    store.put(second)
+    store.get(first.simulation_id)
+    store.put(third)
+    assert store.get(second.simulation_id) is None
+    assert store.get(first.simulation_id) is first
+
+
+def test_create_simulation_store_by_url(tmp_path):
+    assert isinstance(create_simulation_store('memory://'), MemorySimulationStore)
+    assert isinstance(create_simulation_store(f'file://{tmp_path}'), FileSimulationStore)
+    with pytest.raises(ValueError):
+        create_simulation_store('ftp://example.com/simulations')
+
+
+@pytest.fixture
+def file_store(app_module, tmp_path, monkeypatch):
+    """Run the app on a file store, as with several worker processes."""
+    directory = str(tmp_path / 'simulations')
+    monkeypatch.setattr(app_module, 'simulation_store', FileSimulationStore(directory))
+    return directory
+
+
+def _saved(directory, simulation_id):
+    """The simulation as another worker would load it."""
+    return FileSimulationStore(directory).get(simulation_id)
+
+
+def test_ask_agent_is_saved_to_shared_store(file_store, client, simulation_id):
+    response = client.post('/api/ask_agent', json={'agent_type': 'developer', 'question': 'How do we test this?'})
+    assert response.status_code == 200
+
+    saved = _saved(file_store, simulation_id)
+    assert [comm['sender'] for comm in saved.communication_log[-2:]] == ['User', 'developer']
+    assert saved.events_log[-1]['type'] == 'Question to developer'
+    assert saved.communication_log[-2]['message'] == 'How do we test this?'
+
+
+def test_demonstrations_are_saved_to_shared_store(file_store, client, simulation_id):
+    response = client.post('/api/demonstrate_cot', json={'agent_type': 'scrum_master',
+                                                         'question': 'How do we split this story?'})
+    assert response.status_code == 200
+    response = client.post('/api/demonstrate_safe_config', json={'config_type': 'essential'})
+    assert response.status_code == 200
+
+    saved = _saved(file_store, simulation_id)
+    assert saved.communication_log[-1]['sender'] == saved.scrum_master.role
+    assert [event['type'] for event in saved.events_log[-2:]] == [
+        f'CoT Question to {saved.scrum_master.role}', 'SAFe Essential Configuration Demonstration']
+
+
+def test_simulation_evicted_during_request_returns_400(app_module, client, simulation_id, monkeypatch):
+    store = app_module.simulation_store
+    original = store.transaction
+
+    @contextmanager
+    def evicted(_):
+        with original(uuid.uuid4().hex) as simulation:
+            yield simulation
+
+    monkeypatch.setattr(store, 'transaction', evicted)
+    response = client.post('/api/change_request', json={'description': 'Add a report'})
+    assert response.status_code == 400
+    assert response.get_json() == {'status': 'error', 'message': 'Simulation not initialized'}
+    response = client.post('/api/ask_agent', json={'agent_type': 'developer', 'question': 'Anything?'})
+    assert response.status_code == 400
+
+    with pytest.raises(SimulationNotFound):
+        app_module._run_step(simulation_id, 'start_pi')
+
+
+def test_failed_file_transaction_does_not_leave_changes_in_the_cache(tmp_path):
+    directory = str(tmp_path / 'simulations')
+    worker, other_worker = FileSimulationStore(directory), FileSimulationStore(directory)
+    counter = Counter()
+    worker.put(counter)
+    with pytest.raises(RuntimeError):
+        with worker.transaction(counter.simulation_id) as simulation:
+            simulation.count = 99
+            raise RuntimeError('step failed')
+    assert worker.get(counter.simulation_id).count == 0
+    assert other_worker.get(counter.simulation_id).count == 0
+
+
+def test_file_store_caches_a_bounded_number_of_simulations(tmp_path):
+    store = FileSimulationStore(str(tmp_path / 'simulations'), max_cached=3)
+    counters = [Counter() for _ in range(10)]
+    for counter in counters:
+        store.put(counter)
+        with store.transaction(counter.simulation_id) as simulation:
+            simulation.count += 1
+    assert list(store._cache) == [counter.simulation_id for counter in counters[-3:]]
+    with store.transaction(Counter().simulation_id) as simulation:
+        assert simulation is None
+    assert set(store._thread_locks) <= set(store._cache)
+    assert store.get(counters[0].simulation_id).count == 1  # Evicted copies are loaded from disk again
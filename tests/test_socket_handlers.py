@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.fixture
+def socket(app_module, client, simulation_id):
+    """A Socket.IO client sharing the session of the HTTP client."""
+    socket = app_module.socketio.test_client(app_module.app, flask_test_client=client)
+    socket.get_received()
+    yield socket
+    socket.disconnect()
+
+
+def _log_deltas(socket):
+    return [message['args'][0] for message in socket.get_received() if message['name'] == 'log_delta']
+
+
+def test_resume_sends_entries_after_cursor(client, socket, simulation_id):
+    last_seq = client.get('/api/state').get_json()['data']['log_sequence']
+    socket.emit('resume', {'simulation_id': simulation_id, 'since': last_seq - 1})
+    [delta] = _log_deltas(socket)
+    assert delta['since'] == last_seq - 1 and delta['last_seq'] == last_seq
+
+
+@pytest.mark.parametrize('since', ['5', None, -3, True, 2.5])
+def test_resume_with_invalid_cursor_sends_full_log(socket, simulation_id, since):
+    socket.emit('resume', {'simulation_id': simulation_id, 'since': since})
+    [delta] = _log_deltas(socket)
+    assert delta['since'] == 0
+
+
+@pytest.mark.parametrize('payload', [['x'], 'x', None, 7])
+def test_resume_with_malformed_payload_sends_full_log(socket, payload):
+    socket.emit('resume', payload)
+    [delta] = _log_deltas(socket)
+    assert delta['since'] == 0
+
+
+def test_state_ack_records_the_clients_version(app_module, socket, simulation_id):
+    socket.emit('join_simulation', {'simulation_id': simulation_id})
+    broadcaster = app_module.broadcasters[simulation_id]
+    socket.emit('state_ack', {'version': broadcaster.version})
+    assert list(broadcaster.acked.values()) == [broadcaster.version]
+    socket.emit('state_ack', ['not', 'a', 'dict'])
+    assert list(broadcaster.acked.values()) == [broadcaster.version]
+
+
+def test_state_ack_after_broadcaster_eviction_is_ignored(app_module, socket, simulation_id):
+    socket.emit('join_simulation', {'simulation_id': simulation_id})
+    with app_module.broadcast_lock:
+        app_module.broadcasters.pop(simulation_id)
+    socket.emit('state_ack', {'version': 1})
+    assert simulation_id not in app_module.broadcasters
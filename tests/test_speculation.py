@@ -0,0 +1,91 @@
+import pytest
+
+from conftest import wait_for_job
+from safe_simulation import SAFeSimulation
+from utils.metrics import SIMULATION_PHASES, SIMULATION_PHASE_DURATION
+from utils.speculation import Speculator
+
+
+@pytest.fixture
+def speculator():
+    speculator = Speculator(enabled=True, max_workers=1)
+    yield speculator
+    speculator.shutdown()
+
+
+@pytest.fixture
+def sprint(speculator):
+    """A simulation in its first sprint, with the first standup prefetched."""
+    simulation = SAFeSimulation('essential', fast_mechanics=True)
+    simulation.run_step('start_pi')
+    simulation.run_step('start_sprint')
+    assert speculator.prefetch(simulation, 'start_sprint') == 'daily_standup'
+    return simulation
+
+
+def test_take_commits_speculative_step_of_unchanged_simulation(speculator, sprint):
+    seen = sprint.log_sequence
+    result = speculator.take(sprint, 'daily_standup')
+    assert result is not None and result['day'] == 1
+    assert sprint.current_day == 1
+    assert sprint.log_sequence > seen
+    assert speculator.take(sprint, 'daily_standup') is None  # Taken only once
+
+
+def test_take_discards_speculation_of_another_step(speculator, sprint):
+    assert speculator.take(sprint, 'end_sprint') is None
+    assert speculator.take(sprint, 'daily_standup') is None
+    assert sprint.current_day == 0
+
+
+def test_take_discards_speculation_after_unlogged_change(speculator, sprint):
+    sprint.metrics['note'] = 'kept'
+    sprint.revision += 1  # As every write outside the steps does
+    assert speculator.take(sprint, 'daily_standup') is None
+    assert sprint.metrics['note'] == 'kept'
+    assert sprint.current_day == 0
+
+
+def test_take_discards_speculation_after_rendered_narrative(speculator, sprint):
+    key = sprint.pending_narratives()[0]
+    sprint.render_narrative(key)
+    assert speculator.take(sprint, 'daily_standup') is None
+    assert key not in sprint.pending_narratives()
+
+
+def _standups_recorded():
+    return (SIMULATION_PHASES.labels('daily_standup', 'success').value,
+            sum(SIMULATION_PHASE_DURATION.labels('daily_standup').counts))
+
+
+def test_phase_metrics_count_only_committed_speculations(speculator, sprint):
+    before = _standups_recorded()
+    speculator._pending[sprint.simulation_id].future.result()  # The speculative standup has run
+    assert _standups_recorded() == before
+    speculator.take(sprint, 'daily_standup')
+    assert _standups_recorded() == (before[0] + 1, before[1] + 1)
+
+
+def test_phase_metrics_skip_discarded_speculations(speculator, sprint):
+    before = _standups_recorded()
+    speculator._pending[sprint.simulation_id].future.result()
+    sprint.revision += 1
+    assert speculator.take(sprint, 'daily_standup') is None
+    sprint.run_step('daily_standup')
+    assert _standups_recorded() == (before[0] + 1, before[1] + 1)
+
+
+def test_writes_between_requested_steps_survive_speculation(app_module, client, monkeypatch, speculator):
+    monkeypatch.setattr(app_module, 'speculator', speculator)
+    client.post('/api/initialize', json={'configuration': 'essential', 'fast_mechanics': True})
+    assert wait_for_job(client, client.post('/api/start_pi').get_json()['job']['id'])['status'] == 'succeeded'
+    assert client.post('/api/start_sprint').status_code == 200
+    simulation_id = client.get('/api/state').get_json()['data']['simulation_id']
+
+    with app_module.simulation_transaction(simulation_id) as simulation:
+        simulation.scrum_master.add_to_context('Remember the release date')
+    response = client.post('/api/daily_standup')
+    assert response.status_code == 200
+    simulation = app_module.simulation_store.get(simulation_id)
+    assert 'Remember the release date' in simulation.scrum_master.context
+    assert simulation.current_day == 1
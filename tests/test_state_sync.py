@@ -0,0 +1,90 @@
+from utils.state_sync import StateBroadcaster, diff_state
+
+
+def _apply(state, patch):
+    """Apply diff_state operations the way the client does."""
+    for operation in patch:
+        *parents, last = operation['path'].split('/')[1:]
+        target = state
+        for key in parents:
+            target = target[key.replace('~1', '/').replace('~0', '~')]
+        last = last.replace('~1', '/').replace('~0', '~')
+        if operation['op'] == 'remove':
+            del target[last]
+        else:
+            target[last] = operation['value']
+    return state
+
+
+def test_diff_state_of_equal_states_is_empty():
+    assert diff_state({'a': 1, 'b': {'c': [1, 2]}}, {'a': 1, 'b': {'c': [1, 2]}}) == []
+
+
+def test_diff_state_adds_removes_and_replaces_keys():
+    old = {'day': 1, 'metrics': {'velocity': 10, 'debt': 2}, 'gone': True}
+    new = {'day': 2, 'metrics': {'velocity': 10, 'wip': 3}}
+    patch = diff_state(old, new)
+    assert sorted((operation['op'], operation['path']) for operation in patch) == [
+        ('add', '/metrics/wip'), ('remove', '/gone'), ('remove', '/metrics/debt'), ('replace', '/day')]
+    assert _apply(old, patch) == new
+
+
+def test_diff_state_replaces_lists_and_changed_types_whole():
+    assert diff_state({'items': [1, 2]}, {'items': [1, 3]}) == [{'op': 'replace', 'path': '/items', 'value': [1, 3]}]
+    assert diff_state({'flag': 1}, {'flag': True}) == [{'op': 'replace', 'path': '/flag', 'value': True}]
+
+
+def test_diff_state_escapes_pointer_keys():
+    patch = diff_state({}, {'a/b~c': 1})
+    assert patch == [{'op': 'add', 'path': '/a~1b~0c', 'value': 1}]
+    assert _apply({}, patch) == {'a/b~c': 1}
+
+
+def test_publish_bumps_version_only_on_change():
+    broadcaster = StateBroadcaster()
+    assert broadcaster.publish({'day': 1}) == 1
+    assert broadcaster.publish({'day': 1}) == 1
+    assert broadcaster.publish({'day': 2}) == 2
+    assert broadcaster.full_state() == {'version': 2, 'state': {'day': 2}}
+
+
+def test_publish_normalizes_keys_like_json():
+    broadcaster = StateBroadcaster()
+    broadcaster.publish({'metrics': {1: 'a'}})
+    assert broadcaster.full_state()['state'] == {'metrics': {'1': 'a'}}
+
+
+def test_payloads_send_patches_from_each_clients_version():
+    broadcaster = StateBroadcaster()
+    broadcaster.register('new')
+    broadcaster.register('behind')
+    broadcaster.register('current')
+    broadcaster.publish({'day': 1, 'sprint': 1})
+    broadcaster.ack('behind', 1)
+    broadcaster.publish({'day': 2, 'sprint': 1})
+    broadcaster.ack('current', 2)
+
+    payloads = dict(broadcaster.payloads())
+    assert set(payloads) == {'new', 'behind'}
+    assert payloads['new'] == {'version': 2, 'state': {'day': 2, 'sprint': 1}}
+    assert payloads['behind'] == {'version': 2, 'base_version': 1,
+                                  'patch': [{'op': 'replace', 'path': '/day', 'value': 2}]}
+
+
+def test_clients_behind_the_history_get_full_state():
+    broadcaster = StateBroadcaster(history=2)
+    broadcaster.register('slow')
+    broadcaster.publish({'day': 1})
+    broadcaster.ack('slow', 1)
+    broadcaster.publish({'day': 2})
+    broadcaster.publish({'day': 3})
+    assert broadcaster.payloads() == [('slow', {'version': 3, 'state': {'day': 3}})]
+
+
+def test_forgotten_clients_get_nothing():
+    broadcaster = StateBroadcaster()
+    broadcaster.register('gone')
+    broadcaster.publish({'day': 1})
+    broadcaster.forget('gone')
+    broadcaster.ack('gone', 1)  # A late ack does not register the client again
+    assert broadcaster.payloads() == []
@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from agents.developer import Developer
+from agents.structured_output import CHANGE_DECISION, IMPEDIMENT_RESOLUTION, PROGRESS_REPORT
+from utils.metrics import STRUCTURED_OUTPUTS
+
+
+def test_parse_valid_reply():
+    reply = json.dumps({'narrative': ' All good. ', 'impediments': ['Flaky CI ', '', None]})
+    assert PROGRESS_REPORT.parse(reply) == {'narrative': 'All good.', 'impediments': ['Flaky CI']}
+
+
+def test_parse_tolerates_fences_and_surrounding_text():
+    reply = '```json\nHere it is: {"narrative": "Escalating.", "decision": " Escalate "}\n```'
+    assert IMPEDIMENT_RESOLUTION.parse(reply) == {'narrative': 'Escalating.', 'decision': 'escalate'}
+
+
+def test_parse_coerces_single_string_and_null_lists():
+    assert PROGRESS_REPORT.parse('{"narrative": "x", "impediments": "Blocked"}')['impediments'] == ['Blocked']
+    assert PROGRESS_REPORT.parse('{"narrative": "x", "impediments": null}')['impediments'] == []
+
+
+@pytest.mark.parametrize('reply', [
+    None,
+    'No JSON here',
+    '{"narrative": "x", "decision": }',
+    '["narrative"]',
+    '{"narrative": "", "decision": "accept"}',
+    '{"narrative": "x"}',
+    '{"narrative": "x", "decision": "maybe"}',
+])
+def test_parse_rejects_invalid_replies(reply):
+    with pytest.raises(ValueError):
+        CHANGE_DECISION.parse(reply)
+
+
+def test_fallback_keeps_text_with_default_fields():
+    assert CHANGE_DECISION.fallback('Let us wait.') == {'narrative': 'Let us wait.', 'decision': 'defer'}
+    assert PROGRESS_REPORT.fallback(None) == {'narrative': '', 'impediments': []}
+
+
+@pytest.fixture
+def developer(monkeypatch):
+    """A developer whose model replies are scripted; records the messages of each call."""
+    agent = Developer(model_provider='anthropic')
+    replies, calls = [], []
+
+    def call_model(messages, json_mode=False):
+        calls.append((messages, json_mode))
+        return replies.pop(0)
+
+    monkeypatch.setattr(agent, 'call_model', call_model)
+    return agent, replies, calls
+
+
+def _count(agent, outcome):
+    return STRUCTURED_OUTPUTS.labels(agent.role, CHANGE_DECISION.name, outcome).value
+
+
+MESSAGES = [{'role': 'system', 'content': 'You are a developer.'}, {'role': 'user', 'content': 'Take this change?'}]
+
+
+def test_valid_reply_needs_one_call(developer):
+    agent, replies, calls = developer
+    before = _count(agent, 'valid')
+    replies.append('{"narrative": "Yes.", "decision": "accept"}')
+    assert agent._call_structured(MESSAGES, CHANGE_DECISION) == {'narrative': 'Yes.', 'decision': 'accept'}
+    assert len(calls) == 1 and calls[0][1] is True
+    assert CHANGE_DECISION.instructions() in calls[0][0][0]['content']
+    assert _count(agent, 'valid') == before + 1
+
+
+def test_invalid_reply_is_repaired(developer):
+    agent, replies, calls = developer
+    before = _count(agent, 'repaired')
+    replies.extend(['We should accept it.', '{"narrative": "We should accept it.", "decision": "accept"}'])
+    assert agent._call_structured(MESSAGES, CHANGE_DECISION)['decision'] == 'accept'
+    repair = calls[1][0]
+    assert repair[0]['role'] == 'system' and 'no JSON object' in repair[0]['content']
+    assert repair[1] == {'role': 'user', 'content': 'We should accept it.'}  # Only the reply, no conversation
+    assert _count(agent, 'repaired') == before + 1
+
+
+def test_unrepairable_reply_falls_back_to_defaults(developer):
+    agent, replies, calls = developer
+    before = _count(agent, 'fallback')
+    replies.extend(['We should accept it.', 'Still not JSON.'])
+    assert agent._call_structured(MESSAGES, CHANGE_DECISION) == {'narrative': 'We should accept it.',
+                                                                  'decision': 'defer'}
+    assert len(calls) == 2
+    assert _count(agent, 'fallback') == before + 1
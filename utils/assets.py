@@ -0,0 +1,226 @@
+"""Build and serve fingerprinted, minified and precompressed static assets.
+
+Build the bundles (after changing any file in static/js or static/css):
+
+    python utils/assets.py
+
+This writes static/dist/<bundle>.<hash>.<ext> plus .gz/.br siblings and a
+manifest. Templates reference bundles through asset_urls(); without a build
+they fall back to the individual source files.
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import tempfile
+
+from flask import abort, request, send_from_directory, url_for
+from werkzeug.utils import safe_join
+
+try:
+    import brotli  # Optional; only .gz siblings are written without it
+except ImportError:
+    brotli = None
+
+try:
+    import rjsmin  # Optional JavaScript minifier; bundles are concatenated only without it
+except ImportError:
+    rjsmin = None
+
+try:
+    import rcssmin  # Optional CSS minifier; a conservative built-in one is used without it
+except ImportError:
+    rcssmin = None
+
+# Bundle name -> source files (relative to the static folder), in load order.
+# The stylesheets stay in two bundles because index.html loads a CDN copy of
+# Bootstrap between them; merging them would change which rules win.
+ASSET_BUNDLES = {
+    'js/app.js': ['js/virtual_table.js', 'js/script.js', 'js/config_images.js'],
+    'css/base.css': ['css/styles.css'],
+    'css/app.css': ['css/style.css'],
+}
+
+DIST_DIRNAME = 'dist'
+MANIFEST_FILENAME = 'manifest.json'
+CACHE_FOREVER = 'public, max-age=31536000, immutable'
+
+_CSS_STRINGS_AND_COMMENTS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+
+
+def minify_css(source):
+    """Minify CSS with rcssmin, or by dropping comments and extra whitespace outside strings."""
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+
+    parts = []
+    last = 0
+    for match in _CSS_STRINGS_AND_COMMENTS.finditer(source):
+        parts.append(_squeeze_css(source[last:match.start()]))
+        parts.append(match.group(1) or '')  # Keep strings, drop comments
+        last = match.end()
+    parts.append(_squeeze_css(source[last:]))
+    return ''.join(parts).strip()
+
+
+def _squeeze_css(text):
+    """Collapse whitespace in CSS that contains no strings or comments."""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}')
+
+
+def minify_js(source):
+    """Minify JavaScript with rjsmin if it is installed."""
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    return source
+
+
+def _write_atomic(path, data):
+    """Write bytes to path through a temporary file and rename."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def build_assets(static_dir, bundles=ASSET_BUNDLES):
+    """
+    Bundle, minify, fingerprint and precompress the static assets.
+
+    Parameters:
+    -----------
+    static_dir : str
+        The Flask static folder.
+    bundles : dict
+        Bundle name -> list of source files relative to static_dir.
+
+    Returns:
+    --------
+    dict
+        The manifest: bundle name -> fingerprinted path relative to static_dir.
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    manifest = {}
+    written = {f"{DIST_DIRNAME}/{MANIFEST_FILENAME}"}
+
+    for name, sources in bundles.items():
+        contents = []
+        for source in sources:
+            with open(os.path.join(static_dir, source), 'r', encoding='utf-8') as f:
+                contents.append(f.read())
+
+        stem, extension = os.path.splitext(name)
+        if extension == '.js':
+            # Separate files with ';' so concatenation cannot merge two statements
+            data = ';\n'.join(minify_js(content) for content in contents)
+        else:
+            data = '\n'.join(minify_css(content) for content in contents)
+        data = data.encode('utf-8')
+
+        digest = hashlib.blake2b(data, digest_size=6).hexdigest()
+        relative = f"{DIST_DIRNAME}/{stem}.{digest}{extension}"
+        path = os.path.join(static_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        _write_atomic(path, data)
+        _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        written.update({relative, relative + '.gz'})
+        if brotli is not None:
+            _write_atomic(path + '.br', brotli.compress(data, quality=11))
+            written.add(relative + '.br')
+
+        manifest[name] = relative
+        print(f"{name}: {sum(len(c) for c in contents)} -> {len(data)} bytes ({relative})")
+
+    # Remove outputs of earlier builds
+    for root, _, files in os.walk(dist_dir):
+        for filename in files:
+            relative = os.path.relpath(os.path.join(root, filename), static_dir).replace(os.sep, '/')
+            if relative not in written:
+                os.remove(os.path.join(root, filename))
+
+    _write_atomic(os.path.join(dist_dir, MANIFEST_FILENAME), json.dumps(manifest, indent=2).encode('utf-8'))
+    return manifest
+
+
+class AssetManifest:
+    """Flask integration: template helper and cache-forever serving of built assets."""
+
+    def __init__(self, app=None):
+        self._manifest = None
+        self._mtime = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Register the asset_urls() template helper and the /static/dist route."""
+        self.app = app
+        self.path = os.path.join(app.static_folder, DIST_DIRNAME, MANIFEST_FILENAME)
+        app.jinja_env.globals['asset_urls'] = self.asset_urls
+        # More specific than Flask's /static/<path:filename> rule, so it takes precedence
+        app.add_url_rule(f"{app.static_url_path}/{DIST_DIRNAME}/<path:filename>", 'dist_asset', self.serve)
+
+    def manifest(self):
+        """Return the build manifest, reloading it when a new build is written."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._mtime:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._manifest = json.load(f)
+            self._mtime = mtime
+        return self._manifest
+
+    def asset_urls(self, name):
+        """
+        Return the URLs to load for a bundle.
+
+        One fingerprinted URL when the assets are built, otherwise the URLs
+        of the bundle's source files. Debug mode always uses the sources, so
+        edits show up without rebuilding.
+        """
+        built = None if self.app.debug else self.manifest().get(name)
+        if built:
+            return [url_for('static', filename=built)]
+        return [url_for('static', filename=source) for source in ASSET_BUNDLES[name]]
+
+    def serve(self, filename):
+        """Serve a fingerprinted asset, precompressed if the client accepts it."""
+        relative = f"{DIST_DIRNAME}/{filename}"
+        if relative not in self.manifest().values():
+            abort(404)
+
+        # mimetype from the original name, e.g. app.1a2b3c.js -> application/javascript
+        directory = os.path.join(self.app.static_folder, DIST_DIRNAME)
+        response = None
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            compressed = safe_join(directory, filename + suffix)
+            if request.accept_encodings[encoding] and compressed and os.path.exists(compressed):
+                response = send_from_directory(directory, filename + suffix, mimetype=_mimetype(filename))
+                response.headers['Content-Encoding'] = encoding
+                break
+        if response is None:
+            response = send_from_directory(directory, filename, mimetype=_mimetype(filename))
+
+        response.headers['Cache-Control'] = CACHE_FOREVER
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+def _mimetype(filename):
+    """Content type of a built asset."""
+    return 'application/javascript' if filename.endswith('.js') else 'text/css'
+
+
+if __name__ == '__main__':
+    static_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+    build_assets(sys.argv[1] if len(sys.argv) > 1 else static_folder)
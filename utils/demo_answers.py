@@ -0,0 +1,312 @@
+"""Precomputed answers to the fixed demonstration questions.
+
+The configuration demonstrations (/api/demonstrate_safe_config) and the
+chain-of-thought demos (/api/demonstrate_cot) ask a fixed set of questions
+whose answers do not depend on a session. A warm-up thread generates them
+at startup and on a schedule into a JSON store shared by the workers, so
+the demos are served instantly instead of paying for three live model calls.
+
+Each answer records a version: a hash of the agent's provider, model,
+chain-of-thought prompt and knowledge base index. An answer whose version no
+longer matches is still served, and refreshed in the background.
+"""
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import DEMO_ANSWERS_SERVED
+
+logger = logging.getLogger(__name__)
+
+AGENT_TYPES = ('safe_coach', 'scrum_master', 'developer')
+
+# Questions of each configuration demonstration, by agent
+CONFIG_QUESTIONS = {
+    'big_picture': {
+        'safe_coach': 'Explain the SAFe Big Picture configuration. What are the key components and how do they work together?',
+        'scrum_master': 'How would you use the SAFe Big Picture to help teams understand their place in the organization?',
+        'developer': 'From a developer perspective, what aspects of the SAFe Big Picture are most relevant to your daily work?'
+    },
+    'core_competencies': {
+        'safe_coach': 'Explain the Core Competencies in SAFe and why they are important for business agility.',
+        'scrum_master': 'How would you help teams develop these core competencies in their daily practices?',
+        'developer': 'Which core competencies directly impact development teams and how can developers contribute to them?'
+    },
+    'essential': {
+        'safe_coach': 'Explain the Essential SAFe configuration. What are the minimal elements needed for SAFe implementation?',
+        'scrum_master': 'How would you implement Essential SAFe practices in a team that is new to SAFe?',
+        'developer': 'What changes would developers experience when moving from traditional development to Essential SAFe?'
+    },
+    'large_solution': {
+        'safe_coach': 'Explain the Large Solution SAFe configuration. How does it extend Essential SAFe?',
+        'scrum_master': 'What additional ceremonies and practices would you introduce when scaling to Large Solution SAFe?',
+        'developer': 'How does development work change when moving from Essential to Large Solution SAFe?'
+    },
+    'portfolio': {
+        'safe_coach': 'Explain the Portfolio SAFe configuration. How does it help align strategy with execution?',
+        'scrum_master': 'How would you explain the connection between portfolio-level decisions and team-level work?',
+        'developer': 'How do portfolio-level concerns like strategic themes affect developers in their daily work?'
+    },
+    'full': {
+        'safe_coach': 'Explain the Full SAFe configuration. What challenges does it address for the largest enterprises?',
+        'scrum_master': 'What are the key challenges when implementing Full SAFe and how would you address them?',
+        'developer': 'How do developers maintain agility and avoid bureaucracy in a Full SAFe implementation?'
+    }
+}
+
+# Chain-of-thought demo questions offered on the page, by agent: (question, label)
+COT_QUESTIONS = {
+    'safe_coach': [
+        ('What are the key considerations when scaling from Essential to Portfolio SAFe?', 'Scaling from Essential to Portfolio SAFe'),
+        ('How would you handle resistance to PI Planning from senior leadership?', 'Handling resistance to PI Planning'),
+        ('What metrics should be tracked to measure SAFe implementation success?', 'Metrics for SAFe success')
+    ],
+    'scrum_master': [
+        ('How would you facilitate a challenging Sprint Planning session?', 'Facilitating challenging Sprint Planning'),
+        ("What's your approach to resolving conflicts between team members?", 'Resolving team conflicts'),
+        ('How would you help a team struggling with technical debt?', 'Addressing technical debt')
+    ],
+    'developer': [
+        ('How would you approach breaking down a complex feature into stories?', 'Breaking down complex features'),
+        ('What considerations go into providing accurate story estimates?', 'Providing accurate estimates'),
+        ('How do you balance new feature development with addressing technical debt?', 'Balancing features vs. technical debt')
+    ]
+}
+
+
+def demo_questions():
+    """Return every (agent_type, question) pair the demos ask, without duplicates."""
+    pairs = [(agent_type, question) for questions in CONFIG_QUESTIONS.values()
+             for agent_type, question in questions.items()]
+    pairs += [(agent_type, question) for agent_type, questions in COT_QUESTIONS.items()
+              for question, _ in questions]
+    return list(dict.fromkeys(pairs))
+
+
+def _key(agent_type, question):
+    return f"{agent_type}\n{question}"
+
+
+class DemoAnswerStore:
+    """
+    Versioned chain-of-thought answers to the demo questions, kept in a JSON file.
+
+    Workers share the file: writes replace it atomically under an exclusive
+    flock, and readers reload it when its mtime changes. One worker at a
+    time runs the warm-up; the others pick up its answers from the file.
+    """
+
+    def __init__(self, path, agents_factory, render):
+        """
+        Initialize the store.
+
+        Parameters:
+        -----------
+        path : str
+            JSON file holding the answers.
+        agents_factory : callable
+            Returns {agent_type: agent} configured like the agents of a new simulation.
+        render : callable
+            Converts markdown to HTML; answers are stored pre-rendered.
+        """
+        self.path = path
+        self.agents_factory = agents_factory
+        self.render = render
+        self.entries = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='safe-demo-refresh')
+        self._stop = threading.Event()
+
+    def _reload(self):
+        """Load the file if another process (or a refresh) has written it since the last read."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read demo answers from %s: %s", self.path, e)
+            return
+        with self._lock:
+            self.entries = entries
+            self._mtime = mtime
+
+    def _save(self, key, entry):
+        """Merge one answer into the file, keeping answers written by other processes."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._mtime = None
+                self._reload()
+                with self._lock:
+                    entries = dict(self.entries, **{key: entry})
+                handle, temporary = tempfile.mkstemp(dir=directory, prefix='.demo_answers-')
+                with os.fdopen(handle, 'w', encoding='utf-8') as f:
+                    json.dump(entries, f, ensure_ascii=False)
+                os.replace(temporary, self.path)
+                with self._lock:
+                    self.entries = entries
+                    self._mtime = os.stat(self.path).st_mtime_ns
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def generate(self, agent_type, agent, question):
+        """
+        Ask an agent a question and store the rendered answer.
+
+        Returns:
+        --------
+        dict
+            The stored entry.
+        """
+        version = agent.chain_of_thought_version()
+        response = agent.generate_chain_of_thought_response(question)
+        entry = {
+            'version': version,
+            'generated_at': time.time(),
+            'thought_process': response['thought_process'],
+            'thought_process_html': [self.render(step) for step in response['thought_process']],
+            'conclusion': response['conclusion'],
+            'conclusion_html': self.render(response['conclusion'])
+        }
+        self._save(_key(agent_type, question), entry)
+        return entry
+
+    def answer(self, agent_type, agent, question):
+        """
+        Return the answer of an agent to a demo question.
+
+        Stored answers are served immediately; one generated with a different
+        provider, model, prompt or index is served too, while a refresh is
+        queued. Questions without a stored answer are answered live and stored.
+
+        Parameters:
+        -----------
+        agent_type : str
+            'safe_coach', 'scrum_master' or 'developer'.
+        agent : BaseAgent
+            The agent answering, e.g. of the current simulation.
+        question : str
+            The demo question.
+
+        Returns:
+        --------
+        tuple
+            (entry, source) with source 'precomputed', 'stale' or 'live'.
+        """
+        self._reload()
+        key = _key(agent_type, question)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            source = 'live'
+            entry = self.generate(agent_type, agent, question)
+        elif entry['version'] != agent.chain_of_thought_version():
+            source = 'stale'
+            self._refresh(agent_type, agent, question)
+        else:
+            source = 'precomputed'
+        DEMO_ANSWERS_SERVED.labels(source).inc()
+        return entry, source
+
+    def _refresh(self, agent_type, agent, question):
+        """Regenerate an outdated answer in the background, once at a time per question."""
+        key = _key(agent_type, question)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.generate(agent_type, agent, question)
+            except Exception:
+                logger.exception("Refreshing the demo answer of %s to %r failed", agent_type, question)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._refresher.submit(refresh)
+
+    def warm(self):
+        """
+        Generate every missing or outdated demo answer.
+
+        Returns:
+        --------
+        dict
+            Counts of answers 'generated', already 'current', 'failed', or
+            'skipped' because another process holds the warm-up lock.
+        """
+        counts = {'generated': 0, 'current': 0, 'failed': 0, 'skipped': 0}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + '.warm.lock', 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                counts['skipped'] = len(demo_questions())
+                return counts
+            try:
+                agents = self.agents_factory()
+                versions = {agent_type: agent.chain_of_thought_version() for agent_type, agent in agents.items()}
+                for agent_type, question in demo_questions():
+                    if self._stop.is_set():
+                        break
+                    self._reload()
+                    with self._lock:
+                        entry = self.entries.get(_key(agent_type, question))
+                    if entry and entry['version'] == versions[agent_type]:
+                        counts['current'] += 1
+                        continue
+                    try:
+                        self.generate(agent_type, agents[agent_type], question)
+                        counts['generated'] += 1
+                    except Exception:
+                        logger.exception("Precomputing the demo answer of %s to %r failed", agent_type, question)
+                        counts['failed'] += 1
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return counts
+
+    def start(self, interval=3600.0):
+        """
+        Warm the store in a background thread now and then every interval seconds.
+
+        Parameters:
+        -----------
+        interval : float
+            Seconds between checks for outdated answers; 0 warms once.
+
+        Returns:
+        --------
+        threading.Thread
+            The warm-up thread.
+        """
+        def run():
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                counts = self.warm()
+                logger.info("Demo answers warmed in %.1fs: %s", time.perf_counter() - started, counts)
+                if interval <= 0 or self._stop.wait(interval):
+                    break
+
+        thread = threading.Thread(target=run, name='safe-demo-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        """Stop the warm-up schedule after the answer being generated."""
+        self._stop.set()
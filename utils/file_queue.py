@@ -0,0 +1,94 @@
+import os
+import time
+import fcntl
+import pickle
+import struct
+from urllib.parse import urlparse
+
+import socketio
+
+# Each record is a 4-byte big-endian length followed by a pickled message
+_HEADER = struct.Struct('>I')
+
+
+class FileQueueManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager that fans out emits between processes through an
+    append-only file.
+
+    This is a stand-in for a real message queue (Redis, RabbitMQ) so that
+    multi-worker mode can be run and tested on one machine without extra
+    services. Every worker appends its messages to the same file and tails
+    it for messages from the others. The file is never truncated, so use it
+    for local runs and tests only.
+    """
+    name = 'file'
+
+    def __init__(self, url='file:///tmp/safe-socketio', channel='socketio', write_only=False,
+                 logger=None, json=None, poll_interval=0.05):
+        """
+        Initialize the manager.
+
+        Parameters:
+        -----------
+        url : str
+            file:// URL of the directory holding the queue file.
+        channel : str
+            Name of the queue; workers must use the same channel.
+        write_only : bool
+            Only publish, never listen (for processes without clients).
+        poll_interval : float
+            Seconds between checks for new messages.
+        """
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        directory = urlparse(url).path
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{channel}.queue")
+        self.poll_interval = poll_interval
+
+    def _publish(self, data):
+        """Append a message to the queue file."""
+        payload = pickle.dumps(data)
+        with open(self.path, 'ab') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.write(_HEADER.pack(len(payload)) + payload)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _listen(self):
+        """Yield messages appended by any process after this listener started."""
+        offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        while True:
+            if os.path.exists(self.path) and os.path.getsize(self.path) > offset:
+                with open(self.path, 'rb') as f:
+                    f.seek(offset)
+                    buffer = f.read()
+
+                position = 0
+                while position + _HEADER.size <= len(buffer):
+                    (length,) = _HEADER.unpack_from(buffer, position)
+                    end = position + _HEADER.size + length
+                    if end > len(buffer):
+                        break  # Record still being written; read it on the next poll
+                    yield pickle.loads(buffer[position + _HEADER.size:end])
+                    position = end
+                offset += position
+
+            if self.server is not None:
+                self.server.sleep(self.poll_interval)
+            else:
+                time.sleep(self.poll_interval)
+
+
+def create_client_manager(url, channel='socketio'):
+    """
+    Create a Socket.IO client manager for the file:// queue stand-in.
+
+    Returns None for other URLs, which Flask-SocketIO handles itself
+    through its message_queue option (redis://, amqp://, ...).
+    """
+    if url and url.startswith('file://'):
+        return FileQueueManager(url, channel=channel)
+    return None
@@ -0,0 +1,173 @@
+import gzip
+import zlib
+import hashlib
+
+from flask import current_app, request, jsonify, json
+
+try:
+    import brotli  # Optional; gzip is used when it is not installed
+except ImportError:
+    brotli = None
+
+# Responses that are already compact or binary are not worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'text/html', 'text/css', 'text/plain', 'application/javascript')
+
+
+def version_etag(*parts):
+    """Build an ETag value from version counters (simulation id, sequence, ...)."""
+    return '-'.join(str(part) for part in parts)
+
+
+def content_etag(data):
+    """Build an ETag value from a hash of JSON-serializable data."""
+    encoded = json.dumps(data, sort_keys=True).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=12).hexdigest()
+
+
+def not_modified(etag):
+    """
+    Return a 304 response if the client already has this version, else None.
+
+    Call this before building the response body so unchanged polls skip
+    the work entirely.
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return None
+
+
+def cached_jsonify(etag, *args, **kwargs):
+    """
+    jsonify() a payload and mark it with a weak ETag.
+
+    The ETag is weak because the same version may be sent with different
+    content encodings. Cache-Control: no-cache makes clients revalidate
+    every time, which costs a 304 when nothing changed.
+    """
+    response = jsonify(*args, **kwargs)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def compress_response(response, min_size=1024, level=6):
+    """
+    Compress a response body with brotli or gzip if the client accepts it.
+
+    Parameters:
+    -----------
+    response : flask.Response
+        The response about to be sent.
+    min_size : int
+        Bodies smaller than this many bytes are sent uncompressed.
+    level : int
+        gzip compression level (brotli uses a comparable quality).
+
+    Returns:
+    --------
+    flask.Response
+        The same response, compressed in place when worthwhile.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code >= 300
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        encoding = 'br'
+    elif accepted['gzip']:
+        encoding = 'gzip'
+    else:
+        return response
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=min(level, 11)))
+    else:
+        response.set_data(gzip.compress(body, compresslevel=level))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def _compressed_chunks(chunks, encoding, level):
+    """Compress a stream of byte chunks incrementally."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=min(level, 11))
+        for chunk in chunks:
+            data = compressor.process(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def streamed_jsonify(etag, envelope, key, items, transform=None, batch_size=200, level=6):
+    """
+    Stream a JSON object whose `key` holds a (large) list, one batch at a time.
+
+    The body is the same as jsonify({**envelope, key: items}), but it is
+    serialized and sent in batches, so the first bytes go out before the
+    whole list is encoded and the full body is never held in memory.
+
+    Parameters:
+    -----------
+    etag : str
+        Weak ETag for the response.
+    envelope : dict
+        Other top-level fields (e.g. {'status': 'success'}).
+    key : str
+        Name of the list field.
+    items : list
+        Items to send. The list is copied, so later appends are not included.
+    transform : callable, optional
+        Applied to each item just before it is serialized.
+    batch_size : int
+        Items serialized per chunk.
+    level : int
+        Compression level when the client accepts gzip or brotli.
+
+    Returns:
+    --------
+    flask.Response
+        A streamed application/json response.
+    """
+    provider = current_app.json
+    items = list(items)
+    head = provider.dumps(envelope)[:-1] + (',' if envelope else '') + json.dumps(key) + ':['
+
+    def chunks():
+        yield head.encode('utf-8')
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            if transform is not None:
+                batch = [transform(item) for item in batch]
+            body = provider.dumps(batch)[1:-1]
+            yield ((',' if start else '') + body).encode('utf-8')
+        yield b']}\n'
+
+    accepted = request.accept_encodings
+    encoding = 'br' if brotli is not None and accepted['br'] else 'gzip' if accepted['gzip'] else None
+    body = _compressed_chunks(chunks(), encoding, level) if encoding else chunks()
+
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
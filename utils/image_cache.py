@@ -0,0 +1,120 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class CachedImage:
+    """Bytes and validators of one cached image file."""
+    __slots__ = ('path', 'data', 'etag', 'mimetype', 'mtime_ns', 'size', 'checked')
+
+    def __init__(self, path, data, mimetype, mtime_ns, size, checked):
+        self.path = path
+        self.data = data
+        self.etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+        self.mimetype = mimetype
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.checked = checked
+
+
+class ImageCache:
+    """
+    LRU cache of image bytes keyed by (config_type, variant).
+
+    Cached files are re-validated against their mtime and size at most once
+    per revalidate_interval, so repeated requests are served from memory
+    without touching the disk. The upload endpoint invalidates entries
+    explicitly when it replaces an image.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, revalidate_interval=2.0):
+        """
+        Initialize the cache.
+
+        Parameters:
+        -----------
+        max_bytes : int
+            Total size of cached images; least recently used entries are evicted.
+        revalidate_interval : float
+            Seconds a cached entry is trusted before its file is stat()ed again.
+            Content-addressed (hashed) files never change and can use a large value.
+        """
+        self.max_bytes = max_bytes
+        self.revalidate_interval = revalidate_interval
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, path, mimetype):
+        """
+        Return the cached image for key, loading it from path if needed.
+
+        Parameters:
+        -----------
+        key : tuple
+            (config_type, variant) identifying the image.
+        path : str
+            File the image is read from.
+        mimetype : str
+            Content type to serve the image with.
+
+        Returns:
+        --------
+        CachedImage or None
+            None if the file does not exist.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.path == path and now - entry.checked < self.revalidate_interval:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate_key(key)
+            return None
+
+        if entry is not None and entry.path == path and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            with self._lock:
+                entry.checked = now
+                self.hits += 1
+            return entry
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        entry = CachedImage(path, data, mimetype, stat.st_mtime_ns, stat.st_size, now)
+
+        with self._lock:
+            self.misses += 1
+            self._remove(key)
+            if len(data) <= self.max_bytes:
+                self.entries[key] = entry
+                self.total_bytes += len(data)
+                while self.total_bytes > self.max_bytes:
+                    evicted_key = next(iter(self.entries))
+                    self._remove(evicted_key)
+        return entry
+
+    def _remove(self, key):
+        """Drop an entry; the caller holds the lock."""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= len(entry.data)
+
+    def invalidate_key(self, key):
+        """Drop one cached image."""
+        with self._lock:
+            self._remove(key)
+
+    def invalidate(self, config_type=None):
+        """Drop every cached image of a configuration type, or all images."""
+        with self._lock:
+            for key in [key for key in self.entries if config_type is None or key[0] == config_type]:
+                self._remove(key)
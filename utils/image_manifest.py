@@ -0,0 +1,124 @@
+import os
+import json
+import tempfile
+import threading
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# Configuration types and the numbered image each one is shown with
+CONFIG_IMAGE_NUMBERS = {
+    'big_picture': 1,
+    'core_competencies': 2,
+    'essential': 3,
+    'large_solution': 4,
+    'portfolio': 5,
+    'full': 6
+}
+
+
+def config_image_filename(config_type):
+    """Return the canonical image filename for a configuration type."""
+    return f"safe_config_{CONFIG_IMAGE_NUMBERS[config_type]}.jpg"
+
+
+class ImageManifest:
+    """
+    Read access to the image variant manifest written by SAFeImageProcessor.
+
+    The manifest maps each configuration type to its resized and re-encoded
+    variants. It is reloaded only when the file on disk changes.
+    """
+
+    def __init__(self, images_dir):
+        """
+        Initialize the manifest reader.
+
+        Parameters:
+        -----------
+        images_dir : str
+            Directory holding manifest.json and the variant files.
+        """
+        self.images_dir = images_dir
+        self.path = os.path.join(images_dir, MANIFEST_FILENAME)
+        self._mtime = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def entries(self):
+        """Return the manifest entries, reloading them if the file changed."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+
+        with self._lock:
+            if mtime != self._mtime:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+                self._mtime = mtime
+            return self._entries
+
+    def get(self, config_type):
+        """Return the manifest entry of a configuration type, or None."""
+        return self.entries().get(config_type)
+
+    def update(self, results):
+        """
+        Merge processing results into the manifest and write it atomically.
+
+        Parameters:
+        -----------
+        results : dict
+            Manifest entries by configuration type; None removes an entry.
+        """
+        with self._lock:
+            entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f)
+            for config_type, entry in results.items():
+                if entry is None:
+                    entries.pop(config_type, None)
+                else:
+                    entries[config_type] = entry
+
+            fd, temp_path = tempfile.mkstemp(dir=self.images_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, indent=2, sort_keys=True)
+            os.replace(temp_path, self.path)
+            self._mtime = None
+
+
+def choose_variant(entry, accept_webp=False, width=None):
+    """
+    Pick the best variant of an image for a client.
+
+    Parameters:
+    -----------
+    entry : dict
+        Manifest entry of one configuration image.
+    accept_webp : bool
+        Whether the client accepts image/webp.
+    width : int, optional
+        Display width in device pixels; the smallest variant at least this
+        wide is chosen. Without it the largest variant is returned.
+
+    Returns:
+    --------
+    dict or None
+        The chosen variant, or None if the entry has no variants.
+    """
+    variants = entry.get('variants', []) if entry else []
+    if accept_webp:
+        preferred = [v for v in variants if v['format'] == 'webp']
+    else:
+        preferred = []
+    candidates = sorted(preferred or [v for v in variants if v['format'] == 'jpeg'], key=lambda v: v['width'])
+    if not candidates:
+        return None
+
+    if width:
+        for variant in candidates:
+            if variant['width'] >= width:
+                return variant
+    return candidates[-1]
@@ -1,15 +1,183 @@
 import os
 import sys
 import base64
-from PIL import Image
+import shutil
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps
 import io
-import numpy as np
 from pathlib import Path
 
 # Add parent directory to path to import from app
 parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(parent_dir)
 
+from utils.image_manifest import ImageManifest, CONFIG_IMAGE_NUMBERS, config_image_filename
+
+# Responsive widths generated for every image (never wider than the original)
+VARIANT_WIDTHS = (480, 960, 1600)
+VARIANTS_DIRNAME = 'variants'
+
+# Encoder settings per output format: (Pillow format, file extension, mimetype, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _write_atomic(path, data):
+    """Write bytes to path through a temporary file and rename."""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def generate_variants(source_path, output_dir, stem, widths=VARIANT_WIDTHS, formats=('webp', 'jpeg')):
+    """
+    Resize an image to several widths and encode each as WebP and progressive JPEG.
+
+    Output files are named `{stem}-{width}w.{hash}.{ext}`, where hash is
+    taken from the encoded bytes, so a URL always refers to the same content
+    and can be cached forever. This is a module-level function so it can run
+    in a worker process.
+
+    Parameters:
+    -----------
+    source_path : str
+        Path to the source image.
+    output_dir : str
+        Directory where the variants are written.
+    stem : str
+        Filename prefix of the variants (e.g. 'safe_config_1').
+    widths : tuple
+        Target widths in pixels; widths larger than the source are clamped.
+    formats : tuple
+        Keys of VARIANT_FORMATS to produce.
+
+    Returns:
+    --------
+    dict
+        Source dimensions and a list of variants (width, height, format,
+        mimetype, file relative to output_dir's parent, size in bytes).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    with Image.open(source_path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    source_width, source_height = image.size
+    variants = []
+
+    for width in sorted({min(width, source_width) for width in widths}):
+        height = max(1, round(source_height * width / source_width))
+        resized = image if width == source_width else image.resize((width, height), Image.Resampling.LANCZOS)
+
+        for format_name in formats:
+            pil_format, extension, mimetype, options = VARIANT_FORMATS[format_name]
+            # JPEG has no alpha channel; WebP keeps it
+            mode = 'RGBA' if has_alpha and format_name == 'webp' else 'RGB'
+            buffer = io.BytesIO()
+            resized.convert(mode).save(buffer, format=pil_format, **options)
+            data = buffer.getvalue()
+
+            digest = hashlib.blake2b(data, digest_size=8).hexdigest()
+            filename = f"{stem}-{width}w.{digest}.{extension}"
+            path = os.path.join(output_dir, filename)
+            if not os.path.exists(path):
+                _write_atomic(path, data)
+
+            variants.append({
+                'width': width,
+                'height': height,
+                'format': format_name,
+                'mimetype': mimetype,
+                'file': f"{os.path.basename(output_dir)}/{filename}",
+                'size': len(data)
+            })
+
+    return {'width': source_width, 'height': source_height, 'variants': variants}
+
+
+# Upload formats accepted by validate_image, with the file extension each is stored under
+UPLOAD_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def validate_image(path, max_pixels=40_000_000, formats=UPLOAD_FORMATS):
+    """
+    Check that a file is an image of an accepted format and size.
+
+    Only the header is read: Image.open is lazy, and draft() keeps JPEG
+    decoding (if anything forces it) at a reduced scale. The pixels are
+    decoded later, by the variant generator in a worker process.
+
+    Parameters:
+    -----------
+    path : str
+        File to check.
+    max_pixels : int
+        Largest accepted width * height (guards against decompression bombs).
+    formats : dict
+        Accepted Pillow format names.
+
+    Returns:
+    --------
+    tuple
+        (format, width, height) of the image.
+
+    Raises:
+    -------
+    ValueError
+        If the file is not an accepted image.
+    """
+    try:
+        with Image.open(path) as image:
+            if image.format == 'JPEG':
+                image.draft('RGB', (64, 64))
+            image_format = image.format
+            width, height = image.size
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError("Not a valid image file") from e
+
+    if image_format not in formats:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    if width * height > max_pixels:
+        raise ValueError(f"Image is too large: {width}x{height} pixels")
+    return image_format, width, height
+
+
+def _process_configuration_image(source_path, target_path, variants_dir):
+    """Copy one configuration image into place and build its variants (runs in a worker process)."""
+    try:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        if os.path.abspath(source_path) != os.path.abspath(target_path):
+            with Image.open(source_path) as image:
+                is_jpeg = image.format == 'JPEG'
+                if not is_jpeg:
+                    # The canonical file is served as image/jpeg, so other formats are re-encoded
+                    buffer = io.BytesIO()
+                    ImageOps.exif_transpose(image).convert('RGB').save(buffer, format='JPEG', quality=90)
+            if is_jpeg:
+                with open(source_path, 'rb') as src_file:
+                    _write_atomic(target_path, src_file.read())
+            else:
+                _write_atomic(target_path, buffer.getvalue())
+
+        stem = os.path.splitext(os.path.basename(target_path))[0]
+        entry = generate_variants(target_path, variants_dir, stem)
+        entry['file'] = os.path.basename(target_path)
+        return {'success': True, 'source_path': source_path, 'target_path': target_path, 'manifest': entry}
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'source_path': source_path, 'target_path': target_path}
+
 class SAFeImageProcessor:
     """
     A comprehensive image processing utility for SAFe configuration images.
@@ -17,7 +185,7 @@ class SAFeImageProcessor:
     and preparing them for integration with the SAFe AI Agents application.
     """
     
-    def __init__(self, static_dir=None):
+    def __init__(self, static_dir=None, max_workers=None):
         """
         Initialize the SAFeImageProcessor with the static directory path.
         
@@ -25,6 +193,8 @@ class SAFeImageProcessor:
         -----------
         static_dir : str, optional
             Path to the static directory. If None, will use the default path.
+        max_workers : int, optional
+            Worker processes for images submitted with submit_configuration_image.
         """
         if static_dir is None:
             self.static_dir = os.path.join(parent_dir, 'static')
@@ -32,17 +202,27 @@ class SAFeImageProcessor:
             self.static_dir = static_dir
         
         self.images_dir = os.path.join(self.static_dir, 'images')
-        os.makedirs(self.images_dir, exist_ok=True)
+        self.variants_dir = os.path.join(self.images_dir, VARIANTS_DIRNAME)
+        os.makedirs(self.variants_dir, exist_ok=True)
+        self.manifest = ImageManifest(self.images_dir)
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
-    def process_configuration_images(self, image_mappings):
+    def process_configuration_images(self, image_mappings, max_workers=None):
         """
         Process SAFe configuration images based on the provided mappings.
         
+        Images are processed in parallel on a process pool, and the variant
+        manifest is updated once all of them are done.
+        
         Parameters:
         -----------
         image_mappings : dict
             Dictionary mapping configuration types to source file paths.
             Example: {'big_picture': '/path/to/image1.jpg', ...}
+        max_workers : int, optional
+            Number of worker processes. Defaults to the number of CPUs.
         
         Returns:
         --------
@@ -50,54 +230,125 @@ class SAFeImageProcessor:
             Dictionary with processing results for each configuration.
         """
         results = {}
+        tasks = {}
         
         for config_type, source_path in image_mappings.items():
-            # Determine the target filename based on the configuration type
-            if config_type == 'big_picture':
-                target_filename = 'safe_config_1.jpg'
-            elif config_type == 'core_competencies':
-                target_filename = 'safe_config_2.jpg'
-            elif config_type == 'essential':
-                target_filename = 'safe_config_3.jpg'
-            elif config_type == 'large_solution':
-                target_filename = 'safe_config_4.jpg'
-            elif config_type == 'portfolio':
-                target_filename = 'safe_config_5.jpg'
-            elif config_type == 'full':
-                target_filename = 'safe_config_6.jpg'
-            else:
+            if config_type not in CONFIG_IMAGE_NUMBERS:
                 print(f"Warning: Unknown configuration type: {config_type}")
                 continue
-            
-            target_path = os.path.join(self.images_dir, target_filename)
-            
-            try:
-                # Process and save the image
-                success = self._process_and_save_image(source_path, target_path)
-                results[config_type] = {
-                    'success': success,
-                    'source_path': source_path,
-                    'target_path': target_path
-                }
-                
-                if success:
-                    print(f"Successfully processed {config_type} image: {target_path}")
-                else:
-                    print(f"Failed to process {config_type} image from {source_path}")
-            except Exception as e:
-                print(f"Error processing {config_type} image: {e}")
-                results[config_type] = {
-                    'success': False,
-                    'error': str(e),
-                    'source_path': source_path,
-                    'target_path': target_path
-                }
+            tasks[config_type] = (source_path, os.path.join(self.images_dir, config_image_filename(config_type)))
+        
+        if not tasks:
+            return results
+        
+        with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count() or 1, len(tasks))) as executor:
+            futures = {
+                config_type: executor.submit(_process_configuration_image, source_path, target_path, self.variants_dir)
+                for config_type, (source_path, target_path) in tasks.items()
+            }
+            for config_type, future in futures.items():
+                results[config_type] = future.result()
+        
+        manifest_updates = {}
+        for config_type, result in results.items():
+            if result['success']:
+                manifest_updates[config_type] = result.pop('manifest')
+                print(f"Successfully processed {config_type} image: {result['target_path']}")
+            else:
+                print(f"Error processing {config_type} image: {result['error']}")
+        
+        if manifest_updates:
+            self.manifest.update(manifest_updates)
+            self.remove_stale_variants()
         
         return results
     
+    def submit_configuration_image(self, config_type, source_path, callback=None):
+        """
+        Queue one configuration image for processing on the background process pool.
+        
+        The manifest is updated when the worker finishes, then callback is
+        called with (config_type, result) on a background thread.
+        
+        Parameters:
+        -----------
+        config_type : str
+            Configuration type the image belongs to.
+        source_path : str
+            Path to the new source image.
+        callback : callable, optional
+            Called once the image has been processed (successfully or not).
+        
+        Returns:
+        --------
+        concurrent.futures.Future
+            Future of the processing result.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                # Forking a threaded (or monkey-patched) web server is unsafe, so start clean workers
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+        
+        target_path = os.path.join(self.images_dir, config_image_filename(config_type))
+        future = self._executor.submit(_process_configuration_image, source_path, target_path, self.variants_dir)
+        
+        def finish(done):
+            try:
+                result = done.result()
+            except Exception as e:  # e.g. the worker process died
+                result = {'success': False, 'error': str(e), 'source_path': source_path, 'target_path': target_path}
+            if result['success']:
+                self.manifest.update({config_type: result.pop('manifest')})
+                self.remove_stale_variants(os.path.splitext(config_image_filename(config_type))[0])
+            else:
+                print(f"Error processing {config_type} image: {result['error']}")
+            if callback:
+                callback(config_type, result)
+        
+        future.add_done_callback(finish)
+        return future
+    
+    def process_existing_images(self, max_workers=None):
+        """
+        Build variants for the configuration images already in the images directory.
+        
+        Returns:
+        --------
+        dict
+            Dictionary with processing results for each configuration.
+        """
+        mappings = {}
+        for config_type in CONFIG_IMAGE_NUMBERS:
+            path = os.path.join(self.images_dir, config_image_filename(config_type))
+            if os.path.exists(path):
+                mappings[config_type] = path
+        return self.process_configuration_images(mappings, max_workers=max_workers)
+    
+    def remove_stale_variants(self, stem=None):
+        """
+        Delete variant files no longer referenced by the manifest.
+        
+        Parameters:
+        -----------
+        stem : str, optional
+            Only consider variants of this image (e.g. 'safe_config_1'), so
+            files being written for other images are left alone.
+        """
+        referenced = {
+            os.path.basename(variant['file'])
+            for entry in self.manifest.entries().values()
+            for variant in entry.get('variants', [])
+        }
+        for filename in os.listdir(self.variants_dir):
+            if stem and not filename.startswith(f"{stem}-"):
+                continue
+            if filename not in referenced and not filename.endswith('.tmp'):
+                os.remove(os.path.join(self.variants_dir, filename))
+    
     def _process_and_save_image(self, source_path, target_path):
         """
-        Process an image (optimize, resize if needed) and save it to the target path.
+        Process an image (copy it into place and build its resized variants).
         
         Parameters:
         -----------
@@ -111,19 +362,10 @@ class SAFeImageProcessor:
         bool
             True if successful, False otherwise.
         """
-        try:
-            # For now, we're just copying the image as is
-            # In a real application, you might want to optimize, resize, etc.
-            os.makedirs(os.path.dirname(target_path), exist_ok=True)
-            
-            with open(source_path, 'rb') as src_file:
-                with open(target_path, 'wb') as dst_file:
-                    dst_file.write(src_file.read())
-            
-            return True
-        except Exception as e:
-            print(f"Error in _process_and_save_image: {e}")
-            return False
+        result = _process_configuration_image(source_path, target_path, self.variants_dir)
+        if not result['success']:
+            print(f"Error in _process_and_save_image: {result['error']}")
+        return result['success']
 
     def create_default_image(self, width=800, height=600, text="SAFe Configuration"):
         """
@@ -164,4 +406,7 @@ if __name__ == "__main__":
     # Create a default image
     processor.create_default_image()
     
+    # Build responsive variants for the configuration images already in place
+    processor.process_existing_images()
+    
     print("SAFe image processor initialized and default image created.")
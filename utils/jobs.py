@@ -0,0 +1,264 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import tracing, profiling
+
+logger = logging.getLogger(__name__)
+
+# Job statuses
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while the queue is at its limit."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when cancellation has been requested."""
+
+
+class Job:
+    """A unit of background work with status, progress and result tracking."""
+
+    def __init__(self, name, room=None, owner=None):
+        """
+        Initialize a job.
+
+        Parameters:
+        -----------
+        name : str
+            Short name of the work being done (e.g. 'start_pi').
+        room : str, optional
+            Socket.IO room that should receive this job's events.
+        owner : str, optional
+            Id of the simulation the job works on; only its sessions may see or cancel it.
+        """
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.room = room
+        self.owner = owner
+        self.status = QUEUED
+        self.message = 'Queued'
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.trace_parent = tracing.current_context()  # The job's span continues the submitting request's trace
+        self.profile_parent = profiling.current_name()  # Jobs queued by a profiled request are profiled too
+        self._cancel_requested = threading.Event()
+        self._manager = None
+
+    @property
+    def cancel_requested(self):
+        """Whether cancellation has been requested for this job."""
+        return self._cancel_requested.is_set()
+
+    def check_cancelled(self):
+        """
+        Raise JobCancelled if cancellation has been requested.
+
+        Job functions call this between steps; a step that has already
+        started always runs to completion so the simulation stays consistent.
+        """
+        if self.cancel_requested:
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def report(self, message, **progress):
+        """
+        Record a progress update and notify listeners.
+
+        Parameters:
+        -----------
+        message : str
+            Human-readable description of the current step.
+        **progress
+            Structured progress values (e.g. step=2, total=5).
+        """
+        self.message = message
+        self.progress.update(progress)
+        if self._manager:
+            self._manager._notify(self, 'progress')
+
+    def to_dict(self):
+        """Return a JSON-serializable description of the job."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'message': self.message,
+            'progress': self.progress,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobManager:
+    """
+    Run jobs on a bounded worker pool with a limit on queued work.
+
+    Listeners are called as on_event(job, event) where event is one of
+    'queued', 'progress' or 'finished'.
+    """
+
+    def __init__(self, max_workers=2, max_queue=10, retain=200, on_event=None):
+        """
+        Initialize the job manager.
+
+        Parameters:
+        -----------
+        max_workers : int
+            Number of jobs that may run at the same time.
+        max_queue : int
+            Maximum number of jobs waiting to start before submissions are rejected.
+        retain : int
+            Number of jobs kept for status lookups, oldest finished jobs dropped first.
+        on_event : callable, optional
+            Listener notified of job lifecycle events.
+        """
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retain = retain
+        self.on_event = on_event
+        self.jobs = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='safe-job')
+        self._lock = threading.Lock()
+
+    def queued_count(self):
+        """Return the number of jobs waiting for a worker."""
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.status == QUEUED)
+
+    def submit(self, name, func, *args, room=None, owner=None, **kwargs):
+        """
+        Queue a job for execution.
+
+        Parameters:
+        -----------
+        name : str
+            Short name of the job.
+        func : callable
+            Called as func(job, *args, **kwargs); its return value becomes the result.
+        room : str, optional
+            Socket.IO room that should receive the job's events.
+        owner : str, optional
+            Id of the simulation the job works on (see Job).
+
+        Returns:
+        --------
+        Job
+            The queued job.
+
+        Raises:
+        -------
+        JobQueueFull
+            If max_queue jobs are already waiting.
+        """
+        job = Job(name, room=room, owner=owner)
+        job._manager = self
+
+        with self._lock:
+            waiting = sum(1 for queued in self.jobs.values() if queued.status == QUEUED)
+            if waiting >= self.max_queue:
+                raise JobQueueFull(f"Job queue is full ({self.max_queue} jobs waiting)")
+            self.jobs[job.id] = job
+            self._prune()
+
+        self._notify(job, 'queued')
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        """Return the job with the given id, or None if unknown."""
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Request cancellation of a job.
+
+        Queued jobs are cancelled immediately; running jobs stop at their
+        next check_cancelled() call.
+
+        Returns:
+        --------
+        bool
+            False if the job is unknown or already finished.
+        """
+        job = self.get(job_id)
+        if not job or job.status in FINISHED_STATUSES:
+            return False
+
+        job._cancel_requested.set()
+        if job.future and job.future.cancel():
+            self._finish(job, CANCELLED, message='Cancelled before start')
+        return True
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and release the worker pool."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, func, args, kwargs):
+        """Execute a job on a worker thread and record its outcome."""
+        if job.cancel_requested:
+            self._finish(job, CANCELLED, message='Cancelled before start')
+            return
+
+        job.status = RUNNING
+        job.started_at = time.time()
+        job.message = 'Running'
+        self._notify(job, 'progress')
+
+        try:
+            with tracing.span(f"job.{job.name}", parent=job.trace_parent, job_id=job.id), \
+                    profiling.profile_job(job.name, parent=job.profile_parent):
+                job.result = func(job, *args, **kwargs)
+        except JobCancelled:
+            self._finish(job, CANCELLED, message='Cancelled')
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.name)
+            job.error = str(e)
+            self._finish(job, FAILED, message='Failed')
+        else:
+            self._finish(job, SUCCEEDED, message='Completed')
+
+    def _finish(self, job, status, message):
+        """Mark a job as finished and notify listeners."""
+        if job.status in FINISHED_STATUSES:
+            return
+        job.status = status
+        job.message = message
+        job.finished_at = time.time()
+        self._notify(job, 'finished')
+
+    def _notify(self, job, event):
+        """Call the event listener, never letting it break the job."""
+        if not self.on_event:
+            return
+        try:
+            self.on_event(job, event)
+        except Exception:
+            logger.exception("Job event listener failed for job %s", job.id)
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the retention limit."""
+        excess = len(self.jobs) - self.retain
+        if excess <= 0:
+            return
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.status in FINISHED_STATUSES][:excess]:
+            del self.jobs[job_id]
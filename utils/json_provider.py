@@ -0,0 +1,139 @@
+import json
+import uuid
+import decimal
+import dataclasses
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson  # Optional; the standard library json module is used when it is not installed
+except ImportError:
+    orjson = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def default(o):
+    """
+    Convert objects the JSON encoders do not handle natively.
+
+    Dates keep the HTTP-date format Flask has always used for them, so the
+    output is the same whichever backend is active.
+    """
+    if isinstance(o, date):
+        return http_date(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if np is not None:
+        if isinstance(o, np.generic):
+            return o.item()
+        if isinstance(o, np.ndarray):
+            return o.tolist()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+# Dates and dataclasses go through default() so both backends format them identically
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+                   | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+
+
+def resolve_backend(name='auto'):
+    """
+    Return the serializer backend to use for a configured name.
+
+    Parameters:
+    -----------
+    name : str
+        'auto' (orjson if installed), 'orjson' or 'stdlib'.
+
+    Returns:
+    --------
+    str
+        'orjson' or 'stdlib'.
+    """
+    if name == 'orjson' and orjson is None:
+        raise ValueError("SAFE_JSON_BACKEND is 'orjson' but orjson is not installed")
+    if name not in ('auto', 'orjson', 'stdlib'):
+        raise ValueError(f"Unsupported JSON backend: {name}")
+    if name == 'auto':
+        return 'orjson' if orjson is not None else 'stdlib'
+    return name
+
+
+def dumps_bytes(obj, backend='orjson', sort_keys=False):
+    """Serialize obj to compact UTF-8 JSON bytes with the given backend."""
+    if backend == 'orjson':
+        return orjson.dumps(obj, default=default, option=_orjson_options(sort_keys))
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':'),
+                      sort_keys=sort_keys).encode('utf-8')
+
+
+def _orjson_options(sort_keys):
+    """orjson options matching json.dumps(sort_keys=sort_keys)."""
+    return _ORJSON_OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _ORJSON_OPTIONS
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that serializes with orjson when available.
+
+    Falls back to the standard library for options orjson does not support
+    (e.g. indent= from debug pretty-printing) and when the backend is 'stdlib'.
+    """
+    backend = 'stdlib'
+    default = staticmethod(default)
+
+    def _use_orjson(self, kwargs):
+        """Whether orjson can honour the given json.dumps options (it is always compact)."""
+        return self.backend == 'orjson' and (not kwargs or kwargs == {'separators': (',', ':')})
+
+    def dumps(self, obj, **kwargs):
+        """Serialize obj to a JSON string."""
+        if self._use_orjson(kwargs):
+            return orjson.dumps(obj, default=default, option=_orjson_options(self.sort_keys)).decode('utf-8')
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        """Deserialize JSON from a string or bytes."""
+        if self.backend == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Serialize data as a JSON response, skipping the str round trip."""
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        if self.backend != 'orjson' or pretty:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, 'orjson', sort_keys=self.sort_keys) + b'\n',
+                                        mimetype=self.mimetype)
+
+
+def socketio_json(provider):
+    """
+    Return a json-module-like object for Socket.IO that uses the app's provider.
+
+    Socket.IO serializes outside of any app context (e.g. from job threads),
+    so it cannot rely on flask.json finding the current app.
+    """
+    class _SocketIOJSON:
+        @staticmethod
+        def dumps(obj, **kwargs):
+            return provider.dumps(obj, **kwargs)
+
+        @staticmethod
+        def loads(s, **kwargs):
+            return provider.loads(s, **kwargs)
+
+    return _SocketIOJSON
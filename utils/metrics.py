@@ -0,0 +1,349 @@
+"""Process-local metrics exposed in the Prometheus text format.
+
+A minimal, dependency-free subset of the prometheus_client API: counters,
+gauges and histograms with labels, and render() for the /metrics endpoint.
+Each worker process keeps its own values; scrape every worker port.
+"""
+import os
+import time
+import bisect
+import resource
+import functools
+import threading
+import contextlib
+import contextvars
+
+# Default buckets in seconds, as used by the Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Model calls take seconds to minutes
+MODEL_CALL_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+PROCESS_START_TIME = time.time()
+
+# Phases timed while this holds a list are collected in it instead of recorded (see deferred_phases)
+_deferred_phases = contextvars.ContextVar('safe_deferred_phases', default=None)
+
+
+def _escape(value):
+    """Escape a label value for the text format."""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    """Return the {name="value",...} part of a sample line."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    """Format a sample value the way Prometheus expects."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Common label handling; children hold the values for one label combination."""
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # Metrics without labels are exported as 0 before first use
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, *values, **kwargs):
+        """Return the child for a label combination, creating it on first use."""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        key = tuple(str(value) for value in values)
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        """The child of a metric without labels."""
+        return self.labels()
+
+    def collect(self):
+        """Yield the text format lines of this metric."""
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, child in sorted(self._children.items()):
+            yield from child.samples(self.name, self.labelnames, key)
+
+
+class _Value:
+    """A single float value guarded by a lock."""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self.value = value
+
+    def samples(self, name, labelnames, key):
+        yield f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. requests served."""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. requests in flight."""
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def set(self, value):
+        self._default().set(value)
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count of one label combination."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the duration of its block."""
+        return _Timer(self.observe)
+
+    def samples(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key, [('le', _format_value(bound))])
+            yield f"{name}_bucket{labels} {cumulative}"
+        yield f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(labelnames, key)} {cumulative}"
+
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. request durations in seconds."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class _Timer:
+    """Calls a callback with the elapsed seconds when the block exits."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.callback(time.perf_counter() - self.started)
+        return False
+
+
+class Registry:
+    """The metrics rendered by /metrics."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.collect())
+        lines.extend(_process_metrics())
+        return '\n'.join(lines) + '\n'
+
+
+def _process_metrics():
+    """Standard process_* metrics, read when scraped."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    lines = [
+        "# HELP process_cpu_seconds_total Total user and system CPU time spent in seconds.",
+        "# TYPE process_cpu_seconds_total counter",
+        f"process_cpu_seconds_total {_format_value(usage.ru_utime + usage.ru_stime)}",
+        "# HELP process_start_time_seconds Start time of the process since unix epoch in seconds.",
+        "# TYPE process_start_time_seconds gauge",
+        f"process_start_time_seconds {_format_value(PROCESS_START_TIME)}",
+    ]
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        rss = None  # Not Linux; ru_maxrss is a peak, not the current size
+    if rss is not None:
+        lines += [
+            "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+            "# TYPE process_resident_memory_bytes gauge",
+            f"process_resident_memory_bytes {rss}",
+        ]
+    return lines
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# HTTP and Socket.IO (recorded by app.py)
+HTTP_REQUESTS = Counter('safe_http_requests_total', 'HTTP requests served.',
+                        ['method', 'endpoint', 'status'])
+HTTP_REQUEST_DURATION = Histogram('safe_http_request_duration_seconds', 'HTTP request latency in seconds.',
+                                  ['method', 'endpoint'])
+HTTP_IN_FLIGHT = Gauge('safe_http_requests_in_flight', 'HTTP requests currently being handled.')
+SOCKETIO_CONNECTIONS = Gauge('safe_socketio_connections', 'Connected Socket.IO clients.')
+
+# Simulation phases (recorded by SAFeSimulation)
+SIMULATION_PHASES = Counter('safe_simulation_phases_total', 'Simulation phases run.', ['phase', 'outcome'])
+SIMULATION_PHASE_DURATION = Histogram('safe_simulation_phase_duration_seconds',
+                                      'Duration of simulation phases in seconds.', ['phase'],
+                                      buckets=MODEL_CALL_BUCKETS)
+
+# Model calls (recorded by BaseAgent)
+AGENT_CALLS = Counter('safe_agent_calls_total', 'Model API calls made by agents.',
+                      ['agent', 'provider', 'model', 'outcome'])
+AGENT_CALL_DURATION = Histogram('safe_agent_call_duration_seconds', 'Model API call latency in seconds.',
+                                ['agent', 'provider', 'model'], buckets=MODEL_CALL_BUCKETS)
+STRUCTURED_OUTPUTS = Counter('safe_structured_outputs_total',
+                             'Structured agent replies by schema and whether they parsed, needed a repair or fell back.',
+                             ['agent', 'schema', 'outcome'])
+
+# Semantic answer cache of /api/ask_agent (recorded by SemanticCache)
+SEMANTIC_CACHE_LOOKUPS = Counter('safe_semantic_cache_lookups_total', 'Semantic answer cache lookups.',
+                                 ['cache', 'outcome'])
+SEMANTIC_CACHE_ENTRIES = Gauge('safe_semantic_cache_entries', 'Answers held by the semantic answer cache.', ['cache'])
+
+# Demonstration answers (recorded by DemoAnswerStore)
+DEMO_ANSWERS_SERVED = Counter('safe_demo_answers_served_total', 'Demo answers served by where they came from.',
+                              ['source'])
+
+# Speculative prefetch of simulation steps (recorded by Speculator)
+SPECULATIONS = Counter('safe_speculations_total', 'Simulation steps run ahead of time, by what became of them.',
+                       ['step', 'outcome'])
+
+
+def timed_phase(phase):
+    """
+    Decorate a simulation method to count it and record its duration.
+
+    Parameters:
+    -----------
+    phase : str
+        The phase label, e.g. 'start_pi'.
+    """
+    def decorator(func):
+        duration = SIMULATION_PHASE_DURATION.labels(phase)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'success'
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                deferred = _deferred_phases.get()
+                if deferred is not None:
+                    deferred.append((phase, outcome, elapsed))
+                else:
+                    duration.observe(elapsed)
+                    SIMULATION_PHASES.labels(phase, outcome).inc()
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def deferred_phases():
+    """
+    Collect the phases timed in this context instead of recording them.
+
+    Used for work that may be thrown away, such as a speculative simulation
+    step: pass the collected phases to record_phases() if it is kept.
+
+    Yields:
+    -------
+    list
+        (phase, outcome, seconds) tuples, appended as phases finish.
+    """
+    phases = []
+    token = _deferred_phases.set(phases)
+    try:
+        yield phases
+    finally:
+        _deferred_phases.reset(token)
+
+
+def record_phases(phases):
+    """
+    Record phases collected by deferred_phases().
+
+    Parameters:
+    -----------
+    phases : list
+        (phase, outcome, seconds) tuples.
+    """
+    for phase, outcome, seconds in phases:
+        SIMULATION_PHASE_DURATION.labels(phase).observe(seconds)
+        SIMULATION_PHASES.labels(phase, outcome).inc()
@@ -0,0 +1,383 @@
+"""Opt-in cProfile and tracemalloc profiling of requests, jobs and headless runs.
+
+SAFE_PROFILE selects what is profiled:
+
+    off       nothing (the default)
+    header    requests sent with an `X-SAFE-Profile: 1` header, and the jobs they queue
+    all       every request except static files, and every job
+
+Each profile is written to SAFE_PROFILE_DIR under a name that starts with the
+endpoint (e.g. daily_standup-20250101T120000-3f2a), and the response carries
+the name in its X-SAFE-Profile header:
+
+    <name>.prof         cProfile stats, for pstats or snakeviz
+    <name>.cpu.folded   collapsed stacks weighted by microseconds spent
+    <name>.mem.folded   collapsed stacks weighted by bytes allocated and still held at the end
+    <name>.txt          top functions by cumulative time and top allocation sites
+
+The .folded files are the input format of flamegraph.pl, inferno and
+https://www.speedscope.app. Only one profile runs at a time, because
+tracemalloc is process-wide; requests arriving meanwhile are served
+unprofiled. Under eventlet or gevent a profile also contains the other
+greenlets that ran on the same thread.
+
+Command line:
+
+    python utils/profiling.py folded app.prof --output app.cpu.folded
+"""
+import io
+import os
+import re
+import sys
+import time
+import uuid
+import pstats
+import logging
+import argparse
+import cProfile
+import threading
+import contextlib
+import tracemalloc
+import contextvars
+from collections import defaultdict
+
+logger = logging.getLogger(__name__)
+
+MODES = ('off', 'header', 'all')
+HEADER = 'X-SAFE-Profile'
+
+_mode = 'off'
+_directory = 'profiles'
+_frames = 30
+
+_lock = threading.Lock()  # One profile at a time
+_current = contextvars.ContextVar('safe_current_profile', default=None)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure(mode, directory=None, frames=None):
+    """
+    Set what is profiled and where profiles are written.
+
+    Parameters:
+    -----------
+    mode : str
+        'off', 'header' or 'all'.
+    directory : str, optional
+        Directory the profile files are written to.
+    frames : int, optional
+        Stack depth recorded by tracemalloc for each allocation.
+    """
+    global _mode, _directory, _frames
+    mode = (mode or 'off').lower()
+    if mode not in MODES:
+        logger.warning("Unknown SAFE_PROFILE mode %r; profiling is off", mode)
+        mode = 'off'
+    _mode = mode
+    if directory:
+        _directory = directory
+    if frames:
+        _frames = frames
+
+
+def requested(headers):
+    """Whether a request with these headers should be profiled."""
+    if _mode == 'all':
+        return True
+    return _mode == 'header' and headers.get(HEADER, '').lower() in ('1', 'true', 'yes')
+
+
+def current_name():
+    """Name of the profile running in this context, or None."""
+    return _current.get()
+
+
+def profile_name(label):
+    """A unique, file-safe profile name that sorts by label and then time."""
+    label = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_') or 'profile'
+    return f"{label}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:4]}"
+
+
+class Profile:
+    """cProfile and tracemalloc around a block of work on the current thread."""
+
+    def __init__(self, name, directory=None, frames=None):
+        """
+        Initialize a profile.
+
+        Parameters:
+        -----------
+        name : str
+            Base name of the files written.
+        directory : str, optional
+            Output directory; defaults to the configured SAFE_PROFILE_DIR.
+        frames : int, optional
+            tracemalloc stack depth; defaults to the configured SAFE_PROFILE_FRAMES.
+        """
+        self.name = name
+        self.directory = directory or _directory
+        self.frames = frames or _frames
+        self.paths = []
+        self._profiler = None
+        self._snapshot = None
+        self._started_tracemalloc = False
+        self._token = None
+
+    def start(self, wait=False):
+        """
+        Start profiling.
+
+        Parameters:
+        -----------
+        wait : bool
+            Wait for a running profile to finish instead of giving up.
+
+        Returns:
+        --------
+        bool
+            False if another profile is running and wait is False.
+        """
+        if not _lock.acquire(blocking=wait):
+            return False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracemalloc = True
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self._snapshot = tracemalloc.take_snapshot()
+        self._token = _current.set(self.name)
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return True
+
+    def stop(self):
+        """
+        Stop profiling and write the profile files.
+
+        Returns:
+        --------
+        list
+            Paths of the files written.
+        """
+        self._profiler.disable()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            _current.set(None)  # Stopped in a different context than it was started in
+        try:
+            snapshot = _filter(tracemalloc.take_snapshot())
+            _, peak = tracemalloc.get_traced_memory()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+            allocations = snapshot.compare_to(_filter(self._snapshot), 'traceback')
+            self._snapshot = None
+            self.paths = self._write(pstats.Stats(self._profiler), allocations, peak)
+        except Exception:
+            logger.exception("Could not write profile %s", self.name)
+        finally:
+            _lock.release()
+        return self.paths
+
+    def _write(self, stats, allocations, peak):
+        """Write the .prof, .folded and .txt files."""
+        os.makedirs(self.directory, exist_ok=True)
+        base = os.path.join(self.directory, self.name)
+        stats.dump_stats(base + '.prof')
+        with open(base + '.cpu.folded', 'w', encoding='utf-8') as f:
+            f.writelines(f"{stack} {weight}\n" for stack, weight in folded_stacks(stats))
+        with open(base + '.mem.folded', 'w', encoding='utf-8') as f:
+            f.writelines(f"{stack} {weight}\n" for stack, weight in folded_allocations(allocations))
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(summary(stats, allocations, peak))
+        return [base + suffix for suffix in ('.prof', '.cpu.folded', '.mem.folded', '.txt')]
+
+
+@contextlib.contextmanager
+def profile(name, directory=None, frames=None, wait=True):
+    """
+    Profile the enclosed block, e.g. a headless simulation run.
+
+    Yields the Profile, or None if another profile was running and wait is False.
+    """
+    profiler = Profile(name, directory, frames)
+    if not profiler.start(wait=wait):
+        yield None
+        return
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+
+
+def profile_job(job_name, parent=None):
+    """
+    Context manager profiling a background job when profiling applies to it.
+
+    Parameters:
+    -----------
+    job_name : str
+        Name of the job, e.g. 'start_pi'.
+    parent : str, optional
+        Profile name of the request that queued the job.
+    """
+    if parent:
+        # Waits for the submitting request's profile to be written
+        return profile(f"{parent}.job-{job_name}")
+    if _mode == 'all':
+        return profile(profile_name(f"job-{job_name}"))
+    return contextlib.nullcontext()
+
+
+def _filter(snapshot):
+    """Drop the allocations of the profiler's own bookkeeping."""
+    return snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+    ])
+
+
+def _short_path(filename):
+    """A path relative to the repository, or to site-packages for dependencies."""
+    if filename.startswith(ROOT + os.sep):
+        return os.path.relpath(filename, ROOT)
+    marker = filename.rfind('site-packages' + os.sep)
+    if marker >= 0:
+        return filename[marker + len('site-packages') + 1:]
+    return os.path.basename(filename)
+
+
+def _frame_label(filename, lineno, function):
+    """One frame of a collapsed stack; ';' separates frames, so it may not appear in one."""
+    if filename == '~':  # Built-in functions
+        return function.replace(';', ',')
+    return f"{function} ({_short_path(filename)}:{lineno})".replace(';', ',')
+
+
+def folded_stacks(stats, min_us=1, max_depth=200):
+    """
+    Collapse cProfile stats into (stack, microseconds) pairs.
+
+    cProfile records caller-callee pairs rather than whole stacks, so the
+    time of a function called from several places is split between its
+    callers in proportion to the time each call site accounts for.
+
+    Parameters:
+    -----------
+    stats : pstats.Stats
+        The profile.
+    min_us : int
+        Paths contributing less than this are dropped.
+    max_depth : int
+        Deepest stack followed.
+
+    Returns:
+    --------
+    list
+        (stack, weight) pairs, stack frames separated by ';' from the root.
+    """
+    entries = stats.stats  # func -> (primitive calls, calls, own time, cumulative time, callers)
+    callees = defaultdict(list)
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            if caller in entries:
+                callees[caller].append((func, edge[3]))
+
+    weights = defaultdict(float)
+
+    def walk(func, path, on_path, share):
+        _, _, own, cumulative, _ = entries[func]
+        path = path + [_frame_label(*func)]
+        weights[';'.join(path)] += own * share * 1e6
+        if len(path) >= max_depth:
+            return
+        for callee, edge_time in callees.get(func, ()):
+            callee_time = entries[callee][3]
+            if callee in on_path or callee_time <= 0:
+                continue
+            callee_share = share * min(1.0, edge_time / callee_time)
+            if callee_time * callee_share * 1e6 < min_us:
+                continue
+            on_path.add(callee)
+            walk(callee, path, on_path, callee_share)
+            on_path.discard(callee)
+
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(limit, max_depth * 4 + 100))
+    try:
+        for func, (_, _, _, _, callers) in entries.items():
+            if not any(caller in entries for caller in callers):
+                walk(func, [], {func}, 1.0)
+    finally:
+        sys.setrecursionlimit(limit)
+    return sorted((stack, round(weight)) for stack, weight in weights.items() if round(weight) >= min_us)
+
+
+def folded_allocations(allocations):
+    """
+    Collapse tracemalloc statistics into (stack, bytes) pairs.
+
+    Parameters:
+    -----------
+    allocations : list
+        tracemalloc StatisticDiff entries grouped by traceback.
+
+    Returns:
+    --------
+    list
+        (stack, bytes) pairs for the stacks still holding memory allocated during the profile.
+    """
+    weights = defaultdict(int)
+    for stat in allocations:
+        if stat.size_diff <= 0:
+            continue
+        # tracemalloc frames carry no function names, only file and line
+        stack = ';'.join(f"{_short_path(frame.filename)}:{frame.lineno}".replace(';', ',')
+                         for frame in stat.traceback)
+        weights[stack] += stat.size_diff
+    return sorted(weights.items())
+
+
+def summary(stats, allocations, peak, limit=40):
+    """Human-readable top functions and allocation sites of a profile."""
+    out = io.StringIO()
+    stats.stream = out
+    stats.sort_stats('cumulative').print_stats(limit)
+    growth = sum(stat.size_diff for stat in allocations)
+    out.write(f"\nMemory: {growth / 1024:+.1f} KiB held at the end, {peak / 1024:.1f} KiB peak traced\n")
+    out.write("Top allocation sites still holding memory:\n")
+    by_line = defaultdict(int)
+    for stat in allocations:
+        if stat.size_diff > 0:
+            frame = stat.traceback[-1]
+            by_line[f"{_short_path(frame.filename)}:{frame.lineno}"] += stat.size_diff
+    for site, size in sorted(by_line.items(), key=lambda item: -item[1])[:limit // 2]:
+        out.write(f"  {size / 1024:10.1f} KiB  {site}\n")
+    return out.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    folded = commands.add_parser('folded', help='Convert cProfile stats to collapsed stacks')
+    folded.add_argument('profile')
+    folded.add_argument('--output', help='Write here instead of standard output')
+    args = parser.parse_args(argv)
+
+    lines = (f"{stack} {weight}\n" for stack, weight in folded_stacks(pstats.Stats(args.profile)))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.writelines(lines)
+    else:
+        try:
+            sys.stdout.writelines(lines)
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The reader (e.g. head) has exited; send the rest, and the flush at exit, nowhere
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+import zlib
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.text import STOPWORDS, tokenize
+from utils.metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_ENTRIES
+
+# Phrasing that does not change what is being asked; negations change the meaning and are kept
+QUESTION_STOPWORDS = (STOPWORDS - {'no', 'not', 'nor'}) | frozenset(
+    'explain describe tell please define definition mean meaning briefly give overview summary summarize '
+    'quick short know understand'.split())
+
+
+class CachedAnswer:
+    """A cached answer and how closely its question matched."""
+    __slots__ = ('question', 'answer', 'similarity')
+
+    def __init__(self, question, answer, similarity):
+        self.question = question
+        self.answer = answer
+        self.similarity = similarity
+
+
+class SemanticCache:
+    """
+    LRU cache of answers keyed by question similarity rather than exact text.
+
+    Questions are vectorized locally with hashed TF-IDF (stemmed unigrams and
+    bigrams hashed into a fixed number of signed buckets, weighted by their
+    document frequency among the cached questions). A lookup returns the
+    answer of the most similar cached question when the cosine similarity
+    reaches the threshold, so "what is PI planning?" and "explain PI
+    planning" share one model call.
+
+    Answers can be cached under a scope (e.g. a simulation and where it
+    is), and are then only returned for lookups with the same scope.
+    """
+
+    def __init__(self, name, max_entries=256, threshold=0.85, dimensions=2048):
+        """
+        Initialize the cache.
+
+        Parameters:
+        -----------
+        name : str
+            Label of the cache in the metrics, e.g. the agent role.
+        max_entries : int
+            Questions kept; the least recently used are evicted.
+        threshold : float
+            Smallest cosine similarity (0-1) answered from the cache.
+        dimensions : int
+            Hash buckets of the question vectors.
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dimensions = dimensions
+        self.vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self.squares = np.zeros((max_entries, dimensions), dtype=np.float32)  # vectors ** 2, for the row norms
+        self.document_frequency = np.zeros(dimensions, dtype=np.float32)
+        self.entries = OrderedDict()  # Slot in self.vectors -> (question, answer, scope), least recently used first
+        self.scope_slots = {}  # Scope -> slots of its entries
+        self.free_slots = list(range(max_entries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries_gauge = SEMANTIC_CACHE_ENTRIES.labels(name)
+        self._hit_counter = SEMANTIC_CACHE_LOOKUPS.labels(name, 'hit')
+        self._miss_counter = SEMANTIC_CACHE_LOOKUPS.labels(name, 'miss')
+
+    def vectorize(self, text):
+        """Return the hashed term frequency vector of a question (all zeros if it has no terms)."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        terms = tokenize(text, QUESTION_STOPWORDS)
+        counts = {}
+        for feature in terms + [f"{a} {b}" for a, b in zip(terms, terms[1:])]:
+            counts[feature] = counts.get(feature, 0) + 1
+        for feature, count in counts.items():
+            digest = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if digest & 1 else -1.0  # Signed hashing cancels out collisions on average
+            vector[(digest >> 1) % self.dimensions] += sign * (1 + math.log(count))
+        return vector
+
+    def _idf(self):
+        """Smoothed inverse document frequency of each bucket among the cached questions."""
+        return np.log((1 + len(self.entries)) / (1 + self.document_frequency)) + 1
+
+    def get(self, question, scope=None):
+        """
+        Return the cached answer of the most similar question.
+
+        Parameters:
+        -----------
+        question : str
+            The question being asked.
+        scope : hashable, optional
+            Only answers cached under this scope are considered.
+
+        Returns:
+        --------
+        CachedAnswer or None
+            None if no cached question reaches the similarity threshold.
+        """
+        vector = self.vectorize(question)
+        best = None
+        with self._lock:
+            slots = self.scope_slots.get(scope)
+            if slots and vector.any():
+                # cos(v * idf, q * idf) over the scope's rows, without materializing the weighted matrix
+                candidates = np.fromiter(slots, dtype=np.intp, count=len(slots))
+                weights = self._idf() ** 2
+                norms = np.sqrt(self.squares[candidates] @ weights) * np.sqrt(vector ** 2 @ weights)
+                similarities = (self.vectors[candidates] @ (vector * weights)) / np.where(norms > 0, norms, np.inf)
+                index = int(np.argmax(similarities))
+                if similarities[index] >= self.threshold:
+                    slot = int(candidates[index])
+                    self.entries.move_to_end(slot)
+                    cached_question, answer, _ = self.entries[slot]
+                    best = CachedAnswer(cached_question, answer, round(float(similarities[index]), 3))
+            if best:
+                self.hits += 1
+            else:
+                self.misses += 1
+        (self._hit_counter if best else self._miss_counter).inc()
+        return best
+
+    def put(self, question, answer, scope=None):
+        """
+        Cache the answer to a question, evicting the least recently used entry if full.
+
+        Parameters:
+        -----------
+        question : str
+            The question that was asked.
+        answer : str
+            The answer to serve for similar questions.
+        scope : hashable, optional
+            Lookups must pass the same scope to be answered with it.
+        """
+        vector = self.vectorize(question)
+        if not vector.any() or self.max_entries <= 0:
+            return
+        with self._lock:
+            if not self.free_slots:
+                evicted, (_, _, evicted_scope) = self.entries.popitem(last=False)
+                self._forget_slot(evicted_scope, evicted)
+                self.document_frequency -= self.vectors[evicted] != 0
+                self.vectors[evicted] = 0
+                self.squares[evicted] = 0
+                self.free_slots.append(evicted)
+            slot = self.free_slots.pop()
+            self.vectors[slot] = vector
+            self.squares[slot] = vector ** 2
+            self.document_frequency += vector != 0
+            self.entries[slot] = (question, answer, scope)
+            self.scope_slots.setdefault(scope, set()).add(slot)
+            size = len(self.entries)
+        self._entries_gauge.set(size)
+
+    def _forget_slot(self, scope, slot):
+        """Drop an evicted slot from its scope."""
+        slots = self.scope_slots[scope]
+        slots.discard(slot)
+        if not slots:
+            del self.scope_slots[scope]
+
+    def clear(self):
+        """Drop every cached answer, e.g. after the agent's prompts change."""
+        with self._lock:
+            self.entries.clear()
+            self.scope_slots.clear()
+            self.vectors[:] = 0
+            self.squares[:] = 0
+            self.document_frequency[:] = 0
+            self.free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._entries_gauge.set(0)
+
+    def stats(self):
+        """Return the entry count, hits, misses and hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
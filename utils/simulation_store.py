@@ -0,0 +1,251 @@
+import os
+import time
+import pickle
+import fcntl
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+
+class SimulationNotFound(LookupError):
+    """Raised when a simulation is not, or no longer, in the store."""
+
+
+class MemorySimulationStore:
+    """
+    Keep simulations in this process. Suitable for a single worker process;
+    transactions only serialize access between threads.
+    """
+
+    def __init__(self, max_simulations=100):
+        """
+        Initialize the store.
+
+        Parameters:
+        -----------
+        max_simulations : int
+            Number of simulations kept; the least recently used is dropped first.
+        """
+        self.max_simulations = max_simulations
+        self.simulations = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, simulation_id):
+        """Return the simulation with the given id, or None if unknown."""
+        with self._lock:
+            simulation = self.simulations.get(simulation_id)
+            if simulation is not None:
+                self.simulations.move_to_end(simulation_id)
+            return simulation
+
+    def put(self, simulation):
+        """Add or replace a simulation."""
+        with self._lock:
+            self.simulations[simulation.simulation_id] = simulation
+            self.simulations.move_to_end(simulation.simulation_id)
+            while len(self.simulations) > self.max_simulations:
+                evicted_id, _ = self.simulations.popitem(last=False)
+                self._locks.pop(evicted_id, None)
+
+    @contextmanager
+    def transaction(self, simulation_id):
+        """
+        Lock a simulation for a read-modify-write step and yield it.
+
+        Yields None if the simulation does not exist.
+        """
+        with self._lock:
+            lock = self._locks.setdefault(simulation_id, threading.RLock())
+        with lock:
+            yield self.get(simulation_id)
+
+
+class FileSimulationStore:
+    """
+    Keep pickled simulations in a directory shared by all worker processes.
+
+    Transactions hold an exclusive flock on a per-simulation lock file, load
+    the latest copy, and write it back atomically. Loaded copies are cached
+    per process and reused while the file on disk is unchanged; a transaction
+    that fails drops its copy, which it may have changed without saving.
+    """
+
+    def __init__(self, directory, max_cached=100):
+        """
+        Initialize the store.
+
+        Parameters:
+        -----------
+        directory : str
+            Directory holding one pickle (and one lock file) per simulation.
+        max_cached : int
+            Number of loaded simulations kept in this process; the least
+            recently used is dropped first (it stays on disk).
+        """
+        self.directory = directory
+        self.max_cached = max_cached
+        os.makedirs(directory, exist_ok=True)
+        self._cache = OrderedDict()
+        self._thread_locks = {}
+        self._lock = threading.Lock()
+
+    def _path(self, simulation_id, suffix):
+        """Return the path of a simulation file, rejecting unsafe ids."""
+        if not simulation_id or not simulation_id.isalnum():
+            raise ValueError(f"Invalid simulation id: {simulation_id!r}")
+        return os.path.join(self.directory, simulation_id + suffix)
+
+    def get(self, simulation_id):
+        """Return the latest copy of a simulation, or None if unknown."""
+        path = self._path(simulation_id, '.pickle')
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(simulation_id)
+            if cached and cached[0] == version:
+                self._cache.move_to_end(simulation_id)
+                return cached[1]
+
+        with open(path, 'rb') as f:
+            simulation = pickle.load(f)
+        self._cache_put(simulation_id, version, simulation)
+        return simulation
+
+    def put(self, simulation):
+        """Write a simulation atomically (temporary file and rename)."""
+        path = self._path(simulation.simulation_id, '.pickle')
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(simulation, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+        stat = os.stat(path)
+        self._cache_put(simulation.simulation_id, (stat.st_mtime_ns, stat.st_size), simulation)
+
+    def _cache_put(self, simulation_id, version, simulation):
+        """Cache a loaded or saved simulation, dropping the least recently used beyond max_cached."""
+        with self._lock:
+            self._cache[simulation_id] = (version, simulation)
+            self._cache.move_to_end(simulation_id)
+            while len(self._cache) > self.max_cached:
+                evicted_id, _ = self._cache.popitem(last=False)
+                # The flock still serializes a transaction that holds the evicted lock
+                self._thread_locks.pop(evicted_id, None)
+
+    @contextmanager
+    def transaction(self, simulation_id):
+        """
+        Lock a simulation across processes, yield the latest copy and save it
+        afterwards. Yields None if the simulation does not exist.
+        """
+        lock_path = self._path(simulation_id, '.lock')
+        with self._lock:
+            thread_lock = self._thread_locks.setdefault(simulation_id, threading.RLock())
+
+        # flock is per open file, so threads of this process also need a lock
+        try:
+            with thread_lock, open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    simulation = self.get(simulation_id)
+                    try:
+                        yield simulation
+                        if simulation is not None:
+                            self.put(simulation)
+                    except BaseException:
+                        # The cached copy may have been changed in place; reload the saved one next time
+                        with self._lock:
+                            self._cache.pop(simulation_id, None)
+                        raise
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._lock:
+                if simulation_id not in self._cache:  # Unknown, failed or evicted: keep the locks bounded too
+                    self._thread_locks.pop(simulation_id, None)
+
+
+class RedisSimulationStore:
+    """Keep pickled simulations in Redis, shared by workers on any host."""
+
+    def __init__(self, url, ttl=7 * 24 * 3600, lock_timeout=600):
+        """
+        Initialize the store.
+
+        Parameters:
+        -----------
+        url : str
+            Redis connection URL (redis://host:port/db).
+        ttl : int
+            Seconds a simulation is kept after its last update.
+        lock_timeout : int
+            Seconds after which a transaction lock held by a dead worker expires.
+        """
+        import redis  # Optional dependency, only needed for this store
+
+        self.redis = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    def get(self, simulation_id):
+        """Return the latest copy of a simulation, or None if unknown."""
+        data = self.redis.get(f"safe:simulation:{simulation_id}")
+        return pickle.loads(data) if data is not None else None
+
+    def put(self, simulation):
+        """Store a simulation."""
+        self.redis.set(
+            f"safe:simulation:{simulation.simulation_id}",
+            pickle.dumps(simulation, protocol=pickle.HIGHEST_PROTOCOL),
+            ex=self.ttl
+        )
+
+    @contextmanager
+    def transaction(self, simulation_id):
+        """
+        Lock a simulation across workers, yield the latest copy and save it
+        afterwards. Yields None if the simulation does not exist.
+        """
+        with self.redis.lock(f"safe:lock:{simulation_id}", timeout=self.lock_timeout):
+            simulation = self.get(simulation_id)
+            yield simulation
+            if simulation is not None:
+                self.put(simulation)
+
+
+def create_simulation_store(url=None, max_simulations=100):
+    """
+    Create a simulation store from a URL.
+
+    Parameters:
+    -----------
+    url : str, optional
+        'memory://' (default), 'file:///path/to/dir' or 'redis://host:port/db'.
+    max_simulations : int
+        Limit for the in-memory store, and for the copies a file store caches.
+
+    Returns:
+    --------
+    object
+        A store with get(), put() and transaction().
+    """
+    if not url or url.startswith('memory://'):
+        return MemorySimulationStore(max_simulations=max_simulations)
+
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        return FileSimulationStore(parsed.path, max_cached=max_simulations)
+    if parsed.scheme in ('redis', 'rediss'):
+        return RedisSimulationStore(url)
+    raise ValueError(f"Unsupported simulation store URL: {url}")
@@ -0,0 +1,182 @@
+"""Speculative prefetch of the next simulation step.
+
+Simulations advance in a predictable order: a standup follows sprint
+planning, the sprint review follows the last standup of a sprint. After
+a step, the Speculator runs the predicted next step (see
+safe_simulation.predict_next_step) on a copy of the simulation in the
+background, model calls included. When that step is requested and the
+simulation has not changed in the meantime, the copy's state and result
+are committed instead of running the step again; otherwise the copy is
+discarded. Changes that leave the logs alone, such as an agent's memory of
+a question, are caught by the simulation's revision, which every write
+outside the steps bumps (see app.simulation_transaction).
+
+Simulations draw random numbers from their own generator, which is copied
+along with them, so a committed step is exactly what running it would have
+produced. Speculation spends model calls that are thrown away when a
+prediction misses, so it is off unless SAFE_SPECULATION is set.
+"""
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from safe_simulation import predict_next_step
+from utils import tracing
+from utils.metrics import SPECULATIONS, deferred_phases, record_phases
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint(simulation):
+    """What must be unchanged for a speculative step to still apply to a simulation."""
+    return (simulation.simulation_id, simulation.revision, simulation.log_sequence, simulation.current_pi,
+            simulation.current_sprint, simulation.current_day)
+
+
+class Speculation:
+    """A step running, or run, ahead of time on a copy of a simulation."""
+    __slots__ = ('step', 'fingerprint', 'future')
+
+    def __init__(self, step, fingerprint, future):
+        self.step = step
+        self.fingerprint = fingerprint
+        self.future = future
+
+
+class Speculator:
+    """
+    Runs the predicted next step of simulations ahead of time.
+
+    One speculation is kept per simulation; a newer one replaces it. Call
+    take() before running a step and prefetch() after it, both while holding
+    the simulation's store transaction.
+    """
+
+    def __init__(self, enabled=True, max_workers=2, max_pending=100):
+        """
+        Initialize the speculator.
+
+        Parameters:
+        -----------
+        enabled : bool
+            Whether steps are run ahead at all; take() and prefetch() do nothing otherwise.
+        max_workers : int
+            Speculative steps running at the same time.
+        max_pending : int
+            Simulations with a speculation kept; the oldest are dropped beyond it.
+        """
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='safe-speculation')
+        self._pending = OrderedDict()  # Simulation id -> Speculation
+        self._lock = threading.Lock()
+
+    def prefetch(self, simulation, step):
+        """
+        Start the step predicted to follow step on a copy of simulation.
+
+        Parameters:
+        -----------
+        simulation : SAFeSimulation
+            The simulation step has just run on.
+        step : str
+            The step that has just run.
+
+        Returns:
+        --------
+        str or None
+            The step started, or None if none is predicted.
+        """
+        if not self.enabled:
+            return None
+        self._discard(simulation.simulation_id)
+        next_step = predict_next_step(step, simulation)
+        if next_step is None:
+            return None
+
+        # Copied now, in the caller's transaction, so the copy is consistent
+        snapshot = pickle.dumps(simulation, protocol=pickle.HIGHEST_PROTOCOL)
+        parent = tracing.current_context()
+
+        def run():
+            copy = pickle.loads(snapshot)
+            # Phase metrics are recorded only if the step is committed, so misses do not count
+            with tracing.span(f"speculation.{next_step}", parent=parent, simulation_id=copy.simulation_id), \
+                    deferred_phases() as phases:
+                result = copy.run_step(next_step)
+            return copy, result, phases
+
+        speculation = Speculation(next_step, _fingerprint(simulation), self._executor.submit(run))
+        with self._lock:
+            self._pending[simulation.simulation_id] = speculation
+            while len(self._pending) > self.max_pending:
+                _, dropped = self._pending.popitem(last=False)
+                self._drop(dropped)
+        return next_step
+
+    def take(self, simulation, step):
+        """
+        Commit the speculative run of step into simulation, if it still applies.
+
+        Waits for a speculation that is still running: it started earlier
+        than running the step now would.
+
+        Parameters:
+        -----------
+        simulation : SAFeSimulation
+            The simulation step is requested on; updated in place on success.
+        step : str
+            The step requested.
+
+        Returns:
+        --------
+        dict or None
+            The step's result, or None if the step has to be run.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            speculation = self._pending.pop(simulation.simulation_id, None)
+        if speculation is None:
+            return None
+        if speculation.step != step or speculation.fingerprint != _fingerprint(simulation):
+            self._drop(speculation)
+            return None
+
+        try:
+            copy, result, phases = speculation.future.result()
+        except Exception:
+            logger.exception("Speculative %s of simulation %s failed", step, simulation.simulation_id)
+            SPECULATIONS.labels(step, 'failed').inc()
+            return None
+        since_seq = simulation.log_sequence
+        simulation.__dict__.update(copy.__dict__)
+        simulation.restamp_log(since_seq)
+        record_phases(phases)
+        SPECULATIONS.labels(step, 'committed').inc()
+        return result
+
+    def _discard(self, simulation_id):
+        """Drop the speculation of a simulation, if any."""
+        with self._lock:
+            speculation = self._pending.pop(simulation_id, None)
+        if speculation:
+            self._drop(speculation)
+
+    @staticmethod
+    def _drop(speculation):
+        """Cancel a speculation that has not started, or let it finish unused."""
+        outcome = 'cancelled' if speculation.future.cancel() else 'discarded'
+        SPECULATIONS.labels(speculation.step, outcome).inc()
+
+    def shutdown(self):
+        """Stop accepting speculations and drop the pending ones."""
+        self.enabled = False
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for speculation in pending:
+            self._drop(speculation)
+        self._executor.shutdown(wait=False)
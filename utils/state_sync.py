@@ -0,0 +1,146 @@
+import json
+import threading
+from collections import OrderedDict
+
+
+def _escape_pointer(key):
+    """Escape a dictionary key for use in a JSON Pointer path."""
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def diff_state(old, new, path=''):
+    """Compute a JSON-patch style list of operations turning old into new.
+
+    Dictionaries are compared key by key; any other value (including lists)
+    is replaced as a whole when it differs.
+
+    Parameters:
+    -----------
+    old : object
+        The previous JSON-compatible value.
+    new : object
+        The current JSON-compatible value.
+    path : str
+        JSON Pointer of the values being compared.
+
+    Returns:
+    --------
+    list
+        Operations in RFC 6902 form ({'op', 'path', 'value'}).
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = []
+        for key in old:
+            if key not in new:
+                operations.append({'op': 'remove', 'path': f"{path}/{_escape_pointer(key)}"})
+        for key, value in new.items():
+            child_path = f"{path}/{_escape_pointer(key)}"
+            if key not in old:
+                operations.append({'op': 'add', 'path': child_path, 'value': value})
+            else:
+                operations.extend(diff_state(old[key], value, child_path))
+        return operations
+
+    if old != new or type(old) is not type(new):
+        return [{'op': 'replace', 'path': path, 'value': new}]
+    return []
+
+
+class StateBroadcaster:
+    """
+    Track versions of the simulation state and the version each client has
+    acknowledged, so broadcasts can be sent as patches instead of full state.
+    """
+
+    def __init__(self, history=32):
+        """
+        Initialize the broadcaster.
+
+        Parameters:
+        -----------
+        history : int
+            Number of recent state versions kept as patch bases. Clients
+            acknowledging an older version receive the full state instead.
+        """
+        self.history = history
+        self.log_seq = 0  # Highest log sequence number already pushed to the room
+        self.version = 0
+        self.snapshots = OrderedDict()
+        self.acked = {}
+        self._lock = threading.Lock()
+
+    def publish(self, state):
+        """
+        Record the current state, bumping the version if it changed.
+
+        Parameters:
+        -----------
+        state : dict
+            The current simulation state.
+
+        Returns:
+        --------
+        int
+            The version number of the recorded state.
+        """
+        # Round-trip through JSON so keys match what clients see (e.g. int keys become str)
+        snapshot = json.loads(json.dumps(state, default=str))
+        with self._lock:
+            if self.snapshots and self.snapshots[self.version] == snapshot:
+                return self.version
+            self.version += 1
+            self.snapshots[self.version] = snapshot
+            while len(self.snapshots) > self.history:
+                self.snapshots.popitem(last=False)
+            return self.version
+
+    def full_state(self):
+        """Return the latest state as a full (non-patch) payload."""
+        with self._lock:
+            return {'version': self.version, 'state': self.snapshots.get(self.version)}
+
+    def payloads(self):
+        """
+        Build the payload each registered client should receive for the
+        latest version.
+
+        Returns:
+        --------
+        list
+            (sid, payload) pairs for clients that are behind. Patches are
+            computed once per distinct base version.
+        """
+        with self._lock:
+            latest = self.snapshots.get(self.version)
+            patches = {}
+            result = []
+            for sid, base in self.acked.items():
+                if base == self.version:
+                    continue
+                if base not in self.snapshots:
+                    result.append((sid, {'version': self.version, 'state': latest}))
+                    continue
+                if base not in patches:
+                    patches[base] = diff_state(self.snapshots[base], latest)
+                result.append((sid, {
+                    'version': self.version,
+                    'base_version': base,
+                    'patch': patches[base]
+                }))
+            return result
+
+    def register(self, sid):
+        """Register a client that has not acknowledged any state yet."""
+        with self._lock:
+            self.acked[sid] = None
+
+    def ack(self, sid, version):
+        """Record the state version a client has applied."""
+        with self._lock:
+            if sid in self.acked:
+                self.acked[sid] = version
+
+    def forget(self, sid):
+        """Stop tracking a disconnected client."""
+        with self._lock:
+            self.acked.pop(sid, None)
@@ -0,0 +1,43 @@
+"""Word tokenization shared by the knowledge base and the semantic answer cache."""
+import re
+import functools
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers him his how i if in into is it its itself just me more most my no nor not of off on once only or
+other our ours out over own same she should so some such than that the their theirs them then there these
+they this those through to too under until up very was we were what when where which while who whom why
+will with would you your yours
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+@functools.lru_cache(maxsize=65536)
+def stem(token):
+    """Strip common English suffixes so 'teams' matches 'team' and 'planning' matches 'plan'."""
+    for suffix, minimum in (("ing", 6), ("ed", 5), ("s", 4)):
+        if token.endswith(suffix) and len(token) >= minimum and not token.endswith("ss"):
+            token = token[:-len(suffix)]
+            break
+    if len(token) > 3 and token[-1] == token[-2] and token[-1] not in "lsz":
+        token = token[:-1]  # planning -> plann -> plan
+    if len(token) > 4 and token.endswith("e"):
+        token = token[:-1]  # release, releases and released all become releas
+    return token
+
+
+def tokenize(text, stopwords=STOPWORDS):
+    """
+    Return the lowercased, stemmed terms of a text.
+
+    Parameters:
+    -----------
+    text : str
+        The text to split.
+    stopwords : frozenset
+        Words dropped before stemming.
+    """
+    return [stem(token.replace("'", "")) for token in _TOKEN.findall(text.lower().replace("’", "'"))
+            if token not in stopwords and len(token) > 1]
@@ -0,0 +1,461 @@
+"""Lightweight nested tracing spans with JSONL and OTLP/HTTP export.
+
+Spans nest through a context variable, so a request span contains the
+simulation phase, the agent methods it calls and each model call:
+
+    with span("SAFeSimulation.run_daily_standup", pi=1, sprint=2):
+        ...
+
+Tracing is off until configure() is given an export target (SAFE_TRACE_EXPORT):
+
+    jsonl:///var/log/safe/spans.jsonl     append one JSON span per line
+    http://localhost:4318                 POST OTLP/HTTP JSON to <url>/v1/traces
+
+Command line tools:
+
+    python utils/tracing.py collector --port 4318 --output spans.jsonl
+    python utils/tracing.py chrome spans.jsonl --output trace.json
+
+The collector is a stand-in for an OpenTelemetry collector that writes the
+spans it receives as JSONL. The chrome command converts JSONL spans to the
+Chrome trace event format; open the result in https://ui.perfetto.dev or
+chrome://tracing for a flame-style timeline.
+"""
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import argparse
+import threading
+import functools
+import contextvars
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'safe-ai-agents'
+
+_current = contextvars.ContextVar('safe_current_span', default=None)
+_exporter = None
+
+
+class Span:
+    """One timed operation within a trace."""
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'attributes', 'start_ns', 'end_ns',
+                 'status', 'error', 'thread', '_token')
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.trace_id = parent[0] if parent else os.urandom(16).hex()
+        self.parent_id = parent[1] if parent else None
+        self.span_id = os.urandom(8).hex()
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.status = 'ok'
+        self.error = None
+        self.thread = threading.current_thread().name
+        self._token = None
+
+    @property
+    def context(self):
+        """(trace_id, span_id), to parent spans started elsewhere (e.g. in a job thread)."""
+        return self.trace_id, self.span_id
+
+    def set_attributes(self, **attributes):
+        """Add or replace attributes."""
+        self.attributes.update(attributes)
+
+    def record_error(self, error):
+        """Mark the span as failed."""
+        self.status = 'error'
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self):
+        """The JSONL representation of a finished span."""
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start_ns': self.start_ns,
+            'end_ns': self.end_ns,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'thread': self.thread,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_error(exc)
+        finish(self)
+        return False
+
+
+class _NoopSpan:
+    """Returned while tracing is off, so instrumented code costs next to nothing."""
+    context = None
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def enabled():
+    """Whether spans are being recorded."""
+    return _exporter is not None
+
+
+def span(name, parent=None, **attributes):
+    """
+    Start a span, nested under the current one unless a parent is given.
+
+    Parameters:
+    -----------
+    name : str
+        Operation name, e.g. 'ScrumMaster.daily_standup'.
+    parent : tuple, optional
+        (trace_id, span_id) of the parent, from Span.context.
+    **attributes
+        Span attributes such as pi, sprint, agent or model.
+
+    Returns:
+    --------
+    Span
+        A context manager; use start() and finish() when the span cannot be a with block.
+    """
+    if _exporter is None:
+        return NOOP_SPAN
+    if parent is None:
+        current = _current.get()
+        parent = current.context if current is not None else None
+    return Span(name, parent, attributes)
+
+
+def start(name, parent=None, **attributes):
+    """Start a span and make it current until finish() is called."""
+    started = span(name, parent, **attributes)
+    return started.__enter__()
+
+
+def finish(finished):
+    """End a span, restore the previous current span and export it."""
+    if finished is NOOP_SPAN:
+        return
+    finished.end_ns = time.time_ns()
+    if finished._token is not None:
+        try:
+            _current.reset(finished._token)
+        except ValueError:
+            _current.set(None)  # Finished in a different context than it started in
+        finished._token = None
+    exporter = _exporter
+    if exporter is not None:
+        exporter.export(finished)
+
+
+def current_context():
+    """(trace_id, span_id) of the current span, or None."""
+    current = _current.get()
+    return current.context if current is not None else None
+
+
+def traced(name=None, attributes=None):
+    """
+    Decorate a function to run inside a span.
+
+    Parameters:
+    -----------
+    name : str, optional
+        Span name; defaults to the function's qualified name (Class.method).
+    attributes : callable, optional
+        Called with the function's arguments; returns a dict of span attributes.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return func(*args, **kwargs)
+            with span(span_name, **(attributes(*args, **kwargs) if attributes else {})):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class JSONLExporter:
+    """Appends finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def export(self, finished):
+        line = json.dumps(finished.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def shutdown(self):
+        with self._lock:
+            self._file.close()
+
+
+def _otlp_value(value):
+    """Convert an attribute value to an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_span(finished):
+    """Convert a span dict to the OTLP JSON span representation."""
+    otlp = {
+        'traceId': finished['trace_id'],
+        'spanId': finished['span_id'],
+        'name': finished['name'],
+        'kind': 1,  # SPAN_KIND_INTERNAL
+        'startTimeUnixNano': str(finished['start_ns']),
+        'endTimeUnixNano': str(finished['end_ns']),
+        'attributes': [{'key': key, 'value': _otlp_value(value)}
+                       for key, value in finished['attributes'].items()] +
+                      [{'key': 'thread.name', 'value': {'stringValue': finished['thread']}}],
+        'status': {'code': 2, 'message': finished['error']} if finished['status'] == 'error' else {'code': 1}
+    }
+    if finished['parent_id']:
+        otlp['parentSpanId'] = finished['parent_id']
+    return otlp
+
+
+def otlp_payload(spans, service_name=SERVICE_NAME):
+    """Wrap span dicts in an OTLP/HTTP JSON ExportTraceServiceRequest."""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'safe.tracing'}, 'spans': [_otlp_span(s) for s in spans]}]
+        }]
+    }
+
+
+class OTLPExporter:
+    """Sends spans in batches to an OTLP/HTTP JSON endpoint from a background thread."""
+
+    def __init__(self, endpoint, batch_size=256, interval=1.0, max_queue=10000):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dropped = 0
+        self._thread = threading.Thread(target=self._worker, name='otlp-exporter', daemon=True)
+        self._thread.start()
+
+    def export(self, finished):
+        try:
+            self._queue.put_nowait(finished.to_dict())
+        except queue.Full:
+            self._dropped += 1  # Never block the traced code on a slow collector
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            if batch[0] is None:
+                return
+            deadline = time.monotonic() + self.interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._send(batch)
+            if stop:
+                return
+
+    def _send(self, batch):
+        body = json.dumps(otlp_payload(batch)).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                response.read()
+        except OSError as e:
+            logger.warning("Could not export %d spans to %s: %s", len(batch), self.url, e)
+
+    def shutdown(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+def configure(target):
+    """
+    Start exporting spans, or turn tracing off.
+
+    Parameters:
+    -----------
+    target : str or None
+        'jsonl://<path>', 'http(s)://<collector>' or empty to disable.
+    """
+    global _exporter
+    previous = _exporter
+    if not target:
+        _exporter = None
+    elif target.startswith('jsonl://'):
+        _exporter = JSONLExporter(target[len('jsonl://'):])
+    elif target.startswith(('http://', 'https://')):
+        _exporter = OTLPExporter(target)
+    else:
+        raise ValueError(f"Unsupported trace export target: {target}")
+    if previous is not None:
+        previous.shutdown()
+
+
+def read_spans(path):
+    """Load the spans of a JSONL file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def chrome_trace(spans):
+    """
+    Convert spans to the Chrome trace event format.
+
+    Each trace becomes a process and each thread a track, so nested spans
+    stack up as a flame chart.
+    """
+    events = []
+    traces = {}
+    threads = {}
+    for s in sorted(spans, key=lambda s: s['start_ns']):
+        pid = traces.setdefault(s['trace_id'], len(traces) + 1)
+        tid = threads.setdefault((pid, s['thread']), len(threads) + 1)
+        events.append({
+            'name': s['name'],
+            'cat': s['name'].split('.')[0],
+            'ph': 'X',
+            'ts': s['start_ns'] / 1000,
+            'dur': (s['end_ns'] - s['start_ns']) / 1000,
+            'pid': pid,
+            'tid': tid,
+            'args': dict(s['attributes'], status=s['status'], **({'error': s['error']} if s['error'] else {}))
+        })
+    for trace_id, pid in traces.items():
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f"trace {trace_id[:8]}"}})
+    for (pid, thread), tid in threads.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def _spans_from_otlp(payload):
+    """Convert an OTLP/HTTP JSON request back to span dicts."""
+    for resource_spans in payload.get('resourceSpans', []):
+        for scope_spans in resource_spans.get('scopeSpans', []):
+            for otlp in scope_spans.get('spans', []):
+                attributes = {}
+                for attribute in otlp.get('attributes', []):
+                    value = attribute['value']
+                    attributes[attribute['key']] = next(iter(value.values())) if value else None
+                start_ns, end_ns = int(otlp['startTimeUnixNano']), int(otlp['endTimeUnixNano'])
+                status = otlp.get('status', {})
+                yield {
+                    'trace_id': otlp['traceId'],
+                    'span_id': otlp['spanId'],
+                    'parent_id': otlp.get('parentSpanId') or None,
+                    'name': otlp['name'],
+                    'start_ns': start_ns,
+                    'end_ns': end_ns,
+                    'duration_ms': round((end_ns - start_ns) / 1e6, 3),
+                    'thread': attributes.pop('thread.name', 'main'),
+                    'status': 'error' if status.get('code') == 2 else 'ok',
+                    'error': status.get('message'),
+                    'attributes': attributes
+                }
+
+
+def run_collector(port, output):
+    """Accept OTLP/HTTP JSON on /v1/traces and append the spans to a JSONL file."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != '/v1/traces':
+                self.send_error(404)
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                spans = list(_spans_from_otlp(payload))
+            except (ValueError, KeyError) as e:
+                self.send_error(400, str(e))
+                return
+            with lock, open(output, 'a', encoding='utf-8') as f:
+                for s in spans:
+                    f.write(json.dumps(s) + '\n')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    print(f"Collecting spans on http://127.0.0.1:{port}/v1/traces into {output}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    collector = commands.add_parser('collector', help='Run the OTLP/HTTP collector stand-in')
+    collector.add_argument('--port', type=int, default=4318)
+    collector.add_argument('--output', default='spans.jsonl')
+    chrome = commands.add_parser('chrome', help='Convert JSONL spans to a Chrome trace')
+    chrome.add_argument('spans')
+    chrome.add_argument('--output', default='trace.json')
+    args = parser.parse_args(argv)
+
+    if args.command == 'collector':
+        run_collector(args.port, args.output)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(chrome_trace(read_spans(args.spans)), f)
+        print(f"Wrote {args.output}; open it in https://ui.perfetto.dev or chrome://tracing")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())